@@ -3,13 +3,13 @@
 import os
 import re
 import sys
-import time
 import stat
 import yaml
 import copy
 import getpass
 import datetime
 import logging
+import subprocess
 
 from PyQt5.QtWidgets import QApplication, QWidget, QMainWindow, QAction, qApp, QTabWidget, QFrame, QGridLayout, QTableWidget, QTableWidgetItem, QPushButton, QLabel, QMessageBox, QLineEdit, QComboBox, QHeaderView, QDateEdit, QFileDialog, QFormLayout, QVBoxLayout, QHBoxLayout
 from PyQt5.QtGui import QIcon
@@ -19,7 +19,7 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
-from common import common, common_pyqt5, common_palladium
+from common import common, common_pyqt5, common_palladium, common_db, common_detail, common_cost, common_utilization, common_manifest
 from config import config
 
 os.environ['PYTHONUNBUFFERED'] = '1'
@@ -158,54 +158,10 @@ class MainWindow(QMainWindow):
     @staticmethod
     def parse_db_path():
         """
-        Parse config.db_path, get history_palladium_path_dic with history palladium info (yaml file).
+        Parse config.db_path, get history_palladium_path_dic with history palladium info (yaml file or sqlite sample).
+        The history info of a hardware is loaded from its manifest on first access.
         """
-        history_palladium_path_dic = {}
-
-        if os.path.exists(config.db_path) and os.path.isdir(config.db_path):
-            # Check db path. (get hardware)
-            for hardware in os.listdir(config.db_path):
-                hardware_path = str(config.db_path) + '/' + str(hardware)
-
-                if os.path.isdir(hardware_path):
-                    history_palladium_path_dic.setdefault(hardware, {})
-
-                    # Check hardware path. (get emulator)
-                    for emulator in os.listdir(hardware_path):
-                        emulator_path = str(hardware_path) + '/' + str(emulator)
-
-                        if os.path.isdir(emulator_path):
-                            history_palladium_path_dic[hardware].setdefault(emulator, {})
-
-                            # Check emulator path. (get year)
-                            for year in os.listdir(emulator_path):
-                                year_path = str(emulator_path) + '/' + str(year)
-
-                                if os.path.isdir(year_path):
-                                    history_palladium_path_dic[hardware][emulator].setdefault(year, {})
-
-                                    # Check year path. (get month)
-                                    for month in os.listdir(year_path):
-                                        month_path = str(year_path) + '/' + str(month)
-
-                                        if os.path.isdir(month_path):
-                                            history_palladium_path_dic[hardware][emulator][year].setdefault(month, {})
-
-                                            # Check month path. (get day)
-                                            for day in os.listdir(month_path):
-                                                day_path = str(month_path) + '/' + str(day)
-
-                                                if os.path.isdir(day_path):
-                                                    history_palladium_path_dic[hardware][emulator][year][month].setdefault(day, {})
-
-                                                    # Check day path. (get time)
-                                                    for day_time in os.listdir(day_path):
-                                                        time_path = str(day_path) + '/' + str(day_time)
-
-                                                        if os.path.isfile(time_path):
-                                                            history_palladium_path_dic[hardware][emulator][year][month][day].setdefault(day_time, time_path)
-
-        return history_palladium_path_dic
+        return common_manifest.get_palladium_history_path_dic()
 
     def init_ui(self):
         """
@@ -465,9 +421,9 @@ palladiumMonitor is an open source software for palladium information data-colle
         current_tab_tag_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
         self.current_tab_tag_combo = common_pyqt5.QComboCheckBox(self.current_tab_frame)
 
-        current_tab_check_button = QPushButton('Check', self.current_tab_frame)
-        current_tab_check_button.setStyleSheet("font-weight: bold;")
-        current_tab_check_button.clicked.connect(self.check_current_palladium_info)
+        self.current_tab_check_button = QPushButton('Check', self.current_tab_frame)
+        self.current_tab_check_button.setStyleSheet("font-weight: bold;")
+        self.current_tab_check_button.clicked.connect(self.check_current_palladium_info)
 
         current_tab_rack_label = QLabel('Rack', self.current_tab_frame)
         current_tab_rack_label.setStyleSheet("font-weight: bold;")
@@ -518,7 +474,7 @@ palladiumMonitor is an open source software for palladium information data-colle
         current_tab_frame_grid.addWidget(self.current_tab_host_line, 0, 3)
         current_tab_frame_grid.addWidget(current_tab_tag_label, 0, 4)
         current_tab_frame_grid.addWidget(self.current_tab_tag_combo, 0, 5)
-        current_tab_frame_grid.addWidget(current_tab_check_button, 0, 7)
+        current_tab_frame_grid.addWidget(self.current_tab_check_button, 0, 7)
         current_tab_frame_grid.addWidget(current_tab_rack_label, 1, 0)
         current_tab_frame_grid.addWidget(self.current_tab_rack_combo, 1, 1)
         current_tab_frame_grid.addWidget(current_tab_cluster_label, 1, 2)
@@ -753,9 +709,18 @@ palladiumMonitor is an open source software for palladium information data-colle
                 my_show_message = common_pyqt5.ShowMessage('Info', 'Loading palladium information, please wait a moment ...')
                 my_show_message.start()
 
-                # Get self.current_palladium_dic.
-                test_server_info = common_palladium.get_test_server_info(hardware, test_server, host)
-                self.current_palladium_dic = common_palladium.parse_test_server_info(test_server_info)
+                # Get self.current_palladium_dic, parse test_server output while it is arriving.
+                self.current_tab_check_button.setEnabled(False)
+
+                try:
+                    test_server_info = common_palladium.iter_test_server_info(hardware, test_server, host)
+                    self.current_palladium_dic = common_palladium.parse_domain_table(test_server_info, domain_callback=self.show_current_tab_loading_progress)
+                except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as error:
+                    logger.error('Get test_server information failed: ' + str(error))
+                    self.current_palladium_dic = {}
+                finally:
+                    self.current_tab_check_button.setEnabled(True)
+                    self.statusBar().clearMessage()
 
                 my_show_message.terminate()
 
@@ -788,6 +753,14 @@ palladiumMonitor is an open source software for palladium information data-colle
                 # Update self.current_tab_table.
                 self.gen_current_tab_table()
 
+    def show_current_tab_loading_progress(self, domain_line_num):
+        """
+        Show loaded domain row number on status bar while test_server output is arriving.
+        """
+        if domain_line_num % 20 == 0:
+            self.statusBar().showMessage('Loading palladium information, ' + str(domain_line_num) + ' domain rows ...')
+            QApplication.processEvents()
+
     def update_current_tab_frame(self, reset=False):
         """
         Update *_combo items on self.current_tab_frame..
@@ -930,7 +903,7 @@ palladiumMonitor is an open source software for palladium information data-colle
 
     def gen_palladium_info_table(self, palladium_info_table, palladium_dic):
         """
-        Common function, generate specified table with specified palladium info (palladium_dic).
+        Common function, generate specified table with specified palladium info (palladium_dic or DomainTable).
         """
         # palladium_info_table
         palladium_info_table.setShowGrid(True)
@@ -957,60 +930,51 @@ palladiumMonitor is an open source software for palladium information data-colle
         palladium_info_table.setRowCount(0)
 
         if palladium_dic:
-            domain_line_num = palladium_dic['domain_line_num']
-            palladium_info_table.setRowCount(domain_line_num)
-
-            for rack in palladium_dic['rack'].keys():
-                for cluster in palladium_dic['rack'][rack]['cluster'].keys():
-                    for logic_drawer in palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'].keys():
-                        for domain in palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'].keys():
-                            owner = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['owner']
-                            pid = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['pid']
-                            tpod = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['tpod']
-                            design = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['design']
-                            elaptime = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['elaptime']
-                            reservedkey = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['reservedkey']
-                            row += 1
-
-                            # Fill "Rack"
-                            item = QTableWidgetItem(rack)
-                            palladium_info_table.setItem(row, 0, item)
-
-                            # Fill "Cluster"
-                            item = QTableWidgetItem(cluster)
-                            palladium_info_table.setItem(row, 1, item)
-
-                            # Fill "Logic drawer"
-                            item = QTableWidgetItem(logic_drawer)
-                            palladium_info_table.setItem(row, 2, item)
-
-                            # Fill "Domain"
-                            item = QTableWidgetItem(domain)
-                            palladium_info_table.setItem(row, 3, item)
-
-                            # Fill "Owner"
-                            item = QTableWidgetItem(owner)
-                            palladium_info_table.setItem(row, 4, item)
-
-                            # Fill "PID"
-                            item = QTableWidgetItem(pid)
-                            palladium_info_table.setItem(row, 5, item)
-
-                            # Fill "T-Pod"
-                            item = QTableWidgetItem(tpod)
-                            palladium_info_table.setItem(row, 6, item)
-
-                            # Fill "Design"
-                            item = QTableWidgetItem(design)
-                            palladium_info_table.setItem(row, 7, item)
-
-                            # Fill "Elaptime"
-                            item = QTableWidgetItem(elaptime)
-                            palladium_info_table.setItem(row, 8, item)
-
-                            # Fill "ReservedKey"
-                            item = QTableWidgetItem(reservedkey)
-                            palladium_info_table.setItem(row, 9, item)
+            domain_table = common_palladium.DomainTable.from_dict(palladium_dic)
+            palladium_info_table.setRowCount(len(domain_table))
+
+            for (rack, cluster, logic_drawer, domain, owner, pid, tpod, design, elaptime, reservedkey) in domain_table.iter_columns(*common_palladium.DOMAIN_TABLE_COLUMN_LIST):
+                row += 1
+
+                # Fill "Rack"
+                item = QTableWidgetItem(rack)
+                palladium_info_table.setItem(row, 0, item)
+
+                # Fill "Cluster"
+                item = QTableWidgetItem(cluster)
+                palladium_info_table.setItem(row, 1, item)
+
+                # Fill "Logic drawer"
+                item = QTableWidgetItem(logic_drawer)
+                palladium_info_table.setItem(row, 2, item)
+
+                # Fill "Domain"
+                item = QTableWidgetItem(domain)
+                palladium_info_table.setItem(row, 3, item)
+
+                # Fill "Owner"
+                item = QTableWidgetItem(owner)
+                palladium_info_table.setItem(row, 4, item)
+
+                # Fill "PID"
+                item = QTableWidgetItem(pid)
+                palladium_info_table.setItem(row, 5, item)
+
+                # Fill "T-Pod"
+                item = QTableWidgetItem(tpod)
+                palladium_info_table.setItem(row, 6, item)
+
+                # Fill "Design"
+                item = QTableWidgetItem(design)
+                palladium_info_table.setItem(row, 7, item)
+
+                # Fill "Elaptime"
+                item = QTableWidgetItem(elaptime)
+                palladium_info_table.setItem(row, 8, item)
+
+                # Fill "ReservedKey"
+                item = QTableWidgetItem(reservedkey)
+                palladium_info_table.setItem(row, 9, item)
 
     def gen_current_tab_table(self):
         self.gen_palladium_info_table(self.current_tab_table, self.current_palladium_dic)
@@ -1333,9 +1297,7 @@ palladiumMonitor is an open source software for palladium information data-colle
 
         if hardware and emulator and year and month and day and time:
             time_file = self.history_palladium_path_dic[hardware][emulator][year][month][day][time]
-
-            with open(time_file, 'rb') as TF:
-                self.history_palladium_dic = yaml.load(TF, Loader=yaml.FullLoader)
+            self.history_palladium_dic = common_palladium.DomainTable.from_dict(common_db.read_palladium_sample(time_file))
 
             self.history_palladium_dic = common_palladium.multifilter_palladium_dic(
                 self.history_palladium_dic,
@@ -1673,7 +1635,17 @@ palladiumMonitor is an open source software for palladium information data-colle
         end_date_utc = datetime.datetime.strptime(end_date, '%Y-%m-%d')
         utilization_dic = {}
 
-        if os.path.exists(utilization_file):
+        if common_utilization.is_utilization_series_valid(utilization_file):
+            start_date = re.sub(r'-', '', start_date)
+            end_date = re.sub(r'-', '', end_date)
+            series_utilization_dic = common_utilization.get_utilization_series_dic(utilization_file, int(start_date) * 1000000, int(end_date) * 1000000 + 235959, detail=self.enable_utilization_detail)
+
+            if self.enable_utilization_detail:
+                utilization_dic = series_utilization_dic
+            else:
+                utilization_dic = {(start_date_utc + datetime.timedelta(days=d)).strftime('%Y%m%d'): 0 for d in range((end_date_utc - start_date_utc).days)}
+                utilization_dic.update(series_utilization_dic)
+        elif os.path.exists(utilization_file):
             full_utilization_dic = {}
             start_date = re.sub(r'-', '', start_date)
             end_date = re.sub(r'-', '', end_date)
@@ -1703,13 +1675,6 @@ palladiumMonitor is an open source software for palladium information data-colle
 
         return utilization_dic
 
-    @staticmethod
-    def is_file_writing(file_path):
-        init_mtime = os.path.getmtime(file_path)
-        time.sleep(0.1)
-        current_mtime = os.path.getmtime(file_path)
-        return init_mtime != current_mtime
-
     def get_domain_utilization_dic(self, hardware, emulator, start_date, end_date):
         """
         Get detail utilization_dic, with "date - utilization" information.
@@ -1728,24 +1693,12 @@ palladiumMonitor is an open source software for palladium information data-colle
                 current_year = start_date_utc.year + month // 12
                 current_month = month % 12 + 1
 
-                current_utilization_file = os.path.join(utilization_dir, '%s.%s.utilization' % (str(current_year), str(current_month).zfill(2)))
-
-                if not os.path.exists(current_utilization_file):
-                    continue
-
-                while self.is_file_writing(current_utilization_file):
-                    time.sleep(1)
-
-                if not os.path.exists(current_utilization_file):
-                    continue
-
-                with open(current_utilization_file, 'r') as uf:
-                    try:
-                        current_utilization_dic = yaml.load(uf, Loader=yaml.FullLoader)
-                    except Exception as error:
-                        logger.error(str(error))
-                        logger.error('Error occur when reading utilization file {}'.format(current_utilization_dic))
-                        return utilization_dic
+                try:
+                    (current_utilization_dic, _) = common_detail.load_palladium_detail(utilization_dir, current_year, current_month, item_list=['utilization'])
+                except Exception as error:
+                    logger.error(str(error))
+                    logger.error('Error occur when reading utilization information of {}.{}'.format(current_year, str(current_month).zfill(2)))
+                    return utilization_dic
 
                 for current_date in current_utilization_dic:
                     current_date_utc = datetime.datetime.strptime(current_date, '%Y-%m-%d')
@@ -2183,28 +2136,10 @@ palladiumMonitor is an open source software for palladium information data-colle
                         if emulator not in cost_dic[hardware]:
                             cost_dic[hardware].setdefault(emulator, {})
 
-                        cost_file = str(config.db_path) + '/' + str(hardware) + '/' + str(emulator) + '/cost'
-
-                        if os.path.exists(cost_file):
-                            total_cost_dic = {}
-
-                            with open(cost_file, 'r') as cf:
-                                for line in cf:
-                                    line_s = line.replace('\n', '').split()
-
-                                    if re.match(r'^\s*$', line):
-                                        continue
-
-                                    # Get date & project:cost infomation
-                                    if re.match(r'^\S+\s*(\S+:\S+\s*)+$', line):
-                                        date = line_s[0].strip()
-                                        history_project_cost_dic = {cost_info.split(':')[0].strip(): int(cost_info.split(':')[1].strip()) for cost_info in line_s[1:]}
-                                    else:
-                                        logger.warning('Could not find valid infomation in cost file line: ' + line + '!')
-                                        continue
-
-                                    total_cost_dic[date] = history_project_cost_dic
+                        # Merge compacted daily cost with cost ledger tail.
+                        total_cost_dic = common_cost.load_palladium_cost(hardware, emulator)
 
+                        if total_cost_dic:
                             for day in range(0, day_inteval + 1):
                                 cost_date = (begin_date + datetime.timedelta(days=day)).strftime('%Y-%m-%d')
 
@@ -2239,13 +2174,7 @@ palladiumMonitor is an open source software for palladium information data-colle
                 current_year = start_date_utc.year + month // 12
                 current_month = month % 12 + 1
 
-                current_cost_file = os.path.join(cost_dir, '%s.%s.cost' % (str(current_year), str(current_month).zfill(2)))
-
-                if not os.path.exists(current_cost_file):
-                    continue
-
-                with open(current_cost_file, 'r') as uf:
-                    current_cost_dic = yaml.load(uf, Loader=yaml.FullLoader)
+                (_, current_cost_dic) = common_detail.load_palladium_detail(cost_dir, current_year, current_month, item_list=['cost'])
 
                 for current_date in current_cost_dic:
                     current_date_utc = datetime.datetime.strptime(current_date, '%Y-%m-%d').date()
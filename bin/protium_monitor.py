@@ -24,7 +24,7 @@ from matplotlib.figure import Figure
 
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
 from config import config
-from common import common, common_pyqt5, common_protium
+from common import common, common_pyqt5, common_protium, common_utilization, common_manifest
 
 os.environ["PYTHONUNBUFFERED"] = '1'
 
@@ -99,6 +99,7 @@ class MainWindow(QMainWindow):
     def parse_db_path():
         """
         Parse config.db_path, get history_protium_path_dic with history protium info (yaml file).
+        The history info of a hardware is loaded from its manifest on first access.
         """
         db_path = os.path.join(config.db_path, 'protium')
         history_protium_path_dic = {}
@@ -106,50 +107,10 @@ class MainWindow(QMainWindow):
         if not os.path.exists(db_path):
             logger.error("Could not find protium db path %s, please chekc!" % str(db_path))
         else:
-            if not os.listdir(db_path):
-                logger.error("Could not find any valid data in path %s, pelase check!" % str(db_path))
-                return history_protium_path_dic
-
-            for hardware in os.listdir(db_path):
-                hardware_db_path = os.path.join(db_path, hardware)
-
-                if not os.path.isdir(hardware_db_path):
-                    continue
-
-                history_protium_path_dic.setdefault(hardware, {})
-
-                for year in os.listdir(hardware_db_path):
-                    if not year.isdigit():
-                        continue
-
-                    year_db_path = os.path.join(hardware_db_path, year)
-
-                    if not os.path.isdir(year_db_path):
-                        continue
-
-                    history_protium_path_dic[hardware].setdefault(year, {})
-
-                    for month in os.listdir(year_db_path):
-                        month_db_path = os.path.join(year_db_path, month)
+            history_protium_path_dic = common_manifest.get_protium_history_path_dic()
 
-                        if not os.path.isdir(month_db_path):
-                            continue
-
-                        history_protium_path_dic[hardware][year].setdefault(month, {})
-
-                        for day in os.listdir(month_db_path):
-                            day_db_path = os.path.join(month_db_path, day)
-
-                            if not os.path.isdir(day_db_path):
-                                continue
-
-                            history_protium_path_dic[hardware][year][month].setdefault(day, {})
-
-                            for file_name in os.listdir(day_db_path):
-                                file_path = os.path.join(day_db_path, file_name)
-
-                                if os.path.exists(file_path):
-                                    history_protium_path_dic[hardware][year][month][day][file_name] = file_path
+            if not history_protium_path_dic:
+                logger.error("Could not find any valid data in path %s, pelase check!" % str(db_path))
 
         return history_protium_path_dic
 
@@ -630,7 +591,7 @@ protiumMonitor is an open source software for protium information data-collectio
 
     def gen_protium_info_table(self, protium_info_table, protium_dic):
         """
-        Common function, generate specified table with specified protium info (protium_dic).
+        Common function, generate specified table with specified protium info (protium_dic, ProtiumTable or ProtiumView).
         """
         # protium_info_table
         protium_info_table.setShowGrid(True)
@@ -656,24 +617,10 @@ protiumMonitor is an open source software for protium information data-collectio
 
         if not protium_dic:
             return
+        elif isinstance(protium_dic, common_protium.ProtiumView):
+            protium_info_list = list(protium_dic.iter_rows())
         else:
-            for _, board_dic in protium_dic.items():
-                board_id = board_dic['board_id']
-                board_ip = board_dic['board_ip']
-
-                if not board_dic['used_record']:
-                    fpga, user, host, pid, started_time = '--', '--', '--', '--', '--'
-                    protium_info_list.append([board_id, board_ip, fpga, user, host, pid, started_time])
-                    continue
-                else:
-                    for used_record_dic in board_dic['used_record']:
-                        fpga = used_record_dic['FPGA']
-                        user = used_record_dic['user']
-                        host = used_record_dic['host']
-                        pid = used_record_dic['pid']
-                        started_time = used_record_dic['started_time']
-
-                        protium_info_list.append([board_id, board_ip, fpga, user, host, pid, started_time])
+            protium_info_list = list(common_protium.ProtiumTable.from_dict(protium_dic).view().iter_rows())
 
         protium_info_list = sorted(protium_info_list, key=lambda x: int(x[0]))
 
@@ -744,8 +691,8 @@ protiumMonitor is an open source software for protium information data-collectio
         logger.info("Check protium information command: %s" % str(check_info_command))
 
         # Get self.current_protium_dic.
-        protium_sys_info_list = common_protium.get_protium_sys_info(command=check_info_command)
-        self.current_protium_dic = common_protium.parse_protium_sys_info(protium_sys_info_list)
+        protium_sys_info = common_protium.get_protium_sys_info_output(command=check_info_command)
+        self.current_protium_dic = common_protium.ProtiumTable.from_dict(common_protium.parse_protium_sys_info(protium_sys_info))
 
         self.my_show_message.terminate()
 
@@ -778,19 +725,13 @@ protiumMonitor is an open source software for protium information data-collectio
         """
         Update *_combo items on self.current_tab_frame..
         """
-        board_set, ip_set, fpga_set, submit_host_set, user_set, pid_set = set(), set(), set(), set(), set(), set()
         hardware = self.current_tab_hardware_combo.currentText().strip()
+        protium_view = self.current_protium_dic
 
-        for _, board_dic in self.current_protium_dic.items():
-            board_set.add(board_dic['board_id'])
-            ip_set.add(board_dic['board_ip'])
+        if not isinstance(protium_view, common_protium.ProtiumView):
+            protium_view = common_protium.ProtiumTable.from_dict(protium_view).view()
 
-            if board_dic['used_record']:
-                for used_record in board_dic['used_record']:
-                    fpga_set.add(used_record['FPGA'])
-                    submit_host_set.add(used_record['host'])
-                    user_set.add(used_record['user'])
-                    pid_set.add(used_record['pid'])
+        board_set, ip_set, fpga_set, submit_host_set, user_set, pid_set = (protium_view.get_value_set(column) for column in ('board_id', 'board_ip', 'FPGA', 'host', 'user', 'pid'))
 
         board_list, ip_list, fpga_list, submit_host_list, user_list, pid_list = sorted(list(board_set), key=lambda x: int(x)), sorted(list(ip_set)), sorted(list(fpga_set)), sorted(list(submit_host_set)), sorted(list(user_set)), sorted(list(pid_set))
 
@@ -1062,7 +1003,7 @@ protiumMonitor is an open source software for protium information data-collectio
             if os.path.exists(db_file):
                 try:
                     with open(db_file, 'r') as DF:
-                        self.history_protium_dic = yaml.load(DF, Loader=yaml.CLoader)
+                        self.history_protium_dic = common_protium.ProtiumTable.from_dict(yaml.load(DF, Loader=yaml.CLoader))
                 except Exception as error:
                     logger.error("Could not find valid protium information due to %s" % str(error))
 
@@ -1535,7 +1476,11 @@ protiumMonitor is an open source software for protium information data-collectio
 
         utilization_file = os.path.join(str(config.db_path), 'protium/%s/utilization' % str(hardware))
 
-        if os.path.exists(utilization_file):
+        if common_utilization.is_utilization_series_valid(utilization_file, line_format='protium'):
+            start_timestamp = int(datetime.datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y%m%d%H%M%S'))
+            end_timestamp = int((datetime.datetime.strptime(end_date, '%Y-%m-%d') + datetime.timedelta(days=1)).strftime('%Y%m%d%H%M%S'))
+            utilization_dic = common_utilization.get_utilization_series_dic(utilization_file, start_timestamp, end_timestamp, detail=self.enable_utilization_detail)
+        elif os.path.exists(utilization_file):
             full_utilization_dic = {}
             start_date_utc = datetime.datetime.strptime(start_date, '%Y-%m-%d')
             end_date_utc = datetime.datetime.strptime(end_date, '%Y-%m-%d') + datetime.timedelta(days=1)
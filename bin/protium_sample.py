@@ -15,7 +15,7 @@ import argparse
 
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
 from config import config
-from common import common, common_protium
+from common import common, common_protium, common_utilization, common_manifest, common_retention, common_metrics
 
 os.environ["PYTHONUNBUFFERED"] = '1'
 logger = common.get_logger(level=logging.DEBUG)
@@ -30,6 +30,10 @@ def read_args():
     parser.add_argument('-H', '--hardware',
                         default='X1',
                         help='Specify hardware, default is "X1".')
+    parser.add_argument('--retention',
+                        action='store_true',
+                        default=False,
+                        help='downsample history samples and utilization of specified hardware with retention policy on config.py.')
 
     args = parser.parse_args()
 
@@ -40,9 +44,9 @@ class PtmSampling:
     """
     Protium information sampling
     """
-    def __init__(self, hardware):
+    def __init__(self, hardware, hardware_dic=None):
         self.hardware = hardware
-        self.hardware_dic = common_protium.get_protium_host_info()
+        self.hardware_dic = hardware_dic if hardware_dic is not None else common_protium.get_protium_host_info()
 
         if hardware not in self.hardware_dic:
             logger.error("Invalid hardware, pelase check!")
@@ -64,8 +68,34 @@ class PtmSampling:
         self.project_user_dic = common.parse_project_proportion_file(project_user_file)
 
         self.project_proportion_dic = {'execute_host': self.project_execute_host_dic, 'user': self.project_user_dic}
+        self.project_resolver = None
 
-    def sampling(self):
+    def get_project_resolver(self):
+        """
+        Get (create) project resolver for hardware project_primary_factors.
+        """
+        if self.project_resolver is None:
+            self.project_resolver = common.ProjectResolver(self.hardware_dic[self.hardware]['project_primary_factors'], self.project_proportion_dic)
+
+        return self.project_resolver
+
+    def get_ptmrun_path(self):
+        """
+        Get (create) ptmRun work path "~/<hardware>".
+        """
+        ptmrun_path = os.path.join(os.path.expanduser('~'), self.hardware)
+
+        if not os.path.exists(ptmrun_path):
+            os.makedirs(ptmrun_path)
+
+        return ptmrun_path
+
+    @common_metrics.instrument('protium')
+    def sampling(self, protium_sys_info_list=None):
+        """
+        Sample protium board information, get it with self.check_info_command (by shards if configured) if protium_sys_info_list is not specified.
+        Every phase is timed on self.metrics.
+        """
         # db
         current_time_utc = datetime.datetime.now()
         self.current_year = current_time_utc.strftime('%Y')
@@ -87,13 +117,19 @@ class PtmSampling:
         # sampling protium board information
         logger.info("Sampling protium sys information...")
 
-        ptmrun_path = os.path.join(os.path.expanduser('~'), self.hardware)
+        if protium_sys_info_list is None:
+            with self.metrics.span('ptmRun'):
+                protium_sys_info_list = common_protium.fetch_protium_sys_info(self.hardware_dic[self.hardware], path=self.get_ptmrun_path())
 
-        if not os.path.exists(ptmrun_path):
-            os.makedirs(ptmrun_path)
+        with self.metrics.span('parse'):
+            protium_dic = common_protium.parse_protium_sys_info(protium_sys_info_list)
 
-        protium_sys_info_list = common_protium.get_protium_sys_info(path=ptmrun_path, command=self.check_info_command)
-        protium_dic = common_protium.parse_protium_sys_info(protium_sys_info_list)
+        if isinstance(protium_sys_info_list, list):
+            self.metrics.add_size('lines_read', len(protium_sys_info_list))
+        else:
+            self.metrics.add_size('lines_read', protium_sys_info_list.count(b'\n'))
+            self.metrics.add_size('bytes_read', len(protium_sys_info_list))
+        self.metrics.add_size('boards', len(protium_dic))
 
         if not protium_dic:
             logger.error('Could not find any valid information, please check!')
@@ -108,15 +144,18 @@ class PtmSampling:
         for board_uuid in protium_dic:
             board_dic['board_list'].append(protium_dic[board_uuid]['board_id'])
 
-        with open(domain_list_file, 'w') as df:
-            df.write(yaml.dump(board_dic, allow_unicode=True))
+        with self.metrics.span('domain_list'):
+            with open(domain_list_file, 'w') as df:
+                df.write(yaml.dump(board_dic, allow_unicode=True))
 
         # Utilziation
         utilziation = self.get_protium_utilization(protium_dic)
         utilziation_file_path = os.path.join(config.db_path, 'protium/%s/utilization' % self.hardware)
 
         # Cost
-        cost_dic = self.get_protium_cost(protium_dic)
+        with self.metrics.span('get_protium_cost'):
+            cost_dic = self.get_protium_cost(protium_dic)
+
         cost_file_path = os.path.join(config.db_path, 'protium/%s/cost' % self.hardware)
 
         # Save inforamtion to database, including utilization and board based information.
@@ -125,24 +164,79 @@ class PtmSampling:
         # sampling file path
         db_file_path = os.path.join(db_path, self.current_time)
 
-        with open(db_file_path, 'w') as DF:
-            DF.write(yaml.dump(protium_dic, allow_unicode=True))
+        with self.metrics.span('save_sample'):
+            with open(db_file_path, 'w') as DF:
+                DF.write(yaml.dump(protium_dic, allow_unicode=True))
+
+        self.metrics.add_size('bytes_written', os.path.getsize(db_file_path))
 
-        with open(utilziation_file_path, 'a+') as UF:
-            UF.write('%s-%s: %s\n' % (self.current_date, self.current_time, utilziation))
+        with self.metrics.span('manifest'):
+            common_manifest.add_protium_manifest_record(self.hardware, self.current_year, self.current_month, self.current_day, self.current_time, db_file_path)
 
-        with open(cost_file_path, 'a+') as UF:
-            line = '%s-%s ' % (self.current_date, self.current_time)
+        with self.metrics.span('utilization'):
+            common_utilization.append_utilization_sample(utilziation_file_path, '%s-%s: %s\n' % (self.current_date, self.current_time, utilziation), current_time_utc.strftime('%Y%m%d%H%M%S'), utilziation, line_format='protium')
 
-            for project, sampling_num in cost_dic.items():
-                line += ' %s:%s' % (str(project), str(sampling_num))
+        with self.metrics.span('update_cost_file'):
+            with open(cost_file_path, 'a+') as UF:
+                line = '%s-%s ' % (self.current_date, self.current_time)
 
-            UF.write(line + '\n')
+                for project, sampling_num in cost_dic.items():
+                    line += ' %s:%s' % (str(project), str(sampling_num))
 
-        self.get_protium_board_info(protium_dic=protium_dic)
+                UF.write(line + '\n')
 
+        with self.metrics.span('get_protium_board_info'):
+            self.get_protium_board_info(protium_dic=protium_dic)
+
+        self.metrics.success = True
         logger.info("Done")
 
+    def apply_retention_policy(self):
+        """
+        Downsample history samples and utilization of specified hardware with protium retention tiers on config.py.
+        Out of raw tier, only the first sample of every hour/day is kept, cost and detail files are daily already.
+        """
+        policy = common_retention.get_retention_policy('protium')
+
+        if not policy[0]:
+            logger.info('Protium retention is disabled (protium_retention_raw_days is 0), nothing to do.')
+            return
+
+        logger.info('Apply retention policy (raw ' + str(policy[0]) + ' days, hourly ' + str(policy[1] or 'forever') + ' days) on hardware ' + str(self.hardware) + ' ...')
+        bucket_dic = {}
+
+        for (key_list, sample_path) in common_manifest.scan_protium_hardware(self.hardware):
+            (year, month, day, day_time) = key_list
+            tier = common_retention.get_retention_tier(year, month, day, policy)
+
+            if tier != 'raw':
+                bucket_dic.setdefault((year, month, day, common_retention.get_bucket_key(day_time, tier)), []).append(sample_path)
+
+        sample_path_dic = {}
+
+        for sample_path_list in bucket_dic.values():
+            for sample_path in sample_path_list[1:]:
+                sample_path_dic[sample_path] = None
+
+        if sample_path_dic:
+            common_manifest.replace_protium_manifest_sample_path(self.hardware, sample_path_dic)
+
+            for sample_path in sample_path_dic.keys():
+                os.remove(sample_path)
+
+                if not os.listdir(os.path.dirname(sample_path)):
+                    os.rmdir(os.path.dirname(sample_path))
+
+        logger.info('    ' + str(len(sample_path_dic)) + ' samples are removed.')
+
+        utilization_file = os.path.join(config.db_path, 'protium/%s/utilization' % self.hardware)
+        (old_line_num, new_line_num) = common_retention.downsample_utilization_file(utilization_file, policy, line_format='protium')
+
+        if new_line_num != old_line_num:
+            logger.info('    ' + str(utilization_file) + ' : ' + str(old_line_num) + ' -> ' + str(new_line_num) + ' lines.')
+
+        logger.info('Done.')
+
     @staticmethod
     def get_protium_utilization(protium_dic=None):
         total_board_num = len(protium_dic.keys())
@@ -164,7 +258,7 @@ class PtmSampling:
         <project> including all project from self.project_list, and self.project*file if the project sampling is not 0
         """
         cost_dic = {project: 0 for project in self.project_list}
-        project_primary_factors = self.hardware_dic[self.hardware]['project_primary_factors']
+        project_resolver = self.get_project_resolver()
 
         for _, board_info_dic in protium_dic.items():
             if 'used_record' in board_info_dic:
@@ -176,7 +270,7 @@ class PtmSampling:
                         continue
 
                     if host and user:
-                        project_dic = common.get_project_info(project_primary_factors, self.project_proportion_dic, execute_host=host, user=user)
+                        project_dic = project_resolver.get_project_info(execute_host=host, user=user)
 
                         if project_dic:
                             for project in project_dic.keys():
@@ -199,7 +293,7 @@ class PtmSampling:
         if not protium_dic:
             return
 
-        project_primary_factors = self.hardware_dic[self.hardware]['project_primary_factors']
+        project_resolver = self.get_project_resolver()
 
         detail_info_dir = os.path.join(config.db_path, 'protium/%s/detail' % (self.hardware))
 
@@ -238,7 +332,7 @@ class PtmSampling:
 
             for used_record in protium_dic[board_uuid]['used_record']:
                 if used_record['user'] and used_record['host']:
-                    project_dic = common.get_project_info(project_primary_factors, self.project_proportion_dic, execute_host=used_record['host'], user=used_record['user'])
+                    project_dic = project_resolver.get_project_info(execute_host=used_record['host'], user=used_record['user'])
 
                     for project in project_dic:
                         if project in cost_detail_file_dic[self.current_date][board_id]:
@@ -261,7 +355,11 @@ def main():
 
     if args.hardware:
         protium_sample = PtmSampling(args.hardware)
-        protium_sample.sampling()
+
+        if args.retention:
+            protium_sample.apply_retention_policy()
+        else:
+            protium_sample.sampling()
 
 
 if __name__ == '__main__':
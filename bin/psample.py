@@ -3,13 +3,19 @@
 import os
 import re
 import sys
+import time
 import yaml
+import random
+import signal
+import asyncio
 import argparse
+import subprocess
 import datetime
 import logging
+import concurrent.futures
 
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
-from common import common, common_palladium
+from common import common, common_palladium, common_protium, common_db, common_delta, common_pack, common_retention, common_detail, common_cost, common_utilization, common_manifest, common_metrics
 from config import config
 
 
@@ -34,28 +40,165 @@ def read_args():
                         action='store_true',
                         default=False,
                         help='regenerate history utilization & cost information totally.')
+    parser.add_argument('--store',
+                        default=getattr(config, 'palladium_sample_store', 'yaml'),
+                        choices=['yaml', 'sqlite', 'delta'],
+                        help='Specify sample store, save sample as yaml file, into sqlite database, or as daily keyframe + per-sample delta file, default is "yaml".')
+    parser.add_argument('--import_yaml',
+                        action='store_true',
+                        default=False,
+                        help='import history yaml samples of specified hardware into sqlite sample database.')
+    parser.add_argument('--compact',
+                        action='store_true',
+                        default=False,
+                        help='compact cost ledgers, and detail utilization & cost journals of specified hardware.')
+    parser.add_argument('--pack',
+                        action='store_true',
+                        default=False,
+                        help='pack yaml samples of finished days of specified hardware into one compressed file per day.')
+    parser.add_argument('--retention',
+                        action='store_true',
+                        default=False,
+                        help='downsample history samples and utilization of specified hardware with retention policy on config.py.')
+    parser.add_argument('--daemon',
+                        action='store_true',
+                        default=False,
+                        help='run as daemon, sample all configured palladium and protium hardware periodically.')
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        default=min(8, os.cpu_count() or 1),
+                        help='Specify worker process number for --reconfig/--detail, default is "min(8, cpu_count)".')
 
     args = parser.parse_args()
 
     return args
 
 
+def init_sample_worker(hardware):
+    """
+    Init Sampling object for sample task worker process.
+    """
+    global worker_sampling
+    worker_sampling = Sampling(hardware)
+
+
+def run_sample_tasks(task_list, worker_func, hardware, jobs=1, title='Processing'):
+    """
+    Run sample tasks (with sample_path_list as the last item) on a process pool, yield worker results.
+    Report progress and throughput (samples/s) periodically.
+    """
+    total_task_num = len(task_list)
+    total_sample_num = sum([len(task[-1]) for task in task_list])
+    finished_task_num = 0
+    finished_sample_num = 0
+    start_time = time.time()
+    report_time = start_time
+
+    logger.info(str(title) + ' ' + str(total_sample_num) + ' samples in ' + str(total_task_num) + ' tasks with ' + str(jobs) + ' jobs ...')
+
+    if jobs <= 1:
+        init_sample_worker(hardware)
+        result_iter = (worker_func(task) for task in task_list)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_sample_worker, initargs=(hardware,))
+        future_list = [executor.submit(worker_func, task) for task in task_list]
+        result_iter = (future.result() for future in concurrent.futures.as_completed(future_list))
+
+    try:
+        for result in result_iter:
+            finished_task_num += 1
+            finished_sample_num += result[1]
+            current_time = time.time()
+
+            yield result
+
+            if (current_time - report_time >= 10) or (finished_task_num == total_task_num):
+                report_time = current_time
+                speed = round(finished_sample_num / max(current_time - start_time, 0.001), 1)
+                logger.info('    ' + str(finished_task_num) + '/' + str(total_task_num) + ' tasks, ' + str(finished_sample_num) + '/' + str(total_sample_num) + ' samples, ' + str(speed) + ' samples/s')
+    finally:
+        if jobs > 1:
+            for future in future_list:
+                future.cancel()
+
+            executor.shutdown()
+
+
+def reconfig_cost_worker(task):
+    """
+    Get per-day per-project cost partial sums for the samples of one hardware/emulator/date.
+    Return (task, sample_num, {<emulator>: {<project>: <cost>}}).
+    """
+    (hardware, emulator, date, sample_path_list) = task
+    emulator_cost_dic = {}
+
+    for sample_path in sample_path_list:
+        worker_sampling.domain_table = common_db.read_palladium_sample_table(sample_path)
+
+        if not worker_sampling.domain_table:
+            continue
+
+        worker_sampling.hardware = hardware
+        sample_emulator = worker_sampling.domain_table['emulator']
+        worker_sampling.get_cost_info()
+        project_cost_dic = emulator_cost_dic.setdefault(sample_emulator, {})
+
+        for (project, cost) in worker_sampling.palladium_cost_dic[hardware][sample_emulator].items():
+            project_cost_dic[project] = project_cost_dic.get(project, 0) + cost
+
+    return ((hardware, emulator, date), len(sample_path_list), emulator_cost_dic)
+
+
+def detail_month_worker(task):
+    """
+    Reduce the samples of one hardware/emulator/month into month detail utilization/cost tables.
+    Return (task, sample_num, {<emulator>: (utilization_dic, cost_dic)}).
+    """
+    (hardware, emulator, year, month, sample_list) = task
+    emulator_detail_dic = {}
+
+    for (day, sample_path) in sample_list:
+        worker_sampling.domain_table = common_db.read_palladium_sample_table(sample_path)
+
+        if not worker_sampling.domain_table:
+            continue
+
+        worker_sampling.hardware = hardware
+        worker_sampling.project_primary_factors = worker_sampling.hardware_dic[hardware]['project_primary_factors']
+        worker_sampling.current_date = r'%s-%s-%s' % (year, month, day)
+        (utilization_dic, cost_dic) = emulator_detail_dic.setdefault(worker_sampling.domain_table['emulator'], ({}, {}))
+        common_detail.merge_palladium_detail_lines(worker_sampling.gen_palladium_domain_journal_line_list(), utilization_dic, cost_dic, source='sample "' + str(sample_path) + '"')
+
+    return ((hardware, emulator, year, month), len(sample_list), emulator_detail_dic)
+
+
+def load_protium_sample():
+    """
+    Load protium sampler module bin/protium_sample.py.
+    """
+    bin_path = str(os.environ['EMU_MONITOR_INSTALL_PATH']) + '/bin'
+
+    if bin_path not in sys.path:
+        sys.path.append(bin_path)
+
+    import protium_sample
+
+    return protium_sample
+
+
 class Sampling:
     """
     Sample palladium usage information with command "test_server".
-    Save info into yaml files.
+    Save info into yaml files or sqlite sample database.
     """
-    def __init__(self, hardware):
+    def __init__(self, hardware, store='yaml', hardware_dic=None):
         self.hardware = hardware
-        self.hardware_dic = common_palladium.get_palladium_host_info()
-
-        self.current_year = datetime.datetime.now().strftime('%Y')
-        self.current_month = datetime.datetime.now().strftime('%m')
-        self.current_day = datetime.datetime.now().strftime('%d')
-        self.current_time = datetime.datetime.now().strftime('%H%M%S')
-        self.current_date = datetime.datetime.now().strftime('%Y-%m-%d')
+        self.store = store
+        self.hardware_dic = hardware_dic if hardware_dic is not None else common_palladium.get_palladium_host_info()
+        self.update_current_time()
 
         self.palladium_dic = {}
+        self.domain_table = common_palladium.DomainTable()
 
         # Get project related information.
         project_list_file = str(os.environ['EMU_MONITOR_INSTALL_PATH']) + r'/config/palladium/%s/project_list' % hardware
@@ -70,9 +213,21 @@ class Sampling:
         self.project_user_dic = common.parse_project_proportion_file(project_user_file)
 
         self.project_proportion_dic = {'execute_host': self.project_execute_host_dic, 'user': self.project_user_dic}
+        self.project_resolver = None
 
         self.palladium_cost_dic = {}
 
+    def update_current_time(self):
+        """
+        Set current sample time.
+        """
+        current_time_utc = datetime.datetime.now()
+        self.current_year = current_time_utc.strftime('%Y')
+        self.current_month = current_time_utc.strftime('%m')
+        self.current_day = current_time_utc.strftime('%d')
+        self.current_time = current_time_utc.strftime('%H%M%S')
+        self.current_date = current_time_utc.strftime('%Y-%m-%d')
+
     def create_db_path(self):
         """
         Create db_path if not exists.
@@ -84,17 +239,33 @@ class Sampling:
                 logger.error('Failed on creating database directory "' + str(self.current_db_path) + '". \n' + str(error))
                 sys.exit(1)
 
-    def sampling(self):
+    @common_metrics.instrument('palladium')
+    def sampling(self, test_server_info=None):
         """
-        Sample palladium usage information.
+        Sample palladium usage information, get it with test_server if test_server_info is not specified.
+        Every phase is timed on self.metrics.
         """
         logger.critical('>>> Sampling palladium usage information ...')
-        test_server = self.hardware_dic[self.hardware]['test_server']
-        host = self.hardware_dic[self.hardware]['test_server_host']
 
-        # Get palladium_dic.
-        test_server_info = common_palladium.get_test_server_info(self.hardware, test_server, host)
-        self.palladium_dic = common_palladium.parse_test_server_info(test_server_info)
+        # Get self.domain_table, and self.palladium_dic for saving.
+        if test_server_info is None:
+            test_server = self.hardware_dic[self.hardware]['test_server']
+            host = self.hardware_dic[self.hardware]['test_server_host']
+            test_server_info = common_palladium.iter_test_server_info(self.hardware, test_server, host)
+
+        # test_server output is parsed while it is streamed, parse time is the span without test_server waiting time.
+        with self.metrics.span('parse'):
+            try:
+                self.domain_table = common_palladium.parse_domain_table(self.metrics.iter_lines('test_server', test_server_info))
+            except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as error:
+                # Output of a timeout or failed test_server is incomplete, do not save it.
+                logger.error('Get test_server information failed, discard this sample: ' + str(error))
+                return
+
+            self.palladium_dic = self.domain_table.to_dict()
+
+        self.metrics.phase_dic['parse'] -= self.metrics.phase_dic.get('test_server', 0)
+        self.metrics.add_size('domains', len(self.domain_table))
 
         if self.palladium_dic:
             # Print debug information.
@@ -106,7 +277,14 @@ class Sampling:
 
             # Create datebase path.
             emulator = self.palladium_dic['emulator']
-            self.current_db_path = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator) + '/' + str(self.current_year) + '/' + str(self.current_month) + '/' + str(self.current_day)
+
+            if self.store == 'sqlite':
+                self.current_db_path = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator)
+            elif self.store == 'delta':
+                self.current_db_path = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator) + '/' + str(self.current_year) + '/' + str(self.current_month)
+            else:
+                self.current_db_path = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator) + '/' + str(self.current_year) + '/' + str(self.current_month) + '/' + str(self.current_day)
+
             self.create_db_path()
 
             domain_list_file = str(config.db_path) + '/' + str(self.hardware) + '/domain_list.yaml'
@@ -116,46 +294,87 @@ class Sampling:
                           'logic_drawer_list': [],
                           'domain_list': []}
 
-            for rack in self.palladium_dic['rack']:
+            for rack in self.domain_table.rack_list:
                 domain_dic.setdefault(rack, {})
                 domain_dic['rack_list'].append(rack)
 
-                for cluster in self.palladium_dic['rack'][rack]['cluster']:
-                    domain_dic[rack].setdefault(cluster, {})
-                    domain_dic['cluster_list'].append(cluster)
+            for (rack, cluster) in self.domain_table.cluster_dic:
+                domain_dic[rack].setdefault(cluster, {})
+                domain_dic['cluster_list'].append(cluster)
 
-                    for logic_drawer in self.palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer']:
-                        domain_dic[rack][cluster].setdefault(logic_drawer, [])
-                        domain_dic['logic_drawer_list'].append(logic_drawer)
+            for (rack, cluster, logic_drawer) in self.domain_table.logic_drawer_dic:
+                domain_dic[rack][cluster].setdefault(logic_drawer, [])
+                domain_dic['logic_drawer_list'].append(logic_drawer)
 
-                        for domain in self.palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain']:
-                            domain_dic[rack][cluster][logic_drawer].append(domain)
-                            domain_dic['domain_list'].append(domain)
+            for (rack, cluster, logic_drawer, domain) in self.domain_table.iter_columns('rack', 'cluster', 'logic_drawer', 'domain'):
+                domain_dic[rack][cluster][logic_drawer].append(domain)
+                domain_dic['domain_list'].append(domain)
 
-            with open(domain_list_file, 'w') as df:
-                df.write(yaml.dump(domain_dic, allow_unicode=True))
+            with self.metrics.span('domain_list'):
+                with open(domain_list_file, 'w') as df:
+                    df.write(yaml.dump(domain_dic, allow_unicode=True))
 
             # Save palladium_dic.
-            palladium_info_file = str(self.current_db_path) + '/' + str(self.current_time)
-
-            with open(palladium_info_file, 'a', encoding='utf-8') as PIF:
-                yaml.dump(self.palladium_dic, PIF, indent=4, sort_keys=False)
+            with self.metrics.span('save_sample'):
+                if self.store == 'sqlite':
+                    sample_db_file = common_db.get_palladium_sample_db_file(self.hardware)
+                    sample_ts = str(self.current_year) + str(self.current_month) + str(self.current_day) + str(self.current_time)
+                    sample_file_size = os.path.getsize(sample_db_file) if os.path.exists(sample_db_file) else 0
+
+                    # Sample database is locked (by --import_yaml or a crashed writer) or broken, discard the sample.
+                    if not common_db.save_palladium_sample(sample_db_file, self.hardware, sample_ts, self.palladium_dic):
+                        return
+
+                    palladium_info_file = common_db.gen_palladium_sample_path(sample_db_file, self.hardware, emulator, sample_ts)
+                    self.metrics.add_size('bytes_written', os.path.getsize(sample_db_file) - sample_file_size)
+                elif self.store == 'delta':
+                    delta_file = common_delta.get_palladium_delta_file(self.hardware, emulator, self.current_year, self.current_month, self.current_day)
+                    sample_file_size = os.path.getsize(delta_file) if os.path.exists(delta_file) else 0
+                    palladium_info_file = common_delta.save_palladium_delta_sample(self.hardware, emulator, self.current_year, self.current_month, self.current_day, self.current_time, self.palladium_dic)
+                    self.metrics.add_size('bytes_written', os.path.getsize(delta_file) - sample_file_size)
+                else:
+                    palladium_info_file = str(self.current_db_path) + '/' + str(self.current_time)
+
+                    with open(palladium_info_file, 'a', encoding='utf-8') as PIF:
+                        yaml.dump(self.palladium_dic, PIF, indent=4, sort_keys=False)
+
+                    self.metrics.add_size('bytes_written', os.path.getsize(palladium_info_file))
+
+            with self.metrics.span('manifest'):
+                common_manifest.add_palladium_manifest_record(self.hardware, emulator, self.current_year, self.current_month, self.current_day, self.current_time, palladium_info_file)
 
             # Save utilizationps
-            utilization = self.palladium_dic['utilization']
-            self.utilization_file = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator) + '/utilization'
+            with self.metrics.span('utilization'):
+                utilization = self.palladium_dic['utilization']
+                self.utilization_file = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator) + '/utilization'
 
-            with open(self.utilization_file, 'a', encoding='utf-8') as URF:
-                URF.write(str(self.current_year) + str(self.current_month) + str(self.current_day) + ' ' + str(self.current_time) + ' : ' + str(utilization) + '\n')
+                utilization_line = str(self.current_year) + str(self.current_month) + str(self.current_day) + ' ' + str(self.current_time) + ' : ' + str(utilization) + '\n'
+                common_utilization.append_utilization_sample(self.utilization_file, utilization_line, str(self.current_year) + str(self.current_month) + str(self.current_day) + str(self.current_time), utilization)
 
             # get self.palladium_cost_dic.
-            self.get_cost_info()
+            with self.metrics.span('get_cost_info'):
+                self.get_cost_info()
 
             # Update palladium cost file.
-            self.update_cost_file(emulator)
+            with self.metrics.span('update_cost_file'):
+                self.update_cost_file(emulator)
 
             # get detail palladium utilization info
-            self.get_palladium_domain_info()
+            with self.metrics.span('get_palladium_domain_info'):
+                self.get_palladium_domain_info()
+
+            logger.debug('    Project resolver : ' + self.get_project_resolver().get_cache_info())
+            logger.debug('    Sample metrics : ' + ', '.join([str(phase) + '=' + str(round(seconds, 3)) + 's' for (phase, seconds) in self.metrics.phase_dic.items()]))
+            self.metrics.success = True
+
+    def get_project_resolver(self):
+        """
+        Get project resolver for self.project_primary_factors, it is rebuilt only when project_primary_factors changes.
+        """
+        if (self.project_resolver is None) or (self.project_resolver.project_primary_factors != self.project_primary_factors):
+            self.project_resolver = common.ProjectResolver(self.project_primary_factors, self.project_proportion_dic)
+
+        return self.project_resolver
 
     def get_cost_info(self):
         """
@@ -163,7 +382,7 @@ class Sampling:
         self.palladium_cost_dic = {<Hardware> : {<Emulator>: {<Project>: <sampling_counts>}}}
         <project> including all project from self.project_list, and self.project*file if the project sampling is not 0
         """
-        emulator = self.palladium_dic['emulator']
+        emulator = self.domain_table['emulator']
 
         self.palladium_cost_dic.setdefault(self.hardware, {})
         self.palladium_cost_dic[self.hardware].setdefault(emulator, {})
@@ -173,237 +392,666 @@ class Sampling:
         self.project_primary_factors = ''
 
         self.project_primary_factors = self.hardware_dic[self.hardware]['project_primary_factors']
+        project_resolver = self.get_project_resolver()
 
-        for rack in self.palladium_dic['rack'].keys():
-            for cluster in self.palladium_dic['rack'][rack]['cluster'].keys():
-                for logic_drawer in self.palladium_dic['rack'][rack]['cluster'][cluster]["logic_drawer"].keys():
-                    for domain, palladium_record in self.palladium_dic['rack'][rack]['cluster'][cluster]["logic_drawer"][logic_drawer]['domain'].items():
-                        owner = palladium_record['owner']
-                        pid = palladium_record['pid']
+        for (owner, pid) in self.domain_table.iter_columns('owner', 'pid'):
+            if pid == 0 or pid == '0':
+                continue
 
-                        if pid == 0 or pid == '0':
-                            continue
+            exec_host = pid.split(':')[0]
 
-                        exec_host = pid.split(':')[0]
+            if exec_host:
+                project_dic = project_resolver.get_project_info(execute_host=exec_host, user=owner)
 
-                        if exec_host:
-                            project_dic = common.get_project_info(self.project_primary_factors, self.project_proportion_dic, execute_host=exec_host, user=owner)
+                if project_dic:
+                    for project in project_dic.keys():
+                        if project not in self.palladium_cost_dic[self.hardware][emulator]:
+                            self.palladium_cost_dic[self.hardware][emulator].setdefault(project, project_dic[project])
+                        else:
+                            self.palladium_cost_dic[self.hardware][emulator][project] += project_dic[project]
 
-                            if project_dic:
-                                for project in project_dic.keys():
-                                    if project not in self.palladium_cost_dic[self.hardware][emulator]:
-                                        self.palladium_cost_dic[self.hardware][emulator].setdefault(project, project_dic[project])
-                                    else:
-                                        self.palladium_cost_dic[self.hardware][emulator][project] += project_dic[project]
+                        if project not in self.project_list:
+                            self.project_list.append(project)
+                else:
+                    self.palladium_cost_dic[self.hardware][emulator]['others'] += 1
 
-                                    if project not in self.project_list:
-                                        self.project_list.append(project)
-                            else:
-                                self.palladium_cost_dic[self.hardware][emulator]['others'] += 1
-
-    def update_cost_file(self, emulator):
+    def update_cost_file(self, emulator, compact=True):
         """
-        Update cost_file for specified emulator.
+        Append current sample cost into cost ledger for specified emulator, compact it into cost file when needed.
+        Without palladium_enable_cost_ledger, the cost file is compacted on every sample.
         """
-        cost_file = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator) + '/cost'
         current_project_dic = self.palladium_cost_dic[self.hardware][emulator]
-        total_cost_dic = {}
 
         logger.critical('>>> Updating palladium cost file ...')
+        logger.debug('    ' + common_cost.gen_cost_line(self.current_date, current_project_dic).strip())
+
+        common_cost.append_palladium_cost_ledger(self.hardware, emulator, self.current_date, current_project_dic)
+
+        if not compact:
+            return
+
+        if not getattr(config, 'palladium_enable_cost_ledger', True):
+            common_cost.compact_palladium_cost(self.hardware, emulator)
+        elif common_cost.need_compact_palladium_cost(self.hardware, emulator):
+            common_cost.compact_palladium_cost(self.hardware, emulator, block=False)
+
+    def reconfig_cost_file(self, jobs=1):
+        """
+        Regenerate all cost files from history samples.
+        Samples are grouped by hardware/emulator/date and summed on worker processes, every finished task is recorded
+        into checkpoint file, so an interrupted reconfig resumes from the checkpoint on next run.
+        Only samples up to the cutoff (old cost files backup time, saved on checkpoint file) are regenerated, later
+        samples are on the new cost ledger already, and the cost compacted from it by live samplers is kept.
+        """
+        logger.info('Generate new cost infomation ...')
 
-        # Parsing cost file and get cost dic
-        if not os.path.exists(cost_file):
-            total_cost_dic[self.current_date] = current_project_dic
+        if not os.path.exists(config.db_path):
+            logger.error('Could not find db path: %s' % str(config.db_path))
+            return
+
+        checkpoint_file = str(config.db_path) + '/.reconfig.checkpoint'
+        hardware_list = list(self.hardware_dic.keys())
+        total_cost_dic = {}
+        finished_task_set = set()
+        written_emulator_set = set()
+        cutoff = ''
+
+        if os.path.exists(checkpoint_file):
+            logger.info('Resume from checkpoint file "' + str(checkpoint_file) + '", remove it to reconfig from the beginning.')
+
+            with open(checkpoint_file, 'r') as CPF:
+                for line in CPF:
+                    if line.strip():
+                        checkpoint_dic = yaml.load(line, Loader=yaml.FullLoader)
+
+                        if 'cutoff' in checkpoint_dic:
+                            cutoff = str(checkpoint_dic['cutoff'])
+                        elif 'written' in checkpoint_dic:
+                            written_emulator_set.add(tuple(checkpoint_dic['written']))
+                        else:
+                            finished_task_set.add(tuple(checkpoint_dic['task']))
+                            self.merge_reconfig_cost(total_cost_dic, checkpoint_dic['task'][0], checkpoint_dic['task'][2], checkpoint_dic['cost'])
+
+            if not cutoff:
+                logger.error('Could not find cutoff on checkpoint file "' + str(checkpoint_file) + '", please remove it and reconfig again.')
+                return
         else:
-            with open(cost_file, 'r') as CF:
-                for line in CF:
-                    line_s = line.replace('\n', '').split()
+            cutoff = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
 
-                    if re.match(r'^\s*$', line):
-                        continue
+            # Backup old cost files.
+            for hardware in hardware_list:
+                hardware_path = str(config.db_path) + '/' + str(hardware)
 
-                    # Get date & project:cost infomation
-                    if re.match(r'^\S+\s*(\S+:\S+\s*)+$', line):
-                        date = line_s[0].strip()
-                        history_project_cost_dic = {cost_info.split(':')[0].strip(): int(cost_info.split(':')[1].strip()) for cost_info in line_s[1:]}
-                    else:
-                        logger.warning('Could not find valid infomation in cost file line: ' + line + '!')
-                        continue
+                if not os.path.isdir(hardware_path):
+                    continue
 
-                    total_cost_dic[date] = history_project_cost_dic
+                for dir_path, dir_name_list, file_name_list in os.walk(hardware_path):
+                    for file_name in file_name_list:
+                        if re.match(r'^cost(\.ledger(\.compacting\.\d+)?)?$', file_name):
+                            file_path = os.path.join(dir_path, file_name)
+                            os.rename(os.path.join(dir_path, file_name), r'%s.%s' % (file_path, datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')))
 
-            # Get cost file total project list
-            total_project_list = list(total_cost_dic[list(total_cost_dic.keys())[0]].keys())
-            total_project_list = list(set(total_project_list).union(set(list(current_project_dic.keys()))))
+            with open(checkpoint_file, 'w') as CPF:
+                CPF.write(yaml.dump({'cutoff': cutoff}, default_flow_style=True, width=float('inf')))
 
-            for project in total_project_list:
-                for date in total_cost_dic:
-                    if project not in total_cost_dic[date]:
-                        total_cost_dic[date][project] = 0
+        # Group samples by hardware/emulator/date, samples after cutoff are on the new cost ledger.
+        task_dic = {}
 
-                if project not in current_project_dic:
-                    current_project_dic[project] = 0
+        for (hardware, emulator, year, month, day, day_time, sample_path) in common_db.get_palladium_history_sample_list(config.db_path, hardware_list=hardware_list):
+            if (str(year) + str(month) + str(day) + str(day_time).zfill(6)) < cutoff:
+                task_dic.setdefault((hardware, emulator, r'%s-%s-%s' % (year, month, day)), []).append(sample_path)
 
-            if self.current_date in total_cost_dic:
-                total_cost_dic[self.current_date] = {project: (total_cost_dic[self.current_date][project] + current_project_dic[project]) for project in current_project_dic.keys()}
-            else:
-                total_cost_dic[self.current_date] = current_project_dic
+        task_list = [(task[0], task[1], task[2], sample_path_list) for (task, sample_path_list) in task_dic.items() if task not in finished_task_set]
 
-        # write new cost file
-        with open(cost_file, 'w') as CF:
-            for date in total_cost_dic:
-                line = date + ' '
+        cutoff_date = '%s-%s-%s' % (cutoff[0:4], cutoff[4:6], cutoff[6:8])
 
-                for project in total_cost_dic[date]:
-                    line += '{:<15}'.format(r'%s:%s' % (project, str(total_cost_dic[date][project])))
+        with open(checkpoint_file, 'a') as CPF:
+            for (task, sample_num, emulator_cost_dic) in run_sample_tasks(task_list, reconfig_cost_worker, self.hardware, jobs=jobs, title='Reconfig cost with'):
+                self.merge_reconfig_cost(total_cost_dic, task[0], task[2], emulator_cost_dic)
+                CPF.write(yaml.dump({'task': list(task), 'cost': emulator_cost_dic}, default_flow_style=True, sort_keys=False, width=float('inf')))
+                CPF.flush()
 
-                logger.debug('    ' + line)
-                CF.write(line + '\n')
+            # Write every cost file once, the written ones are recorded so a resumed reconfig does not merge them twice.
+            for (hardware, emulator) in total_cost_dic:
+                if (hardware, emulator) in written_emulator_set:
+                    continue
 
-    def reconfig_cost_file(self):
-        logger.info('Generate new cost infomation ...')
+                cost_file_dic = common_cost.get_palladium_cost_file_dic(hardware, emulator)
+                emulator_cost_dic = total_cost_dic[(hardware, emulator)]
+                LF = common.lock_file(cost_file_dic['lock'], exclusive=True)
 
-        if not os.path.exists(config.db_path):
-            logger.error('Could not find db path: %s' % str(config.db_path))
+                try:
+                    # Cost file only has the cost compacted from the new ledger by live samplers since cutoff.
+                    for (date, project_cost_dic) in common_cost.read_cost_file(cost_file_dic['cost']).items():
+                        if date >= cutoff_date:
+                            self.merge_reconfig_cost(total_cost_dic, hardware, date, {emulator: project_cost_dic})
 
-        for dir_path, dir_name_list, file_name_list in os.walk(config.db_path):
-            for file_name in file_name_list:
-                if re.match(r'^cost$', file_name):
-                    file_path = os.path.join(dir_path, file_name)
-                    os.rename(os.path.join(dir_path, file_name), r'%s.%s' % (file_path, datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')))
+                    common_cost.write_cost_file(cost_file_dic['cost'], {date: emulator_cost_dic[date] for date in sorted(emulator_cost_dic.keys())})
+                finally:
+                    common.unlock_file(LF)
 
-                if re.match(r'^\d+$', file_name):
-                    file_path = os.path.join(dir_path, file_name)
-                    self.palladium_dic = {}
+                CPF.write(yaml.dump({'written': [hardware, emulator]}, default_flow_style=True, width=float('inf')))
+                CPF.flush()
+                logger.info('    Cost file "' + str(cost_file_dic['cost']) + '" is updated.')
 
-                    with open(file_path, 'r') as ff:
-                        self.palladium_dic = yaml.load(ff, Loader=yaml.FullLoader)
+        os.remove(checkpoint_file)
 
-                    dir_item_list = dir_path.split('/')
+    @staticmethod
+    def merge_reconfig_cost(total_cost_dic, hardware, date, emulator_cost_dic):
+        """
+        Merge reconfig task result into total_cost_dic = {(<hardware>, <emulator>): {<date>: {<project>: <cost>}}}.
+        """
+        for (emulator, project_cost_dic) in emulator_cost_dic.items():
+            date_cost_dic = total_cost_dic.setdefault((hardware, emulator), {}).setdefault(date, {})
 
-                    for hardware in self.hardware_dic:
-                        if hardware in dir_item_list:
-                            self.hardware = hardware
+            for (project, cost) in project_cost_dic.items():
+                date_cost_dic[project] = date_cost_dic.get(project, 0) + cost
 
-                    emulator = self.palladium_dic['emulator']
-                    self.current_date = r'%s-%s-%s' % (dir_item_list[-3], dir_item_list[-2], dir_item_list[-1])
+    def get_palladium_domain_info(self, compact=True):
+        """
+        get palladium detail info based on domain, append sampling/used/project cost increments into month journal.
+        """
+        emulator = self.domain_table['emulator']
+        detail_info_dir = common_detail.get_palladium_detail_dir(self.hardware, emulator)
+        journal_line_list = self.gen_palladium_domain_journal_line_list()
 
-                    # get self.palladium_cost_dic.
-                    self.get_cost_info()
+        common_detail.append_palladium_detail_journal(detail_info_dir, self.current_year, self.current_month, journal_line_list)
 
-                    # Update palladium cost file.
-                    self.update_cost_file(emulator)
+        if compact and common_detail.need_compact_palladium_detail(detail_info_dir, self.current_year, self.current_month):
+            common_detail.compact_palladium_detail(detail_info_dir, self.current_year, self.current_month, block=False)
 
-    def get_palladium_domain_info(self):
+    def gen_palladium_domain_journal_line_list(self):
         """
-        get palladium detail info based on domain
+        Generate detail journal lines (sampling/used/project cost of every domain) for self.domain_table.
+        The rack/cluster/logic_drawer without domain gets a structure line, so it is still on the month tables.
         """
-        emulator = self.palladium_dic['emulator']
+        journal_line_list = []
+        project_resolver = self.get_project_resolver()
+        logic_drawer_set = set(self.domain_table.iter_columns('rack', 'cluster', 'logic_drawer'))
+        cluster_set = set(key[:2] for key in self.domain_table.logic_drawer_dic) | set(key[:2] for key in logic_drawer_set)
+        rack_set = set(key[0] for key in self.domain_table.cluster_dic) | set(key[0] for key in cluster_set)
 
-        detail_info_dir = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator) + '/detail/'
+        for rack in self.domain_table.rack_list:
+            if rack not in rack_set:
+                journal_line_list.append(common_detail.gen_palladium_detail_structure_line(self.current_date, rack))
 
-        if not os.path.exists(detail_info_dir):
-            os.makedirs(detail_info_dir)
+        for key in self.domain_table.cluster_dic:
+            if key not in cluster_set:
+                journal_line_list.append(common_detail.gen_palladium_detail_structure_line(self.current_date, *key))
 
-        utilization_detail_file = os.path.join(detail_info_dir, '%s.%s.utilization' % (str(self.current_year), str(self.current_month)))
-        cost_detail_file = os.path.join(detail_info_dir, '%s.%s.cost' % (str(self.current_year), str(self.current_month)))
-        lock_file = os.path.join(detail_info_dir, '.lock')
+        for key in self.domain_table.logic_drawer_dic:
+            if key not in logic_drawer_set:
+                journal_line_list.append(common_detail.gen_palladium_detail_structure_line(self.current_date, *key))
 
-        if os.path.exists(lock_file):
+        for (rack, cluster, logic_drawer, domain, owner, pid) in self.domain_table.iter_columns('rack', 'cluster', 'logic_drawer', 'domain', 'owner', 'pid'):
+            project_dic = {}
+
+            if pid == 0 or pid == '0':
+                journal_line_list.append(common_detail.gen_palladium_detail_journal_line(self.current_date, rack, cluster, logic_drawer, domain, 0))
+                continue
+
+            exec_host = pid.split(':')[0]
+
+            if exec_host:
+                project_dic = project_resolver.get_project_info(execute_host=exec_host, user=owner)
+
+            journal_line_list.append(common_detail.gen_palladium_detail_journal_line(self.current_date, rack, cluster, logic_drawer, domain, 1, project_dic))
+
+        return journal_line_list
+
+    def compact_palladium_cost_info(self, hardware_list=None):
+        """
+        Compact cost ledgers of all emulators under specified hardware (or hardware_list).
+        """
+        if hardware_list is None:
+            hardware_list = [self.hardware, ]
+
+        for hardware in hardware_list:
+            hardware_path = str(config.db_path) + '/' + str(hardware)
+
+            if not os.path.exists(hardware_path):
+                continue
+
+            for emulator in sorted(os.listdir(hardware_path)):
+                if os.path.isdir(os.path.join(hardware_path, emulator)) and common_cost.get_palladium_cost_ledger_list(hardware, emulator):
+                    logger.info('Compact cost ledger for ' + str(hardware) + '/' + str(emulator) + ' ...')
+                    common_cost.compact_palladium_cost(hardware, emulator)
+
+    def compact_palladium_detail_info(self):
+        """
+        Compact detail journals of all emulators under specified hardware.
+        """
+        hardware_path = str(config.db_path) + '/' + str(self.hardware)
+
+        if not os.path.exists(hardware_path):
+            logger.error('Could not find hardware db path: %s' % str(hardware_path))
             return
-        else:
-            with open(lock_file, 'w') as lf:
-                lf.write(str(datetime.datetime.now().timestamp()))
 
-        if not os.path.exists(utilization_detail_file):
-            utilization_detail_file_dic = {}
-        else:
-            with open(utilization_detail_file, 'r') as uf:
-                utilization_detail_file_dic = yaml.load(uf, Loader=yaml.FullLoader)
+        for emulator in sorted(os.listdir(hardware_path)):
+            detail_info_dir = common_detail.get_palladium_detail_dir(self.hardware, emulator)
 
-        if not os.path.exists(cost_detail_file):
-            cost_detail_file_dic = {}
-        else:
-            with open(cost_detail_file, 'r') as cf:
-                cost_detail_file_dic = yaml.load(cf, Loader=yaml.FullLoader)
+            if os.path.isdir(detail_info_dir):
+                logger.info('Compact detail journal for ' + str(self.hardware) + '/' + str(emulator) + ' ...')
+                common_detail.compact_palladium_detail_dir(detail_info_dir)
 
-        utilization_detail_file_dic.setdefault(self.current_date, {})
-        cost_detail_file_dic.setdefault(self.current_date, {})
+    def pack_palladium_samples(self):
+        """
+        Pack yaml sample files of finished days into one compressed <day>.pack file per day.
+        Manifest is switched to the packed samples before the sample files are removed.
+        """
+        compression = getattr(config, 'palladium_pack_compression', 'gzip')
+        day_path_list = common_pack.get_finished_palladium_day_list(self.hardware)
+        pack_sample_num = 0
 
-        for rack in self.palladium_dic['rack'].keys():
-            utilization_detail_file_dic[self.current_date].setdefault(rack, {})
-            cost_detail_file_dic[self.current_date].setdefault(rack, {})
+        logger.info('Pack ' + str(len(day_path_list)) + ' finished days of hardware ' + str(self.hardware) + ' with ' + str(compression) + ' ...')
 
-            for cluster in self.palladium_dic['rack'][rack]['cluster'].keys():
-                utilization_detail_file_dic[self.current_date][rack].setdefault(cluster, {})
-                cost_detail_file_dic[self.current_date][rack].setdefault(cluster, {})
+        for day_path in day_path_list:
+            sample_path_dic = common_pack.pack_palladium_day(day_path, compression=compression)
 
-                for logic_drawer in self.palladium_dic['rack'][rack]['cluster'][cluster]["logic_drawer"].keys():
-                    utilization_detail_file_dic[self.current_date][rack][cluster].setdefault(logic_drawer, {})
-                    cost_detail_file_dic[self.current_date][rack][cluster].setdefault(logic_drawer, {})
+            if sample_path_dic:
+                common_manifest.replace_palladium_manifest_sample_path(self.hardware, sample_path_dic)
+                common_pack.remove_packed_day(day_path, list(sample_path_dic.keys()))
+                pack_sample_num += len(sample_path_dic)
+                logger.info('    ' + str(day_path) + ' : ' + str(len(sample_path_dic)) + ' samples packed.')
 
-                    for domain, palladium_record in self.palladium_dic['rack'][rack]['cluster'][cluster]["logic_drawer"][logic_drawer]['domain'].items():
-                        owner = palladium_record['owner']
-                        pid = palladium_record['pid']
-                        utilization_detail_file_dic[self.current_date][rack][cluster][logic_drawer].setdefault(domain, {'sampling': 0, 'used': 0})
-                        utilization_detail_file_dic[self.current_date][rack][cluster][logic_drawer][domain]['sampling'] += 1
-                        cost_detail_file_dic[self.current_date][rack][cluster][logic_drawer].setdefault(domain, {})
+        logger.info('Done, ' + str(pack_sample_num) + ' samples packed.')
 
-                        if pid == 0 or pid == '0':
-                            continue
+    def apply_retention_policy(self):
+        """
+        Downsample history samples and utilization of specified hardware with palladium retention tiers on config.py.
+        Samples out of raw tier are merged into one rollup per hour/day on <day>.rollup, cost and detail utilization
+        regenerated from rollups are the same as from the merged samples.
+        """
+        policy = common_retention.get_retention_policy('palladium')
+
+        if not policy[0]:
+            logger.info('Palladium retention is disabled (palladium_retention_raw_days is 0), nothing to do.')
+            return
+
+        logger.info('Apply retention policy (raw ' + str(policy[0]) + ' days, hourly ' + str(policy[1] or 'forever') + ' days) on hardware ' + str(self.hardware) + ' ...')
+        day_dic = {}
+        sqlite_sample_num = 0
 
-                        utilization_detail_file_dic[self.current_date][rack][cluster][logic_drawer][domain]['used'] += 1
+        for (hardware, emulator, year, month, day, day_time, sample_path) in common_db.get_palladium_history_sample_list(config.db_path, hardware_list=[self.hardware, ]):
+            tier = common_retention.get_retention_tier(year, month, day, policy)
 
-                        exec_host = pid.split(':')[0]
+            if tier == 'raw':
+                continue
+            elif common_db.parse_palladium_sample_path(sample_path):
+                sqlite_sample_num += 1
+                continue
 
-                        if exec_host:
-                            project_dic = common.get_project_info(self.project_primary_factors, self.project_proportion_dic, execute_host=exec_host, user=owner)
+            day_dic.setdefault((emulator, year, month, day, tier), []).append((day_time, sample_path))
 
-                            for project in project_dic:
-                                if project in cost_detail_file_dic[self.current_date][rack][cluster][logic_drawer][domain]:
-                                    cost_detail_file_dic[self.current_date][rack][cluster][logic_drawer][domain][project] += project_dic[project]
-                                else:
-                                    cost_detail_file_dic[self.current_date][rack][cluster][logic_drawer][domain][project] = project_dic[project]
+        if sqlite_sample_num:
+            logger.warning('Retention policy is not applied on ' + str(sqlite_sample_num) + ' samples of sqlite sample database.')
 
-        with open(utilization_detail_file, 'w') as uf:
-            uf.write(yaml.dump(utilization_detail_file_dic, allow_unicode=True))
+        rollup_sample_num = 0
 
-        with open(cost_detail_file, 'w') as cf:
-            cf.write(yaml.dump(cost_detail_file_dic, allow_unicode=True))
+        for ((emulator, year, month, day, tier), sample_list) in sorted(day_dic.items()):
+            rollup_sample_num += self.rollup_palladium_day(emulator, year, month, day, tier, sample_list)
 
-        os.remove(lock_file)
+        logger.info('    ' + str(rollup_sample_num) + ' samples are merged into rollups.')
 
-    def get_history_palladium_detail_info(self):
+        hardware_path = str(config.db_path) + '/' + str(self.hardware)
+
+        for emulator in sorted(os.listdir(hardware_path)):
+            utilization_file = os.path.join(hardware_path, emulator, 'utilization')
+
+            if os.path.isfile(utilization_file):
+                (old_line_num, new_line_num) = common_retention.downsample_utilization_file(utilization_file, policy)
+
+                if new_line_num != old_line_num:
+                    logger.info('    ' + str(utilization_file) + ' : ' + str(old_line_num) + ' -> ' + str(new_line_num) + ' lines.')
+
+        logger.info('Done.')
+
+    def rollup_palladium_day(self, emulator, year, month, day, tier, sample_list):
+        """
+        Merge samples [(<time>, <sample_path>), ...] of one emulator day into rollups on tier, switch manifest to the rollups,
+        then remove the merged sample files. Return merged sample number.
+        """
+        day_path = str(config.db_path) + '/' + str(self.hardware) + '/' + str(emulator) + '/' + str(year) + '/' + str(month)
+        rollup_file = day_path + '/' + str(day) + common_retention.PALLADIUM_ROLLUP_SUFFIX
+        bucket_dic = {}
+        rollup_list = []
+        sample_path_dic = {}
+        changed = False
+
+        for (day_time, sample_path) in sorted(sample_list):
+            bucket_dic.setdefault(common_retention.get_bucket_key(day_time, tier), []).append((day_time, sample_path))
+
+        for bucket_sample_list in bucket_dic.values():
+            source_list = []
+
+            for (day_time, sample_path) in bucket_sample_list:
+                rollup_sample = common_retention.parse_palladium_rollup_sample_path(sample_path)
+
+                if rollup_sample:
+                    rollup_dic = common_retention.read_palladium_rollup(*rollup_sample)
+                else:
+                    palladium_dic = common_db.read_palladium_sample(sample_path)
+                    rollup_dic = common_retention.gen_palladium_rollup(day_time, tier, palladium_dic) if palladium_dic else None
+
+                if rollup_dic:
+                    source_list.append(rollup_dic)
+
+            if not source_list:
+                continue
+
+            # Day is already on this tier if every bucket is one rollup of this tier.
+            if (len(source_list) != len(bucket_sample_list)) or (len(source_list) > 1) or (not common_retention.parse_palladium_rollup_sample_path(bucket_sample_list[0][1])) or (source_list[0]['tier'] != tier):
+                changed = True
+
+            rollup_dic = common_retention.merge_palladium_rollup(source_list, tier)
+            rollup_list.append(rollup_dic)
+
+            for (day_time, sample_path) in bucket_sample_list:
+                sample_path_dic[sample_path] = common_retention.gen_palladium_rollup_sample_path(rollup_file, rollup_dic['time']) if (day_time == rollup_dic['time']) else None
+
+        if not changed:
+            return 0
+
+        common_retention.write_palladium_rollup_list(rollup_file, rollup_list)
+        common_manifest.replace_palladium_manifest_sample_path(self.hardware, sample_path_dic)
+
+        # Remove merged samples.
+        merged_sample_num = 0
+
+        for (sample_path, new_sample_path) in sample_path_dic.items():
+            if sample_path == new_sample_path:
+                continue
+
+            merged_sample_num += 1
+            sample_file = sample_path
+
+            for parse_func in (common_pack.parse_palladium_pack_sample_path, common_delta.parse_palladium_delta_sample_path, common_retention.parse_palladium_rollup_sample_path):
+                if parse_func(sample_path):
+                    sample_file = parse_func(sample_path)[0]
+
+            if (sample_file != rollup_file) and os.path.isfile(sample_file):
+                os.remove(sample_file)
+
+        day_dir = day_path + '/' + str(day)
+
+        if os.path.isdir(day_dir) and (not os.listdir(day_dir)):
+            os.rmdir(day_dir)
+
+        return merged_sample_num
+
+    def get_history_palladium_detail_info(self, jobs=1):
+        """
+        Regenerate all month detail utilization/cost files from history samples.
+        Samples are grouped by hardware/emulator/month and reduced on worker processes, every month file is written once.
+        """
         logger.info('Generate history utilization & cost information ...')
 
         if not os.path.exists(config.db_path):
             logger.error('Could not find db path: %s' % str(config.db_path))
+            return
+
+        hardware_list = list(self.hardware_dic.keys())
+
+        # Lock every emulator detail directory against compaction until all months are replaced, then freeze current
+        # journals before listing samples. Live samplers keep appending into new journals, only samples before the
+        # cutoff are regenerated.
+        regenerate_lock_list = []
+        frozen_journal_dic = {}
+
+        try:
+            for hardware in hardware_list:
+                hardware_path = str(config.db_path) + '/' + str(hardware)
+
+                if os.path.isdir(hardware_path):
+                    for emulator in sorted(os.listdir(hardware_path)):
+                        if emulator.startswith('.') or (not os.path.isdir(os.path.join(hardware_path, emulator))):
+                            continue
+
+                        detail_info_dir = common_detail.get_palladium_detail_dir(hardware, emulator)
+                        os.makedirs(detail_info_dir, exist_ok=True)
+                        regenerate_lock_list.append(common_detail.lock_palladium_detail_regeneration(detail_info_dir, exclusive=True))
+                        frozen_journal_dic[detail_info_dir] = common_detail.freeze_palladium_detail_journal(detail_info_dir)
+
+            cutoff = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+            task_dic = {}
+
+            for (hardware, emulator, year, month, day, day_time, sample_path) in common_db.get_palladium_history_sample_list(config.db_path, hardware_list=hardware_list):
+                if (str(year) + str(month) + str(day) + str(day_time).zfill(6)) < cutoff:
+                    task_dic.setdefault((hardware, emulator, year, month), []).append((day, sample_path))
+
+            task_list = [(task[0], task[1], task[2], task[3], sample_list) for (task, sample_list) in task_dic.items()]
+
+            for (task, sample_num, emulator_detail_dic) in run_sample_tasks(task_list, detail_month_worker, self.hardware, jobs=jobs, title='Regenerate detail information with'):
+                (hardware, emulator, year, month) = task
+
+                for (sample_emulator, (utilization_dic, cost_dic)) in emulator_detail_dic.items():
+                    detail_info_dir = common_detail.get_palladium_detail_dir(hardware, sample_emulator)
+                    common_detail.replace_palladium_detail(detail_info_dir, year, month, utilization_dic, cost_dic, frozen_journal_dic.get(detail_info_dir, []))
+                    logger.debug('    Detail information of ' + str(hardware) + '/' + str(sample_emulator) + ' ' + str(year) + '.' + str(month) + ' is updated.')
+        finally:
+            for LF in regenerate_lock_list:
+                common.unlock_file(LF)
+
+
+class SamplingDaemon:
+    """
+    Sample all configured palladium and protium hardware periodically in one process.
+    Every hardware runs on its own interval (with jitter), test_server/ptmRun commands run as asyncio subprocesses.
+    """
+    def __init__(self, store='yaml'):
+        self.store = store
+        self.interval = int(getattr(config, 'sample_interval', 7200))
+        self.jitter = int(getattr(config, 'sample_jitter', 60))
+        self.sampler_dic = {}
+
+        # Parse/save jobs run on self.executor, the last job future of every hardware is on self.job_future_dic.
+        self.executor = None
+        self.job_future_dic = {}
+
+        # Find hardware to sample, the sampler of every hardware is recreated on every sample (see refresh_sampler).
+        palladium_hardware_dic = common_palladium.get_palladium_host_info()
+
+        for hardware in palladium_hardware_dic:
+            if palladium_hardware_dic[hardware].get('test_server'):
+                self.sampler_dic['palladium/' + str(hardware)] = Sampling(hardware, store=store, hardware_dic=palladium_hardware_dic)
+
+        protium_config_dir = str(os.environ['EMU_MONITOR_INSTALL_PATH']) + '/config/protium'
+
+        if os.path.isdir(protium_config_dir) and os.listdir(protium_config_dir):
+            protium_sample = load_protium_sample()
+            protium_hardware_dic = common_protium.get_protium_host_info()
+
+            for hardware in protium_hardware_dic:
+                if protium_hardware_dic[hardware].get('ptmRun'):
+                    self.sampler_dic['protium/' + str(hardware)] = protium_sample.PtmSampling(hardware, hardware_dic=protium_hardware_dic)
+
+    def create_sampler(self, name):
+        """
+        Create palladium/protium sampler with the current hardware config and project files.
+        """
+        (kind, hardware) = name.split('/', 1)
+
+        if kind == 'palladium':
+            sampler = Sampling(hardware, store=self.store, hardware_dic=common_palladium.get_palladium_host_info())
+        else:
+            sampler = load_protium_sample().PtmSampling(hardware, hardware_dic=common_protium.get_protium_host_info())
+
+        if hardware not in sampler.hardware_dic:
+            raise Exception('hardware is not on config any more')
+
+        return sampler
+
+    def refresh_sampler(self, name):
+        """
+        Recreate the sampler of hardware, so changes on project list/proportion files and project_primary_factors
+        are picked up without restarting the daemon. Keep the previous sampler if the config is broken.
+        """
+        try:
+            self.sampler_dic[name] = self.create_sampler(name)
+        except Exception as error:
+            logger.warning('[' + str(name) + '] reload config failed, sample with the previous config: ' + str(error))
 
-        for dir_path, dir_name_list, file_name_list in os.walk(config.db_path):
-            for file_name in file_name_list:
-                if re.match(r'^\d+$', file_name):
-                    file_path = os.path.join(dir_path, file_name)
+        return self.sampler_dic[name]
 
-                    logger.info("Reading file: %s..." % str(file_path))
+    def is_job_running(self, name):
+        """
+        Check whether the last parse/save job of hardware is still running.
+        """
+        job_future = self.job_future_dic.get(name)
 
-                    self.palladium_dic = {}
-                    self.project_primary_factors = ''
+        return (job_future is not None) and (not job_future.done())
 
-                    with open(file_path, 'r') as ff:
-                        self.palladium_dic = yaml.load(ff, Loader=yaml.FullLoader)
+    async def run_job(self, name, func, *args):
+        """
+        Run func(*args) on self.executor as the job of hardware.
+        A thread could not be stopped, so the job is shielded from the overrun timeout, and is tracked until it really
+        finishes with self.job_future_dic.
+        """
+        job_future = asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+        job_future.add_done_callback(lambda future: future.cancelled() or future.exception())
+        self.job_future_dic[name] = job_future
 
-                    dir_item_list = dir_path.split('/')
+        return await asyncio.shield(job_future)
 
-                    for hardware in self.hardware_dic:
-                        if hardware in dir_item_list:
-                            self.hardware = hardware
-                            self.project_primary_factors = self.hardware_dic[hardware]['project_primary_fractors']
+    def get_interval(self, sampler):
+        """
+        Get sample interval (seconds) of hardware, hardware config sample_interval overrides config.sample_interval.
+        """
+        return int(sampler.hardware_dic[sampler.hardware].get('sample_interval', self.interval))
+
+    def get_command(self, name, sampler):
+        """
+        Get sampling command of palladium/protium hardware.
+        """
+        if name.startswith('palladium/'):
+            hardware_info_dic = sampler.hardware_dic[sampler.hardware]
+            return common_palladium.gen_test_server_command(hardware_info_dic['test_server'], hardware_info_dic['test_server_host'])
+        else:
+            return common_protium.gen_protium_sys_info_command(sampler.get_ptmrun_path(), sampler.check_info_command)
+
+    def save_sample(self, name, sampler, stdout):
+        """
+        Parse and save sample information with palladium/protium sampler.
+        """
+        if name.startswith('palladium/'):
+            sampler.update_current_time()
+            sampler.sampling(test_server_info=[line.strip() for line in str(stdout, 'utf-8').split('\n')])
+        else:
+            # Protium parser works on raw stdout bytes.
+            sampler.sampling(protium_sys_info_list=stdout)
+
+    async def run_sample(self, name):
+        """
+        Reload hardware sampler, run sampling command as subprocess, then parse and save the sample on a worker thread.
+        """
+        sampler = await self.run_job(name, self.refresh_sampler, name)
+
+        if name.startswith('protium/') and common_protium.get_protium_shard_size(sampler.hardware_dic[sampler.hardware]):
+            # Sharded ptmRun runs on the sampler thread pool, every shard has its own timeout.
+            await self.run_job(name, sampler.sampling)
+            return
 
-                    self.current_date = r'%s-%s-%s' % (dir_item_list[-3], dir_item_list[-2], dir_item_list[-1])
-                    self.current_year = dir_item_list[-3]
-                    self.current_month = dir_item_list[-2]
+        process = await asyncio.create_subprocess_shell(self.get_command(name, sampler), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True)
+
+        try:
+            (stdout, stderr) = await process.communicate()
+        finally:
+            if process.returncode is None:
+                # Kill the whole process group, include ssh/test_server started by the shell.
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+                await process.wait()
+
+        if process.returncode:
+            logger.warning('[' + str(name) + '] sampling command exit with code ' + str(process.returncode) + ': ' + str(stderr, 'utf-8').strip())
+
+            # Same as iter_test_server_info, output of a failed test_server is incomplete.
+            if name.startswith('palladium/'):
+                raise Exception('discard the output of failed test_server')
+
+        await self.run_job(name, self.save_sample, name, sampler, stdout)
+
+    async def run_hardware(self, name):
+        """
+        Sample hardware on its interval.
+        Overrun guard: one sample at a time per hardware, the subprocess of a sample running longer than the interval
+        is killed, a tick is skipped while the parse/save job of the last sample is still running, and the ticks
+        missed by a slow sample are skipped instead of being queued up.
+        """
+        loop = asyncio.get_event_loop()
+        interval = self.get_interval(self.sampler_dic[name])
+        tick_time = loop.time()
+
+        logger.info('[' + str(name) + '] sample every ' + str(interval) + 's, jitter ' + str(self.jitter) + 's.')
+
+        while True:
+            # Jitter is added on every tick but not accumulated, the schedule does not drift.
+            await asyncio.sleep(max(0, tick_time + random.uniform(0, min(self.jitter, interval)) - loop.time()))
+            start_time = loop.time()
+
+            if self.is_job_running(name):
+                logger.warning('[' + str(name) + '] last sample is still running, skip this tick.')
+            else:
+                try:
+                    await asyncio.wait_for(self.run_sample(name), timeout=interval)
+                    logger.info('[' + str(name) + '] sampling done, ' + str(round(loop.time() - start_time, 2)) + 's.')
+                except asyncio.TimeoutError:
+                    logger.error('[' + str(name) + '] sampling overrun, sampling command killed after ' + str(interval) + 's.')
+                except (Exception, SystemExit) as error:
+                    logger.error('[' + str(name) + '] sampling failed: ' + str(error))
+
+            # Interval follows the reloaded hardware config.
+            interval = self.get_interval(self.sampler_dic[name])
+
+            tick_time += interval
+
+            missed_tick_num = int((loop.time() - tick_time) // interval) if loop.time() > tick_time else 0
+
+            if missed_tick_num:
+                tick_time += missed_tick_num * interval
+                logger.warning('[' + str(name) + '] sampling overrun, skip ' + str(missed_tick_num) + ' tick(s).')
+
+    async def run_all(self):
+        await asyncio.gather(*[self.run_hardware(name) for name in list(self.sampler_dic.keys())])
+
+    def run(self):
+        """
+        Run sampling daemon, only one daemon could run at the same time.
+        """
+        if not self.sampler_dic:
+            logger.error('Could not find any palladium/protium hardware to sample, please check config.')
+            sys.exit(1)
+
+        LF = common.lock_file(str(config.db_path) + '/.psample_daemon.lock', exclusive=True, block=False)
+
+        if not LF:
+            logger.error('Another psample daemon is running, exit.')
+            sys.exit(1)
+
+        # One job thread per hardware is enough, every hardware has one running job at most.
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.sampler_dic))
+        loop = asyncio.get_event_loop()
+        daemon_task = asyncio.ensure_future(self.run_all())
+
+        try:
+            loop.run_until_complete(daemon_task)
+        except KeyboardInterrupt:
+            # Cancel running samples, so their subprocesses are killed.
+            daemon_task.cancel()
+
+            try:
+                loop.run_until_complete(daemon_task)
+            except asyncio.CancelledError:
+                pass
 
-                    self.get_palladium_domain_info()
+            logger.info('psample daemon is stopped.')
+        finally:
+            # Wait for running jobs (their subprocesses are killed) here, not on interpreter exit.
+            self.executor.shutdown(wait=True)
+            common.unlock_file(LF)
 
 
 #################
@@ -411,14 +1059,30 @@ class Sampling:
 #################
 def main():
     args = read_args()
-    my_sampling = Sampling(args.hardware)
 
-    if not args.reconfig and not args.detail:
+    if args.daemon:
+        SamplingDaemon(store=args.store).run()
+        return
+
+    my_sampling = Sampling(args.hardware, store=args.store)
+
+    if args.import_yaml:
+        logger.info('Import history yaml samples of hardware ' + str(args.hardware) + ' into sqlite sample database ...')
+        import_num = common_db.import_palladium_yaml_samples(args.hardware)
+        logger.info('Done, ' + str(import_num) + ' samples imported.')
+    elif args.compact:
+        my_sampling.compact_palladium_cost_info()
+        my_sampling.compact_palladium_detail_info()
+    elif args.pack:
+        my_sampling.pack_palladium_samples()
+    elif args.retention:
+        my_sampling.apply_retention_policy()
+    elif not args.reconfig and not args.detail:
         my_sampling.sampling()
     elif args.reconfig:
-        my_sampling.reconfig_cost_file()
+        my_sampling.reconfig_cost_file(jobs=args.jobs)
     elif args.detail:
-        my_sampling.get_history_palladium_detail_info()
+        my_sampling.get_history_palladium_detail_info(jobs=args.jobs)
 
 
 if __name__ == '__main__':
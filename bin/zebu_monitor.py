@@ -20,7 +20,7 @@ from matplotlib.figure import Figure
 
 # Import common file
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
-from common import common_pyqt5, common_zebu, common
+from common import common_pyqt5, common_zebu, common_zebu_cache, common_manifest, common
 from config import config
 
 os.environ['PYTHONUNBUFFERED'] = '1'
@@ -94,6 +94,7 @@ class MainWindow(QMainWindow):
         self.project_user_dic = common.parse_project_proportion_file(project_user_file)
 
         self.project_proportion_dic = {'execute_host': self.project_execute_host_dic, 'user': self.project_user_dic}
+        self.project_resolver = None
 
         self.init_ui()
 
@@ -285,6 +286,24 @@ zebuMonitor is an open source software for zebu information data-collection, dat
         self.current_tab_suspend_combo = QComboBox(self.current_tab_frame)
         self.current_tab_suspend_combo.activated.connect(self.filter_current_tab_table)
 
+        current_tab_date_label = QLabel('Date', self.current_tab_frame)
+        current_tab_date_label.setStyleSheet("font-weight: bold;")
+        current_tab_date_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.current_tab_date_edit = QDateEdit(self.current_tab_frame)
+        self.current_tab_date_edit.setDisplayFormat('yyyy-MM-dd')
+        self.current_tab_date_edit.setMinimumDate(QDate.currentDate().addDays(-3652))
+        self.current_tab_date_edit.setMaximumDate(QDate.currentDate().addDays(0))
+        self.current_tab_date_edit.setCalendarPopup(True)
+        self.current_tab_date_edit.setDate(QDate.currentDate())
+        self.current_tab_date_edit.dateChanged.connect(self.update_current_tab_time_combo)
+
+        current_tab_time_label = QLabel('Time', self.current_tab_frame)
+        current_tab_time_label.setStyleSheet("font-weight: bold;")
+        current_tab_time_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        self.current_tab_time_combo = QComboBox(self.current_tab_frame)
+        self.current_tab_time_combo.activated.connect(self.gen_current_tab_table)
+        self.update_current_tab_time_combo()
+
         current_tab_refresh_button = QPushButton('Refresh', self.current_tab_frame)
         current_tab_refresh_button.setStyleSheet("font-weight: bold;")
         current_tab_refresh_button.clicked.connect(self.gen_current_tab_table)
@@ -301,7 +320,7 @@ zebuMonitor is an open source software for zebu information data-collection, dat
         current_tab_frame_grid.addWidget(self.current_tab_sub_module_combo, 0, 5)
         current_tab_frame_grid.addWidget(current_tab_status_label, 0, 6)
         current_tab_frame_grid.addWidget(self.current_tab_status_combo, 0, 7)
-        current_tab_frame_grid.addWidget(current_tab_refresh_button, 0, 9, 2, 2)
+        current_tab_frame_grid.addWidget(current_tab_refresh_button, 0, 9, 3, 2)
 
         current_tab_frame_grid.addWidget(current_tab_user_label, 1, 0)
         current_tab_frame_grid.addWidget(self.current_tab_user_combo, 1, 1)
@@ -312,6 +331,11 @@ zebuMonitor is an open source software for zebu information data-collection, dat
         current_tab_frame_grid.addWidget(current_tab_suspend_label, 1, 6)
         current_tab_frame_grid.addWidget(self.current_tab_suspend_combo, 1, 7)
 
+        current_tab_frame_grid.addWidget(current_tab_date_label, 2, 0)
+        current_tab_frame_grid.addWidget(self.current_tab_date_edit, 2, 1)
+        current_tab_frame_grid.addWidget(current_tab_time_label, 2, 2)
+        current_tab_frame_grid.addWidget(self.current_tab_time_combo, 2, 3)
+
         current_tab_frame_grid.setColumnStretch(0, 3)
         current_tab_frame_grid.setColumnStretch(1, 3)
         current_tab_frame_grid.setColumnStretch(2, 3)
@@ -325,6 +349,16 @@ zebuMonitor is an open source software for zebu information data-collection, dat
 
         self.current_tab_frame.setLayout(current_tab_frame_grid)
 
+    def update_current_tab_time_combo(self):
+        """
+        Update self.current_tab_time_combo with "Latest" and zebu_sample snapshot times of selected date.
+        """
+        (year, month, day) = self.current_tab_date_edit.date().toString('yyyy-MM-dd').split('-')
+        self.zebu_history_path_dic = common_manifest.load_zebu_history_path_dic()
+
+        self.current_tab_time_combo.clear()
+        self.current_tab_time_combo.addItems(['Latest'] + sorted(self.zebu_history_path_dic.get(year, {}).get(month, {}).get(day, {}).keys()))
+
     def update_current_tab_combo(self):
         """
         Update self.current_tab with new optional setting.
@@ -422,34 +456,36 @@ zebuMonitor is an open source software for zebu information data-collection, dat
 
     def check_current_zebu_info(self):
         """
-        Generate self.current_zebu_dic
+        Generate self.current_zebu_dic from selected zebu_sample snapshot, or the latest snapshot if it is fresh,
+        run check_status_command otherwise.
         """
-        current_zebu_info = []
-        today = datetime.now()
-        zebu_system_dir = ''
+        zebu_sample = None
+        sample_time = self.current_tab_time_combo.currentText().strip()
+
+        if sample_time and (sample_time != 'Latest'):
+            (year, month, day) = self.current_tab_date_edit.date().toString('yyyy-MM-dd').split('-')
+            sample_path = self.zebu_history_path_dic.get(year, {}).get(month, {}).get(day, {}).get(sample_time, '')
 
-        for record_day in self.zebu_system_dir_dic:
             try:
-                record_day_time = datetime.strptime(record_day, '%Y-%m-%d')
+                zebu_sample = common_zebu.read_zebu_sample(sample_path)
             except Exception as error:
-                logger.error('Find Error {} in zebu_system_dir date setting, please check!'.format(str(error)))
-                sys.exit(1)
-
-            if today > record_day_time:
-                zebu_system_dir = self.zebu_system_dir_dic[record_day]
-
-        if not zebu_system_dir:
-            zebu_system_dir = self.zebu_system_dir_dic[self.zebu_system_dir_dic.keys()[0]]
-
-        var_dic = {'ZEBU_SYSTEM_DIR': zebu_system_dir}
+                logger.error('Failed on reading zebu snapshot "' + str(sample_path) + '": ' + str(error))
+        elif getattr(config, 'zebu_sample_max_age', 600):
+            zebu_sample = common_zebu.read_latest_zebu_sample(max_age=int(getattr(config, 'zebu_sample_max_age', 600)))
+
+        if zebu_sample:
+            self.current_zebu_dic = zebu_sample
+            self.zebu_module_dic = common_zebu.load_zebu_module_dic() or common_zebu.record_module_info(zebu_sample['module_info_list'])
+            return
+
+        try:
+            zebu_system_dir = common_zebu.get_current_zebu_system_dir(self.zebu_system_dir_dic)
+        except Exception as error:
+            logger.error('Find Error {} in zebu_system_dir date setting, please check!'.format(str(error)))
+            sys.exit(1)
 
         if os.path.exists(config.zRscManager) and os.path.exists(zebu_system_dir):
-            check_status_command = config.check_status_command.format_map(var_dic)
-            stdout = os.popen(check_status_command).read()
-
-            for line in stdout.split('\n'):
-                current_zebu_info.append(line.strip())
-
+            current_zebu_info = common_zebu.get_current_zebu_info(zebu_system_dir)
             self.current_zebu_dic, self.zebu_module_dic = common_zebu.parse_current_zebu_info(current_zebu_info)
 
         if os.path.isfile('ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db'):
@@ -634,6 +670,36 @@ zebuMonitor is an open source software for zebu information data-collection, dat
 
         end_date_time = datetime.strptime(end_date, "%Y-%m-%d")
         start_date_time = datetime.strptime(start_date, "%Y-%m-%d")
+        zebu_system_dir_list = self.get_zebu_system_dir_list(start_date_time, end_date_time)
+
+        # Fetch all ZEBU_SYSTEM_DIRs concurrently, rows of all of them are shown on the table.
+        sys_report_lines = common_zebu_cache.get_multi_zebu_report_lines(zebu_system_dir_list, start_date_time.strftime('%Y-%m-%d'), end_date_time.strftime('%Y-%m-%d'), unit=unit, module=module, sub_module=sub_module, user=user)
+        history_zebu_dic = common_zebu.parse_history_zebu_info(sys_report_lines, specified_unit=unit, specified_module=module, specified_sub_module=sub_module, specified_user=user, specified_host=host, specified_pid=pid)
+
+        # Update history combobox according to search result
+        self.update_history_tab_combo(history_zebu_dic, user, host, pid)
+        self.history_tab_table.setRowCount(history_zebu_dic['rows'])
+
+        row = 0
+
+        for record_pid in history_zebu_dic['info']:
+            for modules in history_zebu_dic['info'][record_pid]['modules']:
+                (record_unit, record_module, record_sub_module) = modules.split('.')
+                self.history_tab_table.setItem(row, 0, QTableWidgetItem(record_unit))
+                self.history_tab_table.setItem(row, 1, QTableWidgetItem(record_module))
+                self.history_tab_table.setItem(row, 2, QTableWidgetItem(record_sub_module))
+                self.history_tab_table.setItem(row, 3, QTableWidgetItem(history_zebu_dic['info'][record_pid]['user']))
+                self.history_tab_table.setItem(row, 4, QTableWidgetItem(history_zebu_dic['info'][record_pid]['host']))
+                self.history_tab_table.setItem(row, 5, QTableWidgetItem(record_pid))
+                self.history_tab_table.setItem(row, 6, QTableWidgetItem(history_zebu_dic['info'][record_pid]['start_time']))
+                self.history_tab_table.setItem(row, 7, QTableWidgetItem(history_zebu_dic['info'][record_pid]['end_time']))
+
+                row += 1
+
+    def get_zebu_system_dir_list(self, start_date_time, end_date_time):
+        """
+        Get ZEBU_SYSTEM_DIRs recorded before end_date_time on self.zebu_system_dir_dic, in record day order.
+        """
         zebu_system_dir_list = []
 
         if end_date_time >= start_date_time:
@@ -647,33 +713,7 @@ zebuMonitor is an open source software for zebu information data-collection, dat
                 if record_day_time < end_date_time:
                     zebu_system_dir_list.append(self.zebu_system_dir_dic[record_day])
 
-        var_dic = {'FROMDATE': start_date_time.strftime('%Y/%m/%d'), 'TODATE': end_date_time.strftime('%Y/%m/%d')}
-
-        for zebu_system_dir in zebu_system_dir_list:
-            var_dic['ZEBU_SYSTEM_DIR'] = zebu_system_dir
-            check_report_command = config.check_report_command.format_map(var_dic)
-            sys_report_lines = os.popen(check_report_command).read().split('\n')
-            history_zebu_dic = common_zebu.parse_history_zebu_info(sys_report_lines, specified_unit=unit, specified_module=module, specified_sub_module=sub_module, specified_user=user, specified_host=host, specified_pid=pid)
-
-            # Update history combobox according to search result
-            self.update_history_tab_combo(history_zebu_dic, user, host, pid)
-            self.history_tab_table.setRowCount(history_zebu_dic['rows'])
-
-            row = 0
-
-            for pid in history_zebu_dic['info']:
-                for modules in history_zebu_dic['info'][pid]['modules']:
-                    unit, module, sub_module = modules.split('.')
-                    self.history_tab_table.setItem(row, 0, QTableWidgetItem(unit))
-                    self.history_tab_table.setItem(row, 1, QTableWidgetItem(module))
-                    self.history_tab_table.setItem(row, 2, QTableWidgetItem(sub_module))
-                    self.history_tab_table.setItem(row, 3, QTableWidgetItem(history_zebu_dic['info'][pid]['user']))
-                    self.history_tab_table.setItem(row, 4, QTableWidgetItem(history_zebu_dic['info'][pid]['host']))
-                    self.history_tab_table.setItem(row, 5, QTableWidgetItem(pid))
-                    self.history_tab_table.setItem(row, 6, QTableWidgetItem(history_zebu_dic['info'][pid]['start_time']))
-                    self.history_tab_table.setItem(row, 7, QTableWidgetItem(history_zebu_dic['info'][pid]['end_time']))
-
-                    row += 1
+        return zebu_system_dir_list
 
     def update_history_tab_combo(self, zebu_dic, user, host, pid):
         """
@@ -900,128 +940,31 @@ zebuMonitor is an open source software for zebu information data-collection, dat
                 self.draw_utilization_curve(fig, av_utilization, date_list, utilization_list)
 
     def get_utilization_info(self, unit, module, sub_module, start_date, end_date):
-        utilization_info_dic = {}
         filtered_zebu_dic = common_zebu.filter_zebu_dic(self.current_zebu_dic, specified_unit=unit, specified_module=module, specified_sub_module=sub_module)
 
         start_date_time = datetime.strptime(start_date, '%Y-%m-%d')
         end_date_time = datetime.strptime(end_date, '%Y-%m-%d')
-        start_date_utc = datetime.strptime(start_date + " 00:00:00", "%Y-%m-%d %H:%M:%S")
-        end_date_utc = datetime.strptime(end_date + " 23:59:59", "%Y-%m-%d %H:%M:%S")
-
-        # Generate utilization_info_dic
-        for day in range((end_date_utc.date() - start_date_utc.date()).days + 1):
-            key_date = (start_date_utc + timedelta(days=day)).strftime("%Y-%m-%d")
-            utilization_info_dic.setdefault(key_date, 0)
-
-        zebu_system_dir_list = []
-
-        if end_date_time >= start_date_time:
-            for record_day in sorted(self.zebu_system_dir_dic.keys()):
-                try:
-                    record_day_time = datetime.strptime(record_day, '%Y-%m-%d')
-                except Exception as error:
-                    logger.error('Find Error {} in zebu_system_dir date setting, please check!'.format(str(error)))
-                    sys.exit(1)
+        zebu_system_dir_list = self.get_zebu_system_dir_list(start_date_time, end_date_time)
 
-                if record_day_time < end_date_time:
-                    zebu_system_dir_list.append(self.zebu_system_dir_dic[record_day])
-
-        var_dic = {'FROMDATE': (start_date_time - timedelta(days=90)).strftime('%Y/%m/%d'), 'TODATE': end_date_time.strftime('%Y/%m/%d')}
-
-        for zebu_system_dir in zebu_system_dir_list:
-            var_dic['ZEBU_SYSTEM_DIR'] = zebu_system_dir
-            check_report_command = config.check_report_command.format_map(var_dic)
-
-            # Run zRscManager to get utilization information
-            sys_report_lines = os.popen(check_report_command).read().split('\n')
-
-            # Read sys_report lines
-            for line in sys_report_lines:
-                if line:
-                    # Split line in to useful information
-                    start_time, end_time, modules, user, pid, pc = line.split(',')
-                    modules_list = modules.strip('()').split(' ')
-
-                    for modules in modules_list:
-                        # If this line has specified module
-                        if modules.strip() in filtered_zebu_dic['module_name']:
-                            # If job begins before user specified start_date
-                            if start_time == '' or datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S") < datetime.strptime(start_date, "%Y-%m-%d"):
-                                start_time = start_date + ' 00:00:00'
-
-                            # If job still running and doesn't have end time
-                            if end_time == '':
-                                end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                            # If job ends after user specified end_date
-                            if datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S") > end_date_utc:
-                                end_time = end_date_utc.strftime("%Y-%m-%d %H:%M:%S")
-
-                            # Transfer time into utc format
-                            start_time_utc = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-                            end_time_utc = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
-
-                            # If job begins and ends in the same day
-                            if start_time_utc.date() == end_time_utc.date():
-                                time_delta = (end_time_utc - start_time_utc).total_seconds() / 86400
-                                module_count = self.get_module_count(start_time_utc.date().strftime("%Y-%m-%d"), unit, module, sub_module)
-                                utilization_info_dic[start_time_utc.date().strftime("%Y-%m-%d")] += time_delta / module_count
-                            # If job begins and ends in different day
-                            else:
-                                start_run_date = datetime.strftime(start_time_utc.date(), "%Y-%m-%d")
-                                end_run_date = datetime.strftime(end_time_utc.date(), "%Y-%m-%d")
+        # Get sysreport of all ZEBU_SYSTEM_DIRs concurrently from local cache (zRscManager only runs for the days not cached),
+        # jobs opened 90 days before start_date may still run on start_date.
+        sys_report_lines = common_zebu_cache.get_multi_zebu_report_lines(zebu_system_dir_list, (start_date_time - timedelta(days=90)).strftime('%Y-%m-%d'), end_date_time.strftime('%Y-%m-%d'))
 
-                                for day in range((end_time_utc.date() - start_time_utc.date()).days + 1):
-                                    run_date = start_time_utc.date() + timedelta(days=day)
+        # Parse sysreport lines once into job intervals, then sum occupied seconds per day.
+        interval_dic = common_zebu.parse_zebu_report_interval(sys_report_lines)
+        date_list = [(start_date_time + timedelta(days=day)).strftime('%Y-%m-%d') for day in range((end_date_time - start_date_time).days + 1)]
+        module_count_list = self.get_zebu_module_counter().get_count_list(date_list, unit, module, sub_module)
 
-                                    if run_date == start_time_utc.date():
-                                        time_delta = ((datetime.strptime(start_run_date + " 23:59:59", "%Y-%m-%d %H:%M:%S") - start_time_utc).total_seconds() + 1) / 86400
-                                    elif run_date == end_time_utc.date():
-                                        time_delta = (end_time_utc - datetime.strptime(end_run_date + " 00:00:00", "%Y-%m-%d %H:%M:%S")).total_seconds() / 86400
-                                    else:
-                                        time_delta = 1.0
+        return common_zebu.get_zebu_utilization(interval_dic, filtered_zebu_dic['module_name'], start_date, end_date, module_count_list)
 
-                                    module_count = self.get_module_count(datetime.strftime(run_date, "%Y-%m-%d"), unit, module, sub_module)
-                                    utilization_info_dic[datetime.strftime(run_date, "%Y-%m-%d")] += time_delta / module_count
-
-        utilization_info_dic = {udate: utilization if utilization <= 1 else 1 for udate, utilization in utilization_info_dic.items()}
-
-        return utilization_info_dic
-
-    def get_module_count(self, date, unit, module, sub_module):
+    def get_zebu_module_counter(self):
         """
-        Read self.zebu_module_dic and get module count
+        Get module counter of self.zebu_module_dic, rebuilt when self.zebu_module_dic is updated.
         """
-        date_list = list(self.zebu_module_dic.keys())
-        first_dila_date = date_list[0]
-        last_dila_date = date_list[-1]
-        first_dila_date_utc = datetime.strptime(first_dila_date, '%Y-%m-%d').date()
-        last_dila_date_utc = datetime.strptime(last_dila_date, '%Y-%m-%d').date()
-        check_date_utc = datetime.strptime(date, '%Y-%m-%d').date()
-        module_list = []
-
-        if check_date_utc < first_dila_date_utc:
-            module_list = self.zebu_module_dic[first_dila_date]
-        elif check_date_utc >= last_dila_date_utc:
-            module_list = self.zebu_module_dic[last_dila_date]
-        else:
-            for i in range(len(date_list) - 1):
-                start_date = date_list[i]
-                end_date = date_list[i + 1]
-                start_date_utc = datetime.strptime(start_date, '%Y-%m-%d').date()
-                end_date_utc = datetime.strptime(end_date, '%Y-%m-%d').date()
-                if start_date_utc <= check_date_utc <= end_date_utc:
-                    module_list = self.zebu_module_dic[start_date]
-
-        module_count = 0
+        if (getattr(self, 'zebu_module_counter', None) is None) or (self.zebu_module_counter.zebu_module_dic is not self.zebu_module_dic):
+            self.zebu_module_counter = common_zebu.ZebuModuleCounter(self.zebu_module_dic)
 
-        for modules in module_list:
-            if re.search(unit, modules) or unit == 'ALL':
-                if re.search(module, modules) or module == 'ALL':
-                    if re.search(sub_module, modules) or sub_module == 'ALL':
-                        module_count += 1
-
-        return module_count
+        return self.zebu_module_counter
 
     def draw_utilization_curve(self, fig, av_utilization, date_list, utilization_list):
         """
@@ -1180,93 +1123,78 @@ zebuMonitor is an open source software for zebu information data-collection, dat
 
         start_date_time = datetime.strptime(start_date, '%Y-%m-%d')
         end_date_time = datetime.strptime(end_date, '%Y-%m-%d')
+        zebu_system_dir_list = self.get_zebu_system_dir_list(start_date_time, end_date_time)
 
-        zebu_system_dir_list = []
-
-        if end_date_time >= start_date_time:
-            for record_day in sorted(self.zebu_system_dir_dic.keys()):
-                try:
-                    record_day_time = datetime.strptime(record_day, '%Y-%m-%d')
-                except Exception as error:
-                    logger.error('Find Error {} in zebu_system_dir date setting, please check!'.format(str(error)))
-                    sys.exit(1)
+        # Get sysreport of all ZEBU_SYSTEM_DIRs concurrently from local cache (zRscManager only runs for the days not cached).
+        sys_report_lines = common_zebu_cache.get_multi_zebu_report_lines(zebu_system_dir_list, start_date_time.strftime('%Y-%m-%d'), end_date_time.strftime('%Y-%m-%d'), unit=unit, module=module, sub_module=sub_module)
 
-                if record_day_time < end_date_time:
-                    zebu_system_dir_list.append(self.zebu_system_dir_dic[record_day])
-
-        var_dic = {'FROMDATE': start_date_time.strftime('%Y/%m/%d'), 'TODATE': end_date_time.strftime('%Y/%m/%d')}
-
-        for zebu_system_dir in zebu_system_dir_list:
-            var_dic['ZEBU_SYSTEM_DIR'] = zebu_system_dir
-            check_report_command = config.check_report_command.format_map(var_dic)
+        end_date_utc = datetime.strptime(end_date + " 23:59:59", "%Y-%m-%d %H:%M:%S")
 
-            # Run zRscManager to get utilization information
-            sys_report_lines = os.popen(check_report_command).read().split('\n')
+        # Read sys_report lines
+        for line in sys_report_lines:
+            if line:
+                # Split line in to useful information
+                start_time, end_time, modules, user, pid, host = line.split(',')
 
-            end_date_utc = datetime.strptime(end_date + " 23:59:59", "%Y-%m-%d %H:%M:%S")
+                if host.strip() == 'None':
+                    continue
 
-            # Read sys_report lines
-            for line in sys_report_lines:
-                if line:
-                    # Split line in to useful information
-                    start_time, end_time, modules, user, pid, host = line.split(',')
+                modules_list = modules.strip('()').split(' ')
 
-                    if host.strip() == 'None':
-                        continue
+                for module_name in modules_list:
+                    if my_match := re.match(r'(\S+)\.(\S+)\.(\S+)', module_name):
+                        record_unit = my_match.group(1)
+                        record_module = my_match.group(2)
+                        record_sub_module = my_match.group(3)
 
-                    modules_list = modules.strip('()').split(' ')
+                        if (unit != 'ALL' and record_unit != unit) or (module != 'ALL' and record_module != module) or (sub_module != 'ALL' and sub_module != record_sub_module):
+                            continue
 
-                    for module_name in modules_list:
-                        if my_match := re.match(r'(\S+)\.(\S+)\.(\S+)', module_name):
-                            record_unit = my_match.group(1)
-                            record_module = my_match.group(2)
-                            record_sub_module = my_match.group(3)
+                        cost_info_dic.setdefault(record_unit, {})
+                        cost_info_dic[record_unit].setdefault(record_module, {})
+                        cost_info_dic[record_unit][record_module].setdefault(record_sub_module, {})
 
-                            if (unit != 'ALL' and record_unit != unit) or (module != 'ALL' and record_module != module) or (sub_module != 'ALL' and sub_module != record_sub_module):
-                                continue
+                        # If job begins before user specified start_date
+                        if start_time == '' or datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S") < datetime.strptime(start_date, "%Y-%m-%d"):
+                            start_time = start_date + ' 00:00:00'
 
-                            cost_info_dic.setdefault(record_unit, {})
-                            cost_info_dic[record_unit].setdefault(record_module, {})
-                            cost_info_dic[record_unit][record_module].setdefault(record_sub_module, {})
+                        # If job still running and doesn't have end time
+                        if end_time == '':
+                            end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-                            # If job begins before user specified start_date
-                            if start_time == '' or datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S") < datetime.strptime(start_date, "%Y-%m-%d"):
-                                start_time = start_date + ' 00:00:00'
+                        # If job ends after user specified end_date
+                        if datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S") > end_date_utc:
+                            end_time = end_date_utc.strftime("%Y-%m-%d %H:%M:%S")
 
-                            # If job still running and doesn't have end time
-                            if end_time == '':
-                                end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        # Transfer time into utc format
+                        start_time_utc = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+                        end_time_utc = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
 
-                            # If job ends after user specified end_date
-                            if datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S") > end_date_utc:
-                                end_time = end_date_utc.strftime("%Y-%m-%d %H:%M:%S")
+                        total_seconds = (end_time_utc - start_time_utc).total_seconds()
 
-                            # Transfer time into utc format
-                            start_time_utc = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-                            end_time_utc = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+                        if hasattr(config, 'zebu_project_primary_factors'):
+                            if self.project_resolver is None:
+                                self.project_resolver = common.ProjectResolver(config.zebu_project_primary_factors, self.project_proportion_dic)
 
-                            total_seconds = (end_time_utc - start_time_utc).total_seconds()
+                            project_dic = self.project_resolver.get_project_info(execute_host=host, user=user)
+                        else:
+                            project_dic = {}
+                            logger.error("zebu_project_primary_factors doesn't has dinifition, please check!")
 
-                            if hasattr(config, 'zebu_project_primary_factors'):
-                                project_dic = common.get_project_info(config.zebu_project_primary_factors, self.project_proportion_dic, execute_host=host, user=user)
+                        if not project_dic:
+                            if 'UNKOWN' not in cost_info_dic[record_unit][record_module][record_sub_module]:
+                                cost_info_dic[record_unit][record_module][record_sub_module].setdefault('UNKOWN', total_seconds)
                             else:
-                                project_dic = {}
-                                logger.error("zebu_project_primary_factors doesn't has dinifition, please check!")
-
-                            if not project_dic:
-                                if 'UNKOWN' not in cost_info_dic[record_unit][record_module][record_sub_module]:
-                                    cost_info_dic[record_unit][record_module][record_sub_module].setdefault('UNKOWN', total_seconds)
+                                cost_info_dic[record_unit][record_module][record_sub_module]['UNKOWN'] += total_seconds
+                        else:
+                            for project in project_dic.keys():
+                                if project not in cost_info_dic[record_unit][record_module][record_sub_module]:
+                                    cost_info_dic[record_unit][record_module][record_sub_module].setdefault(project, project_dic[project] * total_seconds)
                                 else:
-                                    cost_info_dic[record_unit][record_module][record_sub_module]['UNKOWN'] += total_seconds
-                            else:
-                                for project in project_dic.keys():
-                                    if project not in cost_info_dic[record_unit][record_module][record_sub_module]:
-                                        cost_info_dic[record_unit][record_module][record_sub_module].setdefault(project, project_dic[project] * total_seconds)
-                                    else:
-                                        cost_info_dic[record_unit][record_module][record_sub_module][project] += project_dic[project] * total_seconds
+                                    cost_info_dic[record_unit][record_module][record_sub_module][project] += project_dic[project] * total_seconds
 
-                                    if project not in self.project_list:
-                                        self.project_list.append(project)
+                                if project not in self.project_list:
+                                    self.project_list.append(project)
 
         return cost_info_dic
 
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+################################
+# File Name   : zebu_sample.py
+# Description : Sample zebu sysstat (config.check_status_command) periodically, save snapshots into
+#               <db_path>/zebu/sample, so zebu_monitor opens with the latest snapshot and history snapshots.
+################################
+import os
+import sys
+import time
+import yaml
+import logging
+import datetime
+import argparse
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from config import config
+from common import common, common_zebu, common_manifest, common_metrics
+
+os.environ["PYTHONUNBUFFERED"] = '1'
+logger = common.get_logger(level=logging.DEBUG)
+
+
+def read_args():
+    """
+    Read in arguments.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-d', '--zebu_system_dir',
+                        default='',
+                        help='Specify ZEBU_SYSTEM_DIR, default is the current one on config.zebu_system_dir_record.')
+    parser.add_argument('-i', '--interval',
+                        type=int,
+                        default=int(getattr(config, 'zebu_sample_interval', 300)),
+                        help='Specify sample interval (seconds) for --loop, default is config.zebu_sample_interval (300).')
+    parser.add_argument('--loop',
+                        action='store_true',
+                        default=False,
+                        help='keep sampling on interval, sample once (for crontab) by default.')
+
+    args = parser.parse_args()
+
+    return args
+
+
+class ZebuSampling:
+    """
+    Zebu sysstat sampling
+    """
+    def __init__(self, zebu_system_dir=''):
+        self.hardware = 'zebu'
+        self.zebu_system_dir = zebu_system_dir
+        self.sample_path = common_zebu.get_zebu_sample_path()
+
+    def get_zebu_system_dir(self):
+        """
+        Get specified ZEBU_SYSTEM_DIR, or the current one on config.zebu_system_dir_record.
+        """
+        if self.zebu_system_dir:
+            return self.zebu_system_dir
+
+        zebu_system_dir_dic = common_zebu.get_zebu_system_dir_dic()
+
+        if not zebu_system_dir_dic:
+            logger.error('Find zebu system directory failed. Please Check!')
+            return ''
+
+        try:
+            return common_zebu.get_current_zebu_system_dir(zebu_system_dir_dic)
+        except Exception as error:
+            logger.error('Find Error ' + str(error) + ' in zebu_system_dir date setting, please check!')
+            return ''
+
+    def get_work_path(self):
+        """
+        Get (create) zRscManager work path "<db_path>/zebu/sample/.work", ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db is generated and removed there.
+        """
+        work_path = os.path.join(self.sample_path, '.work')
+
+        if not os.path.exists(work_path):
+            os.makedirs(work_path)
+
+        return work_path
+
+    @common_metrics.instrument('zebu')
+    def sampling(self):
+        """
+        Sample zebu sysstat into <db_path>/zebu/sample/<year>/<month>/<day>/<time> and <db_path>/zebu/sample/latest.
+        Return True if the snapshot is saved.
+        """
+        current_time_utc = datetime.datetime.now()
+        current_year = current_time_utc.strftime('%Y')
+        current_month = current_time_utc.strftime('%m')
+        current_day = current_time_utc.strftime('%d')
+        current_time = current_time_utc.strftime('%H-%M-%S')
+        zebu_system_dir = self.get_zebu_system_dir()
+
+        if not zebu_system_dir:
+            return False
+
+        if (not os.path.exists(str(config.zRscManager))) or (not os.path.exists(zebu_system_dir)):
+            logger.error('zRscManager "' + str(config.zRscManager) + '" or ZEBU_SYSTEM_DIR "' + str(zebu_system_dir) + '" is missing, please check!')
+            return False
+
+        # Sampling zebu sysstat
+        logger.info('Sampling zebu sysstat of "' + str(zebu_system_dir) + '" ...')
+
+        with self.metrics.span('sysstat'):
+            current_zebu_info = common_zebu.get_current_zebu_info(zebu_system_dir, work_path=self.get_work_path())
+
+        with self.metrics.span('parse'):
+            (current_zebu_dic, zebu_module_dic) = common_zebu.parse_current_zebu_info(current_zebu_info)
+
+        self.metrics.add_size('lines_read', len(current_zebu_info))
+        self.metrics.add_size('modules', current_zebu_dic['row'])
+
+        if not current_zebu_dic['row']:
+            logger.error('Could not find any valid information, please check!')
+            return False
+
+        current_zebu_dic['sample_time'] = current_time_utc.strftime('%Y-%m-%d %H:%M:%S')
+        current_zebu_dic['zebu_system_dir'] = zebu_system_dir
+
+        # Save snapshot, and replace the latest one.
+        logger.info('Save to db ...')
+
+        db_path = os.path.join(self.sample_path, current_year, current_month, current_day)
+        db_file_path = os.path.join(db_path, current_time)
+        latest_file_path = os.path.join(self.sample_path, 'latest')
+        tmp_file_path = latest_file_path + '.' + str(os.getpid()) + '.tmp'
+
+        if not os.path.exists(db_path):
+            os.makedirs(db_path)
+
+        with self.metrics.span('save_sample'):
+            sample_content = yaml.dump(current_zebu_dic, allow_unicode=True)
+
+            with open(db_file_path, 'w') as DF:
+                DF.write(sample_content)
+
+            with open(tmp_file_path, 'w') as TF:
+                TF.write(sample_content)
+
+            os.replace(tmp_file_path, latest_file_path)
+
+        self.metrics.add_size('bytes_written', os.path.getsize(db_file_path))
+
+        with self.metrics.span('manifest'):
+            common_manifest.add_zebu_manifest_record(current_year, current_month, current_day, current_time, db_file_path)
+
+        self.metrics.success = True
+        logger.info('Done')
+
+        return True
+
+    def loop(self, interval):
+        """
+        Sample on every interval seconds, a failed sample does not stop the loop.
+        """
+        interval = max(1, int(interval))
+
+        while True:
+            start_time = time.time()
+
+            try:
+                self.sampling()
+            except Exception as error:
+                logger.error('Zebu sampling failed: ' + str(error))
+
+            time.sleep(max(0, start_time + interval - time.time()))
+
+
+################
+# Main Process #
+################
+def main():
+    args = read_args()
+    zebu_sample = ZebuSampling(args.zebu_system_dir)
+
+    if args.loop:
+        zebu_sample.loop(args.interval)
+    elif not zebu_sample.sampling():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import subprocess
+import collections
+import fcntl
 import xlwt
 import logging
 import os
@@ -30,6 +32,45 @@ def run_command(command, mystdin=subprocess.PIPE, mystdout=subprocess.PIPE, myst
     return (SP.returncode, stdout, stderr)
 
 
+def lock_file(file_path, exclusive=False, block=True):
+    """
+    Lock with flock on file_path, shared lock by default.
+    Return the opened lock file, or None if the lock is busy with block=False.
+    """
+    LF = open(file_path, 'a')
+    lock_flag = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+
+    if not block:
+        lock_flag |= fcntl.LOCK_NB
+
+    try:
+        fcntl.flock(LF, lock_flag)
+    except BlockingIOError:
+        LF.close()
+        return None
+
+    return LF
+
+
+def unlock_file(LF):
+    """
+    Release lock file from lock_file.
+    """
+    if LF:
+        fcntl.flock(LF, fcntl.LOCK_UN)
+        LF.close()
+
+
+def parse_cost_value(cost_string):
+    """
+    Parse project cost value, keep integer if possible.
+    """
+    if re.match(r'^-?\d+$', cost_string):
+        return int(cost_string)
+    else:
+        return float(cost_string)
+
+
 def write_excel(excel_file, contents_list, specified_sheet_name='default'):
     """
     Open Excel for write.
@@ -284,32 +325,82 @@ def parse_project_proportion_file(project_proportion_file):
     return project_proportion_dic
 
 
-def get_project_info(project_primary_factors, original_project_proportion_dic, execute_host='', user=''):
-    """
-    Get project information based on submit_host/execute_host/user.
-    """
-    logger = get_logger(level=logging.DEBUG)
-    project_dic = {}
-    factor_dic = {'execute_host': execute_host, 'user': user}
+# Max memoized (execute_host, user) lookups on one ProjectResolver.
+PROJECT_RESOLVER_CACHE_SIZE = 65536
 
-    if project_primary_factors:
-        project_primary_factor_list = project_primary_factors.split()
 
-        for project_primary_factor in project_primary_factor_list:
-            if project_primary_factor not in factor_dic.keys():
+class ProjectResolver:
+    """
+    Resolve (execute_host, user) into project_dic {<project>: <proportion>}.
+    project_primary_factors is split and validated once, lookups are memoized with bounded LRU eviction.
+    project_proportion_dic = {'execute_host': <parse_project_proportion_file output>, 'user': <parse_project_proportion_file output>}
+    """
+    def __init__(self, project_primary_factors, project_proportion_dic, cache_size=PROJECT_RESOLVER_CACHE_SIZE):
+        self.project_primary_factors = project_primary_factors
+        self.cache_size = cache_size
+        self.cache_dic = collections.OrderedDict()
+        self.hit_num = 0
+        self.miss_num = 0
+
+        # [(<factor>, <factor proportion dic>), ...] on project_primary_factors order.
+        self.factor_list = []
+
+        for project_primary_factor in str(project_primary_factors or '').split():
+            if project_primary_factor not in ['execute_host', 'user']:
+                logger = get_logger(level=logging.DEBUG)
                 logger.error('"' + str(project_primary_factor) + '": invalid project_primary_factors setting on config file.')
                 sys.exit(1)
-            else:
-                factor_value = factor_dic[project_primary_factor]
-                project_proportion_dic = {}
 
-                if factor_value in original_project_proportion_dic[project_primary_factor].keys():
-                    project_proportion_dic = original_project_proportion_dic[project_primary_factor][factor_value]
+            self.factor_list.append((project_primary_factor, project_proportion_dic.get(project_primary_factor, {})))
 
-                if project_proportion_dic:
-                    project_dic = project_proportion_dic
-                    break
-                else:
-                    continue
+    def resolve(self, execute_host='', user=''):
+        """
+        Get project_dic of the first project_primary_factor which has project setting, return {} if no one has.
+        """
+        project_dic = {}
+
+        for (project_primary_factor, factor_proportion_dic) in self.factor_list:
+            factor_value = execute_host if (project_primary_factor == 'execute_host') else user
+            project_proportion_dic = factor_proportion_dic.get(factor_value)
+
+            if project_proportion_dic:
+                project_dic = project_proportion_dic
+                break
+
+        return project_dic
+
+    def get_project_info(self, execute_host='', user=''):
+        """
+        Memoized resolve.
+        """
+        key = (execute_host, user)
+
+        if key in self.cache_dic:
+            self.hit_num += 1
+            self.cache_dic.move_to_end(key)
+            return self.cache_dic[key]
 
-    return project_dic
+        self.miss_num += 1
+        project_dic = self.resolve(execute_host=execute_host, user=user)
+
+        if self.cache_size > 0:
+            self.cache_dic[key] = project_dic
+
+            if len(self.cache_dic) > self.cache_size:
+                self.cache_dic.popitem(last=False)
+
+        return project_dic
+
+    def get_cache_info(self):
+        """
+        Get cache statistics string for logging.
+        """
+        return 'hit=' + str(self.hit_num) + ', miss=' + str(self.miss_num) + ', size=' + str(len(self.cache_dic)) + '/' + str(self.cache_size)
+
+
+def get_project_info(project_primary_factors, original_project_proportion_dic, execute_host='', user=''):
+    """
+    Get project information based on submit_host/execute_host/user.
+    Use ProjectResolver directly for repeated lookups.
+    """
+    return ProjectResolver(project_primary_factors, original_project_proportion_dic, cache_size=0).resolve(execute_host=execute_host, user=user)
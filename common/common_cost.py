@@ -0,0 +1,218 @@
+import os
+import re
+import sys
+import datetime
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common
+from config import config
+
+logger = common.get_logger()
+
+# Compact cost ledger into cost file once it grows over this size (bytes).
+COST_LEDGER_COMPACT_SIZE = 64 * 1024
+
+# Lock file under emulator directory, ledger appenders and readers share it, compaction locks it exclusively.
+COST_LOCK_FILE = '.cost.lock'
+
+
+def get_palladium_cost_file_dic(hardware, emulator):
+    """
+    Get cost file (daily totals), ledger file (one record per sample) and lock file for specified emulator.
+    """
+    emulator_path = str(config.db_path) + '/' + str(hardware) + '/' + str(emulator)
+    cost_file_dic = {'cost': emulator_path + '/cost',
+                     'ledger': emulator_path + '/cost.ledger',
+                     'lock': emulator_path + '/' + COST_LOCK_FILE}
+
+    return cost_file_dic
+
+
+def parse_cost_line(line):
+    """
+    Parse cost/ledger line "<date> <project>:<cost> ...", return (date, project_cost_dic), or (None, {}) for invalid line.
+    """
+    line_s = line.split()
+
+    if re.match(r'^\S+\s*(\S+:\S+\s*)+$', line):
+        date = line_s[0].strip()
+        project_cost_dic = {}
+
+        for cost_info in line_s[1:]:
+            (project, cost) = cost_info.rsplit(':', 1)
+            project_cost_dic[project.strip()] = common.parse_cost_value(cost.strip())
+
+        return date, project_cost_dic
+
+    return None, {}
+
+
+def read_cost_file(cost_file, total_cost_dic=None, accumulate=False):
+    """
+    Read cost/ledger file into total_cost_dic = {<date>: {<project>: <cost>}}.
+    The later line overrides the same date by default, and is added to it with accumulate=True (for ledger).
+    """
+    if total_cost_dic is None:
+        total_cost_dic = {}
+
+    if not os.path.exists(cost_file):
+        return total_cost_dic
+
+    with open(cost_file, 'r') as CF:
+        for line in CF:
+            if re.match(r'^\s*$', line):
+                continue
+
+            (date, project_cost_dic) = parse_cost_line(line)
+
+            if not date:
+                logger.warning('Could not find valid infomation in cost file line: ' + line.strip() + '!')
+                continue
+
+            if accumulate and (date in total_cost_dic):
+                for project in project_cost_dic:
+                    total_cost_dic[date][project] = total_cost_dic[date].get(project, 0) + project_cost_dic[project]
+            else:
+                total_cost_dic[date] = project_cost_dic
+
+    return total_cost_dic
+
+
+def write_cost_file(cost_file, total_cost_dic):
+    """
+    Write total_cost_dic into cost file, every date has every project.
+    """
+    total_project_list = []
+
+    for date in total_cost_dic:
+        for project in total_cost_dic[date]:
+            if project not in total_project_list:
+                total_project_list.append(project)
+
+    tmp_file = str(cost_file) + '.tmp'
+
+    with open(tmp_file, 'w') as CF:
+        for date in total_cost_dic:
+            line = date + ' '
+
+            for project in total_project_list:
+                line += '{:<15}'.format(r'%s:%s' % (project, str(total_cost_dic[date].get(project, 0))))
+
+            CF.write(line + '\n')
+
+    os.replace(tmp_file, cost_file)
+
+
+def gen_cost_line(date, project_cost_dic):
+    """
+    Generate one cost ledger line.
+    """
+    line = str(date)
+
+    for project in project_cost_dic:
+        line += ' %s:%s' % (str(project), str(project_cost_dic[project]))
+
+    return line + '\n'
+
+
+def append_palladium_cost_ledger(hardware, emulator, date, project_cost_dic):
+    """
+    Append one sample record into cost ledger.
+    """
+    cost_file_dic = get_palladium_cost_file_dic(hardware, emulator)
+    LF = common.lock_file(cost_file_dic['lock'])
+
+    try:
+        with open(cost_file_dic['ledger'], 'a') as LDF:
+            LDF.write(gen_cost_line(date, project_cost_dic))
+    finally:
+        common.unlock_file(LF)
+
+
+def get_palladium_cost_ledger_list(hardware, emulator):
+    """
+    Get un-finished compacting ledger files and ledger file for specified emulator.
+    """
+    cost_file_dic = get_palladium_cost_file_dic(hardware, emulator)
+    emulator_path = os.path.dirname(cost_file_dic['ledger'])
+    ledger_list = []
+
+    if os.path.exists(emulator_path):
+        for file_name in sorted(os.listdir(emulator_path)):
+            if file_name.startswith('cost.ledger.compacting.'):
+                ledger_list.append(os.path.join(emulator_path, file_name))
+
+    if os.path.exists(cost_file_dic['ledger']):
+        ledger_list.append(cost_file_dic['ledger'])
+
+    return ledger_list
+
+
+def load_palladium_cost(hardware, emulator):
+    """
+    Load emulator cost information, merge compacted daily totals with ledger tail.
+    Return total_cost_dic = {<date>: {<project>: <cost>}}.
+    """
+    cost_file_dic = get_palladium_cost_file_dic(hardware, emulator)
+
+    try:
+        LF = common.lock_file(cost_file_dic['lock'])
+    except OSError:
+        # Read-only db path (monitor user), read without lock.
+        LF = None
+
+    try:
+        total_cost_dic = read_cost_file(cost_file_dic['cost'])
+
+        for ledger_file in get_palladium_cost_ledger_list(hardware, emulator):
+            read_cost_file(ledger_file, total_cost_dic, accumulate=True)
+    finally:
+        common.unlock_file(LF)
+
+    return total_cost_dic
+
+
+def compact_palladium_cost(hardware, emulator, block=True):
+    """
+    Fold cost ledger into cost file daily totals.
+    Return False if the cost is locked by others with block=False.
+    """
+    cost_file_dic = get_palladium_cost_file_dic(hardware, emulator)
+    LF = common.lock_file(cost_file_dic['lock'], exclusive=True, block=block)
+
+    if not LF:
+        return False
+
+    try:
+        ledger_list = get_palladium_cost_ledger_list(hardware, emulator)
+
+        if ledger_list:
+            # Rename ledger first, keep it until cost file is updated, so an interrupted compaction loses nothing.
+            if cost_file_dic['ledger'] in ledger_list:
+                compacting_ledger_file = cost_file_dic['ledger'] + '.compacting.' + datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
+                os.rename(cost_file_dic['ledger'], compacting_ledger_file)
+                ledger_list[ledger_list.index(cost_file_dic['ledger'])] = compacting_ledger_file
+
+            total_cost_dic = read_cost_file(cost_file_dic['cost'])
+
+            for ledger_file in ledger_list:
+                read_cost_file(ledger_file, total_cost_dic, accumulate=True)
+
+            write_cost_file(cost_file_dic['cost'], total_cost_dic)
+
+            for ledger_file in ledger_list:
+                os.remove(ledger_file)
+    finally:
+        common.unlock_file(LF)
+
+    return True
+
+
+def need_compact_palladium_cost(hardware, emulator):
+    """
+    Check whether cost ledger is big enough to compact.
+    """
+    ledger_file = get_palladium_cost_file_dic(hardware, emulator)['ledger']
+    compact_size = getattr(config, 'palladium_cost_ledger_compact_size', COST_LEDGER_COMPACT_SIZE)
+
+    return os.path.exists(ledger_file) and (os.path.getsize(ledger_file) >= int(compact_size))
@@ -0,0 +1,415 @@
+import os
+import re
+import sys
+import json
+import yaml
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common, common_sqlite3, common_palladium, common_delta, common_pack, common_retention
+from config import config
+
+logger = common.get_logger()
+
+# Sample database file name under <db_path>/<hardware>.
+PALLADIUM_SAMPLE_DB = 'sample.db'
+
+# "structure" keeps rack/cluster/logic_drawer tree (with ccd_status/logic_drawer_status) and their lists as json, so the
+# clusters and logic drawers without domains are saved too.
+PALLADIUM_SAMPLE_KEY_LIST = ['hardware', 'emulator', 'sample_ts', 'hardware_info', 'emulator_status', 'utilization', 'domain_line_num', 'structure']
+PALLADIUM_DOMAIN_KEY_LIST = ['hardware', 'emulator', 'sample_ts', 'rack', 'cluster', 'ccd_status', 'logic_drawer', 'logic_drawer_status', 'domain', 'owner', 'pid', 'tpod', 'design', 'elaptime', 'reservedkey']
+
+
+def get_palladium_sample_db_file(hardware):
+    """
+    Get sqlite sample database file for specified palladium hardware.
+    """
+    return os.path.join(str(config.db_path), str(hardware), PALLADIUM_SAMPLE_DB)
+
+
+def gen_palladium_sample_path(db_file, hardware, emulator, sample_ts):
+    """
+    Generate sample path for a sample saved in sqlite database, format "<db_file>#<hardware>#<emulator>#<sample_ts>".
+    """
+    return '%s#%s#%s#%s' % (str(db_file), str(hardware), str(emulator), str(sample_ts))
+
+
+def parse_palladium_sample_path(sample_path):
+    """
+    Split sqlite sample path into (db_file, hardware, emulator, sample_ts), return None for yaml sample file.
+    """
+    item_list = str(sample_path).rsplit('#', 3)
+
+    if (len(item_list) == 4) and item_list[0].endswith('.db') and item_list[3].isdigit():
+        return (item_list[0], item_list[1], item_list[2], int(item_list[3]))
+
+    return None
+
+
+def init_palladium_sample_db(db_file, orig_conn=''):
+    """
+    Create sample/domain_record tables and indexes if not exist.
+    """
+    sample_init_string = "(hardware TEXT, emulator TEXT, sample_ts INTEGER, hardware_info TEXT, emulator_status TEXT, utilization REAL, domain_line_num INTEGER, structure TEXT, PRIMARY KEY (hardware, emulator, sample_ts));"
+    domain_init_string = "(hardware TEXT, emulator TEXT, sample_ts INTEGER, rack TEXT, cluster TEXT, ccd_status TEXT, logic_drawer TEXT, logic_drawer_status TEXT, domain TEXT, owner TEXT, pid TEXT, tpod TEXT, design TEXT, elaptime TEXT, reservedkey TEXT, PRIMARY KEY (hardware, emulator, sample_ts, rack, cluster, logic_drawer, domain));"
+
+    common_sqlite3.create_sql_table(db_file, orig_conn, 'sample', sample_init_string, commit=False)
+
+    # Sample databases created before "structure" column.
+    if 'structure' not in common_sqlite3.get_sql_table_key_list(db_file, orig_conn, 'sample'):
+        common_sqlite3.add_sql_table_column(db_file, orig_conn, 'sample', 'structure TEXT', commit=False)
+    common_sqlite3.create_sql_table(db_file, orig_conn, 'domain_record', domain_init_string, commit=False)
+    common_sqlite3.create_sql_index(db_file, orig_conn, 'domain_record_time_index', 'domain_record', ['sample_ts'], commit=False)
+    common_sqlite3.create_sql_index(db_file, orig_conn, 'domain_record_owner_index', 'domain_record', ['owner'], commit=False)
+    common_sqlite3.create_sql_index(db_file, orig_conn, 'domain_record_design_index', 'domain_record', ['design'], commit=False)
+
+
+def save_palladium_sample(db_file, hardware, sample_ts, palladium_dic, orig_conn=''):
+    """
+    Save palladium_dic into sqlite sample database as flat domain records.
+    sample_ts is an integer with format YYYYMMDDHHMMSS.
+    Return True if the sample is saved (committed if orig_conn is not specified).
+    """
+    if not palladium_dic:
+        return False
+
+    db_dir = os.path.dirname(db_file)
+
+    if db_dir and (not os.path.exists(db_dir)):
+        os.makedirs(db_dir)
+
+    if orig_conn == '':
+        (result, conn) = common_sqlite3.connect_db_file(db_file, mode='write')
+
+        if result != 'passed':
+            logger.error('Could not save sample ' + str(sample_ts) + ' into "' + str(db_file) + '", database is ' + str(result) + '.')
+            return False
+    else:
+        conn = orig_conn
+
+    emulator = palladium_dic['emulator']
+    structure_dic = {'rack_list': palladium_dic.get('rack_list', []),
+                     'cluster_list': palladium_dic.get('cluster_list', []),
+                     'logic_drawer_list': palladium_dic.get('logic_drawer_list', []),
+                     'rack': [],
+                     'cluster': [],
+                     'logic_drawer': []}
+    domain_value_list = []
+
+    for rack in palladium_dic['rack'].keys():
+        structure_dic['rack'].append(rack)
+
+        for cluster in palladium_dic['rack'][rack]['cluster'].keys():
+            ccd_status = palladium_dic['rack'][rack]['cluster'][cluster]['ccd_status']
+            structure_dic['cluster'].append([rack, cluster, ccd_status])
+
+            for logic_drawer in palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'].keys():
+                logic_drawer_status = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['logic_drawer_status']
+                structure_dic['logic_drawer'].append([rack, cluster, logic_drawer, logic_drawer_status])
+
+                for domain, domain_dic in palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'].items():
+                    domain_value_list.append((hardware, emulator, int(sample_ts), rack, cluster, ccd_status, logic_drawer, logic_drawer_status, domain, domain_dic['owner'], domain_dic['pid'], domain_dic['tpod'], domain_dic['design'], domain_dic['elaptime'], domain_dic['reservedkey']))
+
+    sample_value_list = [(hardware, emulator, int(sample_ts), palladium_dic['hardware'], palladium_dic['emulator_status'], palladium_dic['utilization'], palladium_dic['domain_line_num'], json.dumps(structure_dic))]
+
+    init_palladium_sample_db(db_file, conn)
+
+    # Remove domain records of the sample saved before, so a re-saved sample keeps no stale domains.
+    common_sqlite3.delete_sql_table_data(db_file, conn, 'domain_record', "hardware=" + quote_sql_value(hardware) + " AND emulator=" + quote_sql_value(emulator) + " AND sample_ts=" + str(int(sample_ts)), commit=False)
+
+    # Insert errors are reported by common_sqlite3 only, check them with the changed row number.
+    total_changes = conn.total_changes
+    common_sqlite3.insert_many_into_sql_table(db_file, conn, 'sample', sample_value_list, commit=False, replace=True)
+    common_sqlite3.insert_many_into_sql_table(db_file, conn, 'domain_record', domain_value_list, commit=False, replace=True)
+    saved = (conn.total_changes - total_changes >= len(sample_value_list) + len(domain_value_list))
+
+    if orig_conn == '':
+        try:
+            if saved:
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception as error:
+            logger.error('Failed on committing sample ' + str(sample_ts) + ' into "' + str(db_file) + '": ' + str(error))
+            saved = False
+        finally:
+            conn.close()
+
+    if not saved:
+        logger.error('Could not save sample ' + str(sample_ts) + ' into "' + str(db_file) + '".')
+
+    return saved
+
+
+def quote_sql_value(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def load_palladium_sample(db_file, hardware, emulator, sample_ts, orig_conn=''):
+    """
+    Load one sample from sqlite sample database, return the same palladium_dic as parse_test_server_info.
+    """
+    palladium_dic = {}
+    select_condition = "WHERE hardware=" + quote_sql_value(hardware) + " AND emulator=" + quote_sql_value(emulator) + " AND sample_ts=" + str(int(sample_ts))
+    # All columns, sample databases created before "structure" column are read without it.
+    sample_data_dic = common_sqlite3.get_sql_table_data(db_file, orig_conn, 'sample', [], select_condition)
+
+    if not sample_data_dic:
+        return palladium_dic
+
+    domain_data_dic = common_sqlite3.get_sql_table_data(db_file, orig_conn, 'domain_record', PALLADIUM_DOMAIN_KEY_LIST, select_condition + ' ORDER BY rowid')
+
+    return gen_palladium_dic(sample_data_dic, domain_data_dic)
+
+
+def gen_palladium_dic(sample_data_dic, domain_data_dic, index=0):
+    """
+    Switch sqlite sample/domain_record column data into palladium_dic.
+    rack/cluster/logic_drawer tree and lists come from sample "structure", or from domain records for the samples saved without it.
+    """
+    palladium_dic = {'emulator': sample_data_dic['emulator'][index],
+                     'hardware': sample_data_dic['hardware_info'][index],
+                     'emulator_status': sample_data_dic['emulator_status'][index],
+                     'utilization': sample_data_dic['utilization'][index],
+                     'domain_line_num': sample_data_dic['domain_line_num'][index],
+                     'rack_list': [],
+                     'cluster_list': [],
+                     'logic_drawer_list': [],
+                     'domain_list': [],
+                     'owner_list': [],
+                     'pid_list': [],
+                     'tpod_list': [],
+                     'design_list': [],
+                     'rack': {}}
+    unique_dic = {key: set() for key in ['rack_list', 'cluster_list', 'logic_drawer_list', 'domain_list', 'owner_list', 'pid_list', 'tpod_list', 'design_list']}
+    structure = sample_data_dic.get('structure', [None] * (index + 1))[index]
+
+    if structure:
+        structure_dic = json.loads(structure)
+
+        for key in ['rack_list', 'cluster_list', 'logic_drawer_list']:
+            palladium_dic[key] = list(structure_dic[key])
+            unique_dic[key] = set(structure_dic[key])
+
+        for rack in structure_dic['rack']:
+            palladium_dic['rack'][rack] = {'cluster': {}}
+
+        for (rack, cluster, ccd_status) in structure_dic['cluster']:
+            palladium_dic['rack'][rack]['cluster'][cluster] = {'ccd_status': ccd_status, 'logic_drawer': {}}
+
+        for (rack, cluster, logic_drawer, logic_drawer_status) in structure_dic['logic_drawer']:
+            palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer] = {'logic_drawer_status': logic_drawer_status, 'domain': {}}
+
+    for i in range(len(domain_data_dic.get('domain', []))):
+        rack = domain_data_dic['rack'][i]
+        cluster = domain_data_dic['cluster'][i]
+        logic_drawer = domain_data_dic['logic_drawer'][i]
+        domain = domain_data_dic['domain'][i]
+        domain_dic = {'owner': domain_data_dic['owner'][i],
+                      'pid': domain_data_dic['pid'][i],
+                      'tpod': domain_data_dic['tpod'][i],
+                      'design': domain_data_dic['design'][i],
+                      'elaptime': domain_data_dic['elaptime'][i],
+                      'reservedkey': domain_data_dic['reservedkey'][i]}
+
+        rack_dic = palladium_dic['rack'].setdefault(rack, {'cluster': {}})
+        cluster_dic = rack_dic['cluster'].setdefault(cluster, {'ccd_status': domain_data_dic['ccd_status'][i], 'logic_drawer': {}})
+        logic_drawer_dic = cluster_dic['logic_drawer'].setdefault(logic_drawer, {'logic_drawer_status': domain_data_dic['logic_drawer_status'][i], 'domain': {}})
+        logic_drawer_dic['domain'].setdefault(domain, domain_dic)
+
+        for (key, value) in [('rack_list', rack), ('cluster_list', cluster), ('logic_drawer_list', logic_drawer), ('domain_list', domain), ('owner_list', domain_dic['owner']), ('pid_list', domain_dic['pid']), ('tpod_list', domain_dic['tpod']), ('design_list', domain_dic['design'])]:
+            if value not in unique_dic[key]:
+                unique_dic[key].add(value)
+                palladium_dic[key].append(value)
+
+    return palladium_dic
+
+
+def get_palladium_sample_list(db_file, orig_conn=''):
+    """
+    Get all samples on sqlite sample database, return list of (hardware, emulator, sample_ts).
+    """
+    sample_list = []
+
+    if not os.path.exists(db_file):
+        return sample_list
+
+    sample_data_dic = common_sqlite3.get_sql_table_data(db_file, orig_conn, 'sample', ['hardware', 'emulator', 'sample_ts'], 'ORDER BY sample_ts')
+
+    for i in range(len(sample_data_dic.get('sample_ts', []))):
+        sample_list.append((sample_data_dic['hardware'][i], sample_data_dic['emulator'][i], sample_data_dic['sample_ts'][i]))
+
+    return sample_list
+
+
+def read_palladium_sample(sample_path):
+    """
+    Read one history palladium sample, sample_path could be a yaml file, a sqlite sample path, a delta sample path, a pack sample path or a rollup sample path.
+    For a rollup, the first merged sample is returned.
+    """
+    palladium_dic = {}
+    delta_sample = common_delta.parse_palladium_delta_sample_path(sample_path)
+    pack_sample = common_pack.parse_palladium_pack_sample_path(sample_path)
+    rollup_sample = common_retention.parse_palladium_rollup_sample_path(sample_path)
+    sqlite_sample = parse_palladium_sample_path(sample_path)
+
+    if rollup_sample:
+        rollup_dic = common_retention.read_palladium_rollup(*rollup_sample)
+
+        if rollup_dic:
+            palladium_dic = rollup_dic['sample']
+    elif pack_sample:
+        (pack_file, day_time) = pack_sample
+        content = common_pack.read_palladium_pack_sample(pack_file, day_time)
+
+        if content:
+            palladium_dic = yaml.load(content, Loader=yaml.FullLoader)
+    elif delta_sample:
+        (delta_file, day_time) = delta_sample
+        palladium_dic = common_delta.read_palladium_delta_sample(delta_file, day_time)
+    elif sqlite_sample:
+        (db_file, hardware, emulator, sample_ts) = sqlite_sample
+        palladium_dic = load_palladium_sample(db_file, hardware, emulator, sample_ts)
+    elif os.path.isfile(sample_path):
+        with open(sample_path, 'r') as SF:
+            palladium_dic = yaml.load(SF, Loader=yaml.FullLoader)
+
+    return palladium_dic
+
+
+def read_palladium_sample_table(sample_path):
+    """
+    Read one history palladium sample as DomainTable for cost and detail utilization regeneration.
+    For a rollup, every merged domain sampling is one row, so the rollup counts as all of its merged samples.
+    """
+    rollup_sample = common_retention.parse_palladium_rollup_sample_path(sample_path)
+
+    if rollup_sample:
+        rollup_dic = common_retention.read_palladium_rollup(*rollup_sample)
+
+        if rollup_dic:
+            return common_retention.gen_palladium_rollup_table(rollup_dic)
+
+    return common_palladium.DomainTable.from_dict(read_palladium_sample(sample_path))
+
+
+def get_palladium_history_sample_list(db_path, hardware_list=[]):
+    """
+    Get all history palladium samples (yaml files, pack files, delta files, rollup files and sqlite samples) under db_path.
+    Return list of (hardware, emulator, year, month, day, day_time, sample_path).
+    If one sample is on both yaml file and sqlite database (imported), the sqlite sample is used.
+    """
+    history_sample_list = []
+
+    if not os.path.isdir(db_path):
+        return history_sample_list
+
+    for hardware in sorted(os.listdir(db_path)):
+        hardware_path = os.path.join(db_path, hardware)
+
+        if (not os.path.isdir(hardware_path)) or (hardware_list and (hardware not in hardware_list)):
+            continue
+
+        # sqlite samples.
+        db_file = os.path.join(hardware_path, PALLADIUM_SAMPLE_DB)
+        sqlite_sample_set = set()
+
+        for (sample_hardware, emulator, sample_ts) in get_palladium_sample_list(db_file):
+            sample_ts = str(sample_ts)
+            sqlite_sample_set.add((emulator, sample_ts))
+            history_sample_list.append((hardware, emulator, sample_ts[0:4], sample_ts[4:6], sample_ts[6:8], sample_ts[8:14], gen_palladium_sample_path(db_file, sample_hardware, emulator, sample_ts)))
+
+        # yaml samples, <db_path>/<hardware>/<emulator>/<year>/<month>/<day>/<time>
+        for dir_path, dir_name_list, file_name_list in os.walk(hardware_path):
+            dir_item_list = os.path.relpath(dir_path, hardware_path).split(os.sep)
+
+            # delta samples, <db_path>/<hardware>/<emulator>/<year>/<month>/<day>.delta
+            if len(dir_item_list) == 3:
+                (emulator, year, month) = dir_item_list
+
+                for file_name in sorted(file_name_list):
+                    if my_match := re.match(r'^(\d+)' + re.escape(common_delta.PALLADIUM_DELTA_SUFFIX) + '$', file_name):
+                        day = my_match.group(1)
+                        delta_file = os.path.join(dir_path, file_name)
+
+                        for day_time in common_delta.get_palladium_delta_time_list(delta_file):
+                            if (emulator, str(year) + str(month) + str(day) + day_time.zfill(6)) not in sqlite_sample_set:
+                                history_sample_list.append((hardware, emulator, year, month, day, day_time, common_delta.gen_palladium_delta_sample_path(delta_file, day_time)))
+
+                # packed yaml samples, <db_path>/<hardware>/<emulator>/<year>/<month>/<day>.pack
+                for file_name in sorted(file_name_list):
+                    if my_match := re.match(r'^(\d+)' + re.escape(common_pack.PALLADIUM_PACK_SUFFIX) + '$', file_name):
+                        day = my_match.group(1)
+                        pack_file = os.path.join(dir_path, file_name)
+
+                        for day_time in common_pack.get_palladium_pack_time_list(pack_file):
+                            if (emulator, str(year) + str(month) + str(day) + day_time.zfill(6)) not in sqlite_sample_set:
+                                history_sample_list.append((hardware, emulator, year, month, day, day_time, common_pack.gen_palladium_pack_sample_path(pack_file, day_time)))
+
+                # rollups of retention policy, <db_path>/<hardware>/<emulator>/<year>/<month>/<day>.rollup
+                for file_name in sorted(file_name_list):
+                    if my_match := re.match(r'^(\d+)' + re.escape(common_retention.PALLADIUM_ROLLUP_SUFFIX) + '$', file_name):
+                        day = my_match.group(1)
+                        rollup_file = os.path.join(dir_path, file_name)
+
+                        for rollup_dic in common_retention.read_palladium_rollup_list(rollup_file):
+                            history_sample_list.append((hardware, emulator, year, month, day, rollup_dic['time'], common_retention.gen_palladium_rollup_sample_path(rollup_file, rollup_dic['time'])))
+
+            if len(dir_item_list) != 4:
+                continue
+
+            (emulator, year, month, day) = dir_item_list
+
+            for file_name in sorted(file_name_list):
+                if re.match(r'^\d+$', file_name) and ((emulator, str(year) + str(month) + str(day) + file_name.zfill(6)) not in sqlite_sample_set):
+                    history_sample_list.append((hardware, emulator, year, month, day, file_name, os.path.join(dir_path, file_name)))
+
+    history_sample_list.sort(key=lambda x: (x[0], x[1], x[2], x[3], x[4], x[5]))
+
+    return history_sample_list
+
+
+def import_palladium_yaml_samples(hardware, db_path=None):
+    """
+    Import history yaml/pack/delta samples of specified hardware into the sqlite sample database.
+    """
+    if not db_path:
+        db_path = config.db_path
+
+    db_file = os.path.join(str(db_path), str(hardware), PALLADIUM_SAMPLE_DB)
+    (result, conn) = common_sqlite3.connect_db_file(db_file, mode='write')
+
+    if result != 'passed':
+        logger.error('Failed on opening sample database "' + str(db_file) + '".')
+        return 0
+
+    init_palladium_sample_db(db_file, conn)
+    import_num = 0
+
+    for (sample_hardware, emulator, year, month, day, day_time, sample_path) in get_palladium_history_sample_list(db_path, hardware_list=[hardware, ]):
+        # Rollups are not single samples, keep them on rollup files.
+        if parse_palladium_sample_path(sample_path) or common_retention.parse_palladium_rollup_sample_path(sample_path):
+            continue
+
+        try:
+            palladium_dic = read_palladium_sample(sample_path)
+        except Exception as error:
+            logger.warning('Failed on loading sample file "' + str(sample_path) + '": ' + str(error))
+            continue
+
+        if not palladium_dic:
+            continue
+
+        if not save_palladium_sample(db_file, hardware, '%s%s%s%s' % (year, month, day, day_time.zfill(6)), palladium_dic, orig_conn=conn):
+            continue
+
+        import_num += 1
+
+        # Commit every 500 samples, keep the journal small.
+        if import_num % 500 == 0:
+            conn.commit()
+            logger.info('    ' + str(import_num) + ' samples imported ...')
+
+    conn.commit()
+    conn.close()
+
+    return import_num
@@ -0,0 +1,322 @@
+import os
+import re
+import sys
+import json
+import collections
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common, common_palladium
+from config import config
+
+logger = common.get_logger()
+
+# Delta sample file, one file per emulator per day <db_path>/<hardware>/<emulator>/<year>/<month>/<day>.delta
+# Every line is a json record, the first record of the day is a keyframe (full snapshot), the others only keep
+# the domains (and info/structure) changed since the previous sample.
+PALLADIUM_DELTA_SUFFIX = '.delta'
+
+# Write a keyframe instead of a delta if more than this proportion of domains changed.
+PALLADIUM_DELTA_KEYFRAME_RATIO = 0.5
+
+# palladium_dic *_list items which are regenerated from domain rows if they match.
+DERIVED_LIST_KEY_LIST = ['rack_list', 'cluster_list', 'logic_drawer_list', 'domain_list', 'owner_list', 'pid_list', 'tpod_list', 'design_list']
+
+# Keep the reconstruct state of the latest read delta files, so sequential reads continue instead of replaying the day.
+DELTA_READ_CACHE = collections.OrderedDict()
+DELTA_READ_CACHE_SIZE = 4
+
+
+def get_palladium_delta_file(hardware, emulator, year, month, day):
+    """
+    Get delta sample file of specified emulator and day.
+    """
+    return os.path.join(str(config.db_path), str(hardware), str(emulator), str(year), str(month), str(day) + PALLADIUM_DELTA_SUFFIX)
+
+
+def gen_palladium_delta_sample_path(delta_file, day_time):
+    """
+    Generate sample path for a sample saved in delta file, format "<delta_file>#<time>".
+    """
+    return str(delta_file) + '#' + str(day_time)
+
+
+def parse_palladium_delta_sample_path(sample_path):
+    """
+    Split delta sample path into (delta_file, time), return None for other sample path.
+    """
+    if my_match := re.match(r'^(.+' + re.escape(PALLADIUM_DELTA_SUFFIX) + r')#(\d+)$', str(sample_path)):
+        return my_match.group(1), my_match.group(2)
+
+    return None
+
+
+def derive_list_dic(row_dic, structure_dic):
+    """
+    Generate *_list items from domain rows and structure, on the order of parse_test_server_info for normal test_server output.
+    """
+    list_dic = {key: [] for key in DERIVED_LIST_KEY_LIST}
+    list_dic['rack_list'] = list(structure_dic['rack_list'])
+
+    for item_list in (structure_dic['cluster'], structure_dic['logic_drawer']):
+        key = 'cluster_list' if (item_list is structure_dic['cluster']) else 'logic_drawer_list'
+        unique_set = set()
+
+        for item in item_list:
+            if item[-2] not in unique_set:
+                unique_set.add(item[-2])
+                list_dic[key].append(item[-2])
+
+    unique_set_dic = {key: set() for key in ['domain_list', 'owner_list', 'pid_list', 'tpod_list', 'design_list']}
+
+    for (key, record) in row_dic.items():
+        for (list_key, value) in (('domain_list', key[3]), ('owner_list', record[0]), ('pid_list', record[1]), ('tpod_list', record[2]), ('design_list', record[3])):
+            if value not in unique_set_dic[list_key]:
+                unique_set_dic[list_key].add(value)
+                list_dic[list_key].append(value)
+
+    return list_dic
+
+
+def gen_delta_state(palladium_dic):
+    """
+    Switch palladium_dic into delta state.
+    state = {'key_list': <palladium_dic key order>,
+             'info': {<non-domain item>: <value>},                     # *_list items only if they could not be derived
+             'structure': {'rack_list': [...], 'cluster': [[rack, cluster, ccd_status], ...], 'logic_drawer': [[rack, cluster, logic_drawer, logic_drawer_status], ...]},
+             'row': {(rack, cluster, logic_drawer, domain): [owner, pid, tpod, design, elaptime, reservedkey]}}
+    """
+    domain_table = common_palladium.DomainTable.from_dict(palladium_dic)
+    structure_dic = {'rack_list': list(domain_table.rack_list),
+                     'cluster': [[rack, cluster, ccd_status] for ((rack, cluster), ccd_status) in domain_table.cluster_dic.items()],
+                     'logic_drawer': [[rack, cluster, logic_drawer, logic_drawer_status] for ((rack, cluster, logic_drawer), logic_drawer_status) in domain_table.logic_drawer_dic.items()]}
+    row_dic = {tuple(item[:4]): list(item[4:]) for item in domain_table.iter_columns(*common_palladium.DOMAIN_TABLE_COLUMN_LIST)}
+    list_dic = derive_list_dic(row_dic, structure_dic)
+    info_dic = {key: value for (key, value) in domain_table.info_dic.items() if (key not in list_dic) or (value != list_dic[key])}
+
+    return {'key_list': list(palladium_dic.keys()), 'info': info_dic, 'structure': structure_dic, 'row': row_dic}
+
+
+def gen_palladium_dic(state):
+    """
+    Switch delta state into palladium_dic.
+    """
+    domain_table = common_palladium.DomainTable()
+    structure_dic = state['structure']
+    domain_table.rack_list = list(structure_dic['rack_list'])
+    domain_table.cluster_dic = {(rack, cluster): ccd_status for (rack, cluster, ccd_status) in structure_dic['cluster']}
+    domain_table.logic_drawer_dic = {(rack, cluster, logic_drawer): logic_drawer_status for (rack, cluster, logic_drawer, logic_drawer_status) in structure_dic['logic_drawer']}
+
+    for (key, record) in state['row'].items():
+        for (column, value) in zip(common_palladium.DOMAIN_TABLE_COLUMN_LIST, key + tuple(record)):
+            domain_table.column_dic[column].append(value)
+
+    list_dic = None
+
+    for key in state['key_list']:
+        if key == 'rack':
+            continue
+        elif key in state['info']:
+            domain_table.info_dic[key] = state['info'][key]
+        elif key in DERIVED_LIST_KEY_LIST:
+            if list_dic is None:
+                list_dic = derive_list_dic(state['row'], structure_dic)
+
+            domain_table.info_dic[key] = list_dic[key]
+
+    palladium_dic = domain_table.to_dict()
+
+    # Keep palladium_dic key order.
+    return {key: palladium_dic[key] for key in state['key_list'] if key in palladium_dic}
+
+
+def gen_keyframe_record(day_time, state):
+    return {'time': str(day_time), 'keyframe': True, 'key_list': state['key_list'], 'info': state['info'], 'structure': state['structure'], 'row': [list(key) + record for (key, record) in state['row'].items()]}
+
+
+def gen_delta_record(day_time, old_state, new_state):
+    """
+    Generate the delta record from old_state to new_state.
+    """
+    record = {'time': str(day_time)}
+
+    if old_state['key_list'] != new_state['key_list']:
+        record['key_list'] = new_state['key_list']
+
+    info_dic = {key: value for (key, value) in new_state['info'].items() if (key not in old_state['info']) or (old_state['info'][key] != value)}
+    info_del_list = [key for key in old_state['info'] if key not in new_state['info']]
+
+    if info_dic:
+        record['info'] = info_dic
+
+    if info_del_list:
+        record['info_del'] = info_del_list
+
+    if old_state['structure'] != new_state['structure']:
+        record['structure'] = new_state['structure']
+
+    row_list = [list(key) + value for (key, value) in new_state['row'].items() if old_state['row'].get(key) != value]
+    row_del_list = [list(key) for key in old_state['row'] if key not in new_state['row']]
+
+    if row_list:
+        record['row'] = row_list
+
+    if row_del_list:
+        record['row_del'] = row_del_list
+
+    return record
+
+
+def apply_record(state, record):
+    """
+    Apply keyframe/delta record on state, return the new state.
+    """
+    if record.get('keyframe'):
+        return {'key_list': record['key_list'], 'info': record['info'], 'structure': record['structure'], 'row': {tuple(item[:4]): item[4:] for item in record['row']}}
+
+    if 'key_list' in record:
+        state['key_list'] = record['key_list']
+
+    for key in record.get('info_del', []):
+        state['info'].pop(key, None)
+
+    state['info'].update(record.get('info', {}))
+
+    if 'structure' in record:
+        state['structure'] = record['structure']
+
+    for item in record.get('row_del', []):
+        state['row'].pop(tuple(item), None)
+
+    for item in record.get('row', []):
+        state['row'][tuple(item[:4])] = item[4:]
+
+    return state
+
+
+def copy_state(state):
+    return {'key_list': list(state['key_list']), 'info': dict(state['info']), 'structure': state['structure'], 'row': dict(state['row'])}
+
+
+def dump_record(record):
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def read_delta_state(delta_file, day_time=None):
+    """
+    Reconstruct the state of the latest sample not later than day_time (the last sample if day_time is None) on delta file.
+    Return (time, state), or (None, None) if no such sample.
+    Sequential reads on the same file continue from the cached state.
+    """
+    if not os.path.exists(delta_file):
+        return None, None
+
+    target_time = None if (day_time is None) else int(day_time)
+    cache = DELTA_READ_CACHE.get(delta_file)
+
+    if (not cache) or (cache['inode'] != os.stat(delta_file).st_ino) or ((target_time is not None) and (cache['time'] is not None) and (int(cache['time']) > target_time)):
+        cache = {'inode': os.stat(delta_file).st_ino, 'offset': 0, 'time': None, 'state': None}
+
+    with open(delta_file, 'r') as DF:
+        DF.seek(cache['offset'])
+
+        while True:
+            offset = DF.tell()
+            line = DF.readline()
+
+            # Stop on file end or an unfinished line (being written).
+            if (not line) or (not line.endswith('\n')):
+                break
+
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning('Invalid line on delta file "' + str(delta_file) + '", ignore.')
+                continue
+
+            if (target_time is not None) and (int(record['time']) > target_time):
+                DF.seek(offset)
+                break
+
+            if (cache['state'] is None) and (not record.get('keyframe')):
+                logger.warning('Delta record without keyframe on "' + str(delta_file) + '", ignore.')
+                continue
+
+            cache['state'] = apply_record(cache['state'], record)
+            cache['time'] = record['time']
+
+        cache['offset'] = DF.tell()
+
+    DELTA_READ_CACHE[delta_file] = cache
+    DELTA_READ_CACHE.move_to_end(delta_file)
+
+    while len(DELTA_READ_CACHE) > DELTA_READ_CACHE_SIZE:
+        DELTA_READ_CACHE.popitem(last=False)
+
+    if cache['state'] is None:
+        return None, None
+
+    return cache['time'], copy_state(cache['state'])
+
+
+def read_palladium_delta_sample(delta_file, day_time):
+    """
+    Reconstruct palladium_dic of the sample on specified time, return {} if it is not on delta file.
+    """
+    (sample_time, state) = read_delta_state(delta_file, day_time)
+
+    if (state is None) or (int(sample_time) != int(day_time)):
+        return {}
+
+    return gen_palladium_dic(state)
+
+
+def get_palladium_delta_time_list(delta_file):
+    """
+    Get sample time list on delta file.
+    """
+    time_list = []
+
+    with open(delta_file, 'r') as DF:
+        for line in DF:
+            if my_match := re.match(r'^\{"time":"(\d+)"', line):
+                time_list.append(my_match.group(1))
+
+    return time_list
+
+
+def save_palladium_delta_sample(hardware, emulator, year, month, day, day_time, palladium_dic):
+    """
+    Append palladium_dic into delta file of the day, as a delta to the previous sample, or as a keyframe for the first sample of the day,
+    or if the delta could not rebuild the sample exactly, or if too many domains changed.
+    Return sample path.
+    """
+    delta_file = get_palladium_delta_file(hardware, emulator, year, month, day)
+    new_state = gen_delta_state(palladium_dic)
+    os.makedirs(os.path.dirname(delta_file), exist_ok=True)
+
+    # Lock delta file, so concurrent samplers (cron psample and psample daemon) do not interleave records.
+    LF = common.lock_file(delta_file, exclusive=True)
+
+    try:
+        (old_time, old_state) = read_delta_state(delta_file)
+        record = None
+
+        if (old_state is not None) and (int(old_time) <= int(day_time)):
+            record = gen_delta_record(day_time, old_state, new_state)
+            keyframe_ratio = float(getattr(config, 'palladium_delta_keyframe_ratio', PALLADIUM_DELTA_KEYFRAME_RATIO))
+
+            if len(record.get('row', [])) + len(record.get('row_del', [])) > keyframe_ratio * max(len(new_state['row']), 1):
+                record = None
+            elif json.dumps(gen_palladium_dic(apply_record(old_state, json.loads(dump_record(record))))) != json.dumps(palladium_dic):
+                # Never save a delta which could not rebuild the sample exactly.
+                record = None
+
+        if record is None:
+            record = gen_keyframe_record(day_time, new_state)
+
+        with open(delta_file, 'a') as DF:
+            DF.write(dump_record(record))
+    finally:
+        common.unlock_file(LF)
+
+    return gen_palladium_delta_sample_path(delta_file, day_time)
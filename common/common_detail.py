@@ -0,0 +1,353 @@
+import os
+import re
+import sys
+import time
+import yaml
+import datetime
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common
+from config import config
+
+logger = common.get_logger()
+
+# Compact the month journal into <YYYY>.<MM>.utilization/.cost once it grows over this size (bytes).
+DETAIL_JOURNAL_COMPACT_SIZE = 1024 * 1024
+
+# Lock file under detail directory, journal appenders and readers share it, compaction locks it exclusively.
+DETAIL_LOCK_FILE = '.detail.lock'
+
+# Lock file under detail directory, detail regeneration locks it exclusively until every month is replaced,
+# compaction takes it shared, so no month base table is compacted and then replaced.
+DETAIL_REGENERATE_LOCK_FILE = '.detail.regenerate.lock'
+
+# Suffix of month journals frozen by detail regeneration.
+DETAIL_FROZEN_JOURNAL_SUFFIX = '.compacting.'
+
+
+def get_palladium_detail_dir(hardware, emulator):
+    """
+    Get detail directory for specified palladium hardware/emulator.
+    """
+    return str(config.db_path) + '/' + str(hardware) + '/' + str(emulator) + '/detail'
+
+
+def get_palladium_detail_file_dic(detail_dir, year, month):
+    """
+    Get utilization/cost base files and journal file for specified month.
+    """
+    month_prefix = os.path.join(str(detail_dir), '%s.%s' % (str(year), str(month).zfill(2)))
+    detail_file_dic = {'utilization': month_prefix + '.utilization',
+                       'cost': month_prefix + '.cost',
+                       'journal': month_prefix + '.journal'}
+
+    return detail_file_dic
+
+
+def get_palladium_detail_journal_list(detail_dir, year, month):
+    """
+    Get journal file and un-finished compacting journal files for specified month.
+    """
+    journal_file = get_palladium_detail_file_dic(detail_dir, year, month)['journal']
+    journal_list = []
+
+    if os.path.exists(detail_dir):
+        for file_name in sorted(os.listdir(detail_dir)):
+            if file_name.startswith(os.path.basename(journal_file) + '.'):
+                journal_list.append(os.path.join(str(detail_dir), file_name))
+
+    if os.path.exists(journal_file):
+        journal_list.append(journal_file)
+
+    return journal_list
+
+
+def lock_palladium_detail_dir(detail_dir, exclusive=False, block=True):
+    """
+    Lock detail directory with DETAIL_LOCK_FILE.
+    """
+    return common.lock_file(os.path.join(str(detail_dir), DETAIL_LOCK_FILE), exclusive=exclusive, block=block)
+
+
+def lock_palladium_detail_regeneration(detail_dir, exclusive=False, block=True):
+    """
+    Lock detail directory with DETAIL_REGENERATE_LOCK_FILE.
+    """
+    return common.lock_file(os.path.join(str(detail_dir), DETAIL_REGENERATE_LOCK_FILE), exclusive=exclusive, block=block)
+
+
+def gen_palladium_detail_journal_line(date, rack, cluster, logic_drawer, domain, used, project_dic={}):
+    """
+    Generate one journal line, format "<date> <rack> <cluster> <logic_drawer> <domain> <used> [<project>:<cost> ...]".
+    Every journal line stands for one sampling of the domain.
+    """
+    line = '%s %s %s %s %s %s' % (str(date), str(rack), str(cluster), str(logic_drawer), str(domain), str(int(used)))
+
+    for project in project_dic:
+        line += ' %s:%s' % (str(project), repr(project_dic[project]))
+
+    return line + '\n'
+
+
+def gen_palladium_detail_structure_line(date, *node_list):
+    """
+    Generate one structure journal line, format "<date> <rack> [<cluster> [<logic_drawer>]]".
+    It keeps the rack/cluster/logic_drawer without domain on the month tables (with empty usage), like the domain lines do for their parents.
+    """
+    return ' '.join([str(date), ] + [str(node) for node in node_list]) + '\n'
+
+
+def append_palladium_detail_journal(detail_dir, year, month, line_list):
+    """
+    Append journal lines (from gen_palladium_detail_journal_line) of one sample into month journal file with one write.
+    """
+    if not line_list:
+        return
+
+    if not os.path.exists(detail_dir):
+        os.makedirs(detail_dir)
+
+    journal_file = get_palladium_detail_file_dic(detail_dir, year, month)['journal']
+    LF = lock_palladium_detail_dir(detail_dir)
+
+    try:
+        with open(journal_file, 'a') as JF:
+            JF.write(''.join(line_list))
+    finally:
+        common.unlock_file(LF)
+
+
+def merge_palladium_detail_lines(line_list, utilization_dic, cost_dic, source='journal'):
+    """
+    Merge journal lines into utilization_dic/cost_dic (the month base table format).
+    """
+    for line in line_list:
+        item_list = line.split()
+
+        if 2 <= len(item_list) <= 4:
+            (utilization_node_dic, cost_node_dic) = (utilization_dic, cost_dic)
+
+            for node in item_list:
+                utilization_node_dic = utilization_node_dic.setdefault(node, {})
+                cost_node_dic = cost_node_dic.setdefault(node, {})
+
+            continue
+        elif len(item_list) < 6:
+            if item_list:
+                logger.warning('Invalid line on detail ' + str(source) + ', ignore: ' + str(line.strip()))
+
+            continue
+
+        (date, rack, cluster, logic_drawer, domain, used) = item_list[:6]
+
+        utilization_domain_dic = utilization_dic.setdefault(date, {}).setdefault(rack, {}).setdefault(cluster, {}).setdefault(logic_drawer, {}).setdefault(domain, {'sampling': 0, 'used': 0})
+        utilization_domain_dic['sampling'] += 1
+        utilization_domain_dic['used'] += int(used)
+
+        cost_domain_dic = cost_dic.setdefault(date, {}).setdefault(rack, {}).setdefault(cluster, {}).setdefault(logic_drawer, {}).setdefault(domain, {})
+
+        for project_cost in item_list[6:]:
+            (project, cost) = project_cost.rsplit(':', 1)
+            cost_domain_dic[project] = cost_domain_dic.get(project, 0) + common.parse_cost_value(cost)
+
+
+def merge_palladium_detail_journal(journal_file, utilization_dic, cost_dic):
+    """
+    Merge journal_file increments into utilization_dic/cost_dic (the month base table format).
+    """
+    with open(journal_file, 'r') as JF:
+        merge_palladium_detail_lines(JF, utilization_dic, cost_dic, source='journal "' + str(journal_file) + '"')
+
+
+def read_palladium_detail_base(detail_file):
+    """
+    Read month base table yaml file, return {} if it is missing or empty.
+    """
+    detail_dic = {}
+
+    if os.path.exists(detail_file):
+        with open(detail_file, 'r') as DF:
+            detail_dic = yaml.load(DF, Loader=yaml.FullLoader) or {}
+
+    return detail_dic
+
+
+def load_palladium_detail(detail_dir, year, month, item_list=['utilization', 'cost']):
+    """
+    Load month detail information, merge base table and journal increments.
+    Return (utilization_dic, cost_dic), the item not in item_list will be {}.
+    """
+    detail_file_dic = get_palladium_detail_file_dic(detail_dir, year, month)
+    utilization_dic = {}
+    cost_dic = {}
+
+    if not os.path.exists(detail_dir):
+        return utilization_dic, cost_dic
+
+    try:
+        LF = lock_palladium_detail_dir(detail_dir)
+    except OSError:
+        # Read-only db path (monitor user), read without lock.
+        LF = None
+
+    try:
+        if 'utilization' in item_list:
+            utilization_dic = read_palladium_detail_base(detail_file_dic['utilization'])
+
+        if 'cost' in item_list:
+            cost_dic = read_palladium_detail_base(detail_file_dic['cost'])
+
+        for journal_file in get_palladium_detail_journal_list(detail_dir, year, month):
+            merge_palladium_detail_journal(journal_file, utilization_dic, cost_dic)
+    finally:
+        common.unlock_file(LF)
+
+    if 'utilization' not in item_list:
+        utilization_dic = {}
+
+    if 'cost' not in item_list:
+        cost_dic = {}
+
+    return utilization_dic, cost_dic
+
+
+def write_yaml_file(yaml_file, yaml_dic):
+    """
+    Write yaml file with a temporary file and rename, so readers never see a half-written file.
+    """
+    tmp_file = str(yaml_file) + '.tmp'
+
+    with open(tmp_file, 'w') as TF:
+        TF.write(yaml.dump(yaml_dic, allow_unicode=True))
+
+    os.replace(tmp_file, yaml_file)
+
+
+def compact_palladium_detail(detail_dir, year, month, block=True):
+    """
+    Fold month journal into <YYYY>.<MM>.utilization/.cost base tables.
+    Return False if the detail directory is locked or being regenerated by others with block=False.
+    """
+    detail_file_dic = get_palladium_detail_file_dic(detail_dir, year, month)
+
+    # Base tables are replaced by the running regeneration, journal lines folded into them now are lost.
+    RLF = lock_palladium_detail_regeneration(detail_dir, block=block)
+
+    if not RLF:
+        logger.debug('Detail under "' + str(detail_dir) + '" is being regenerated, skip compaction.')
+        return False
+
+    LF = lock_palladium_detail_dir(detail_dir, exclusive=True, block=block)
+
+    if not LF:
+        common.unlock_file(RLF)
+        return False
+
+    try:
+        journal_list = get_palladium_detail_journal_list(detail_dir, year, month)
+
+        if journal_list:
+            # Rename journal first, keep it until base tables are updated, so an interrupted compaction loses nothing.
+            if detail_file_dic['journal'] in journal_list:
+                compacting_journal_file = detail_file_dic['journal'] + '.' + datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
+                os.rename(detail_file_dic['journal'], compacting_journal_file)
+                journal_list[journal_list.index(detail_file_dic['journal'])] = compacting_journal_file
+
+            utilization_dic = read_palladium_detail_base(detail_file_dic['utilization'])
+            cost_dic = read_palladium_detail_base(detail_file_dic['cost'])
+
+            for journal_file in journal_list:
+                merge_palladium_detail_journal(journal_file, utilization_dic, cost_dic)
+
+            write_yaml_file(detail_file_dic['utilization'], utilization_dic)
+            write_yaml_file(detail_file_dic['cost'], cost_dic)
+
+            for journal_file in journal_list:
+                os.remove(journal_file)
+    finally:
+        common.unlock_file(LF)
+        common.unlock_file(RLF)
+
+    return True
+
+
+def freeze_palladium_detail_journal(detail_dir):
+    """
+    Rename month journals to <YYYY>.<MM>.journal.compacting.<ts> before regenerating detail from history samples.
+    Return all journal files on detail_dir then (frozen and un-finished compacting ones), they are covered by the
+    regeneration, the journal lines appended by live samplers later are not.
+    The caller holds the regeneration lock (lock_palladium_detail_regeneration) until every month is replaced.
+    """
+    journal_list = []
+
+    if not os.path.exists(detail_dir):
+        return journal_list
+
+    LF = lock_palladium_detail_dir(detail_dir, exclusive=True)
+
+    try:
+        frozen_suffix = DETAIL_FROZEN_JOURNAL_SUFFIX + datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
+
+        for file_name in sorted(os.listdir(detail_dir)):
+            if re.match(r'^\d{4}\.\d{2}\.journal$', file_name):
+                os.rename(os.path.join(str(detail_dir), file_name), os.path.join(str(detail_dir), file_name + frozen_suffix))
+
+        for file_name in sorted(os.listdir(detail_dir)):
+            if re.match(r'^\d{4}\.\d{2}\.journal\..+$', file_name):
+                journal_list.append(os.path.join(str(detail_dir), file_name))
+    finally:
+        common.unlock_file(LF)
+
+    return journal_list
+
+
+def replace_palladium_detail(detail_dir, year, month, utilization_dic, cost_dic, journal_list=[]):
+    """
+    Replace month base tables with regenerated utilization_dic/cost_dic, and drop the month journals on journal_list
+    (from freeze_palladium_detail_journal), the journals appended after the freeze are kept.
+    """
+    if not os.path.exists(detail_dir):
+        os.makedirs(detail_dir)
+
+    detail_file_dic = get_palladium_detail_file_dic(detail_dir, year, month)
+    LF = lock_palladium_detail_dir(detail_dir, exclusive=True)
+
+    try:
+        write_yaml_file(detail_file_dic['utilization'], utilization_dic)
+        write_yaml_file(detail_file_dic['cost'], cost_dic)
+
+        for journal_file in get_palladium_detail_journal_list(detail_dir, year, month):
+            if journal_file in journal_list:
+                os.remove(journal_file)
+    finally:
+        common.unlock_file(LF)
+
+
+def compact_palladium_detail_dir(detail_dir):
+    """
+    Compact all month journals under detail_dir.
+    """
+    month_list = []
+
+    if os.path.exists(detail_dir):
+        for file_name in os.listdir(detail_dir):
+            if my_match := re.match(r'^(\d{4})\.(\d{2})\.journal(\..+)?$', file_name):
+                if (my_match.group(1), my_match.group(2)) not in month_list:
+                    month_list.append((my_match.group(1), my_match.group(2)))
+
+    for (year, month) in sorted(month_list):
+        start_time = time.time()
+        compact_palladium_detail(detail_dir, year, month)
+        logger.debug('    Compact detail journal ' + str(year) + '.' + str(month) + ' under "' + str(detail_dir) + '", ' + str(round(time.time() - start_time, 2)) + 's.')
+
+    return month_list
+
+
+def need_compact_palladium_detail(detail_dir, year, month):
+    """
+    Check whether month journal is big enough to compact.
+    """
+    journal_file = get_palladium_detail_file_dic(detail_dir, year, month)['journal']
+    compact_size = getattr(config, 'palladium_detail_journal_compact_size', DETAIL_JOURNAL_COMPACT_SIZE)
+
+    return os.path.exists(journal_file) and (os.path.getsize(journal_file) >= int(compact_size))
@@ -0,0 +1,344 @@
+import os
+import re
+import sys
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common, common_db
+from config import config
+
+logger = common.get_logger()
+
+# History manifest file under every hardware db path, samplers append one line per sample.
+# palladium : <db_path>/<hardware>/manifest, line "<emulator> <year> <month> <day> <time> <sample_path>"
+# protium   : <db_path>/protium/<hardware>/manifest, line "<year> <month> <day> <time> <sample_path>"
+# zebu      : <db_path>/zebu/sample/manifest, line "<year> <month> <day> <time> <sample_path>"
+MANIFEST_FILE = 'manifest'
+ZEBU_SAMPLE_HARDWARE = 'sample'
+
+
+class LazyHistoryDic(dict):
+    """
+    History path dict {<hardware>: <hardware history path dic>}.
+    Hardware list is known at start, the history path dic of a hardware is loaded with loader(hardware) on first access.
+    """
+    def __init__(self, hardware_list, loader):
+        super().__init__({hardware: None for hardware in hardware_list})
+        self.loader = loader
+
+    def __getitem__(self, hardware):
+        history_path_dic = super().__getitem__(hardware)
+
+        if history_path_dic is None:
+            history_path_dic = self.loader(hardware)
+            super().__setitem__(hardware, history_path_dic)
+
+        return history_path_dic
+
+    def get(self, hardware, default=None):
+        if hardware in self:
+            return self[hardware]
+
+        return default
+
+    def values(self):
+        return [self[hardware] for hardware in self.keys()]
+
+    def items(self):
+        return [(hardware, self[hardware]) for hardware in self.keys()]
+
+
+def get_manifest_file(hardware_path):
+    """
+    Get manifest file under hardware db path.
+    """
+    return os.path.join(str(hardware_path), MANIFEST_FILE)
+
+
+def gen_manifest_line(key_list, sample_path):
+    """
+    Generate one manifest line.
+    """
+    return ' '.join([str(key) for key in key_list] + [str(sample_path), ]) + '\n'
+
+
+def read_manifest(manifest_file, key_num):
+    """
+    Read manifest file into nested dict, key_num keys per line, the last item is sample path.
+    """
+    history_path_dic = {}
+
+    with open(manifest_file, 'r') as MF:
+        for line in MF:
+            item_list = line.split(maxsplit=key_num)
+
+            if len(item_list) != key_num + 1:
+                if item_list:
+                    logger.warning('Invalid line on manifest "' + str(manifest_file) + '", ignore: ' + str(line.strip()))
+
+                continue
+
+            current_dic = history_path_dic
+
+            for key in item_list[:key_num - 1]:
+                current_dic = current_dic.setdefault(key, {})
+
+            current_dic.setdefault(item_list[key_num - 1], item_list[key_num].rstrip('\n'))
+
+    return history_path_dic
+
+
+def write_manifest(manifest_file, record_list):
+    """
+    Write manifest file with (key_list, sample_path) record list.
+    """
+    tmp_file = str(manifest_file) + '.tmp'
+
+    with open(tmp_file, 'w') as MF:
+        for (key_list, sample_path) in record_list:
+            MF.write(gen_manifest_line(key_list, sample_path))
+
+    os.replace(tmp_file, manifest_file)
+
+
+def scan_palladium_hardware(hardware):
+    """
+    Scan palladium hardware db path (yaml files and sqlite samples), return manifest record list.
+    """
+    record_list = []
+
+    for (sample_hardware, emulator, year, month, day, day_time, sample_path) in common_db.get_palladium_history_sample_list(str(config.db_path), hardware_list=[hardware, ]):
+        record_list.append(([emulator, year, month, day, day_time], sample_path))
+
+    return record_list
+
+
+def scan_sample_path(hardware_path):
+    """
+    Scan sample files <hardware_path>/<year>/<month>/<day>/<time>, return manifest record list.
+    """
+    record_list = []
+
+    for dir_path, dir_name_list, file_name_list in os.walk(hardware_path):
+        dir_item_list = os.path.relpath(dir_path, hardware_path).split(os.sep)
+
+        if (len(dir_item_list) != 3) or (not dir_item_list[0].isdigit()):
+            continue
+
+        for file_name in sorted(file_name_list):
+            record_list.append((dir_item_list + [file_name, ], os.path.join(dir_path, file_name)))
+
+    record_list.sort(key=lambda x: x[0])
+
+    return record_list
+
+
+def scan_protium_hardware(hardware):
+    """
+    Scan protium hardware db path <db_path>/protium/<hardware>/<year>/<month>/<day>/<time>, return manifest record list.
+    """
+    return scan_sample_path(os.path.join(str(config.db_path), 'protium', str(hardware)))
+
+
+def scan_zebu_hardware(hardware):
+    """
+    Scan zebu snapshot path <db_path>/zebu/<hardware>/<year>/<month>/<day>/<time>, return manifest record list.
+    """
+    return scan_sample_path(os.path.join(str(config.db_path), 'zebu', str(hardware)))
+
+
+def repair_manifest(hardware_path, scan_func, hardware):
+    """
+    Regenerate manifest with a full scan of hardware db path, return record list.
+    """
+    logger.info('Scan "' + str(hardware_path) + '" to repair history manifest ...')
+    record_list = scan_func(hardware)
+
+    try:
+        write_manifest(get_manifest_file(hardware_path), record_list)
+    except Exception as error:
+        logger.warning('Failed on writing history manifest under "' + str(hardware_path) + '": ' + str(error))
+
+    return record_list
+
+
+def lock_manifest(hardware_path):
+    """
+    Exclusive lock between manifest appending and rewriting (manifest itself is replaced on rewriting, so lock a separate file).
+    """
+    return common.lock_file(os.path.join(hardware_path, '.' + MANIFEST_FILE + '.lock'), exclusive=True)
+
+
+def add_manifest_record(hardware_path, scan_func, hardware, key_list, sample_path):
+    """
+    Append new sample into manifest, repair the manifest (includes the new sample) if it is missing.
+    """
+    manifest_file = get_manifest_file(hardware_path)
+
+    if os.path.exists(manifest_file):
+        LF = lock_manifest(hardware_path)
+
+        try:
+            with open(manifest_file, 'a') as MF:
+                MF.write(gen_manifest_line(key_list, sample_path))
+        finally:
+            common.unlock_file(LF)
+    else:
+        repair_manifest(hardware_path, scan_func, hardware)
+
+
+def replace_manifest_sample_path(hardware_path, key_num, sample_path_dic):
+    """
+    Replace moved sample paths {<old sample path>: <new sample path>} on manifest, remove the line if new sample path is None.
+    """
+    manifest_file = get_manifest_file(hardware_path)
+
+    if not os.path.exists(manifest_file):
+        return
+
+    LF = lock_manifest(hardware_path)
+
+    try:
+        tmp_file = str(manifest_file) + '.tmp'
+
+        with open(manifest_file, 'r') as MF, open(tmp_file, 'w') as TF:
+            for line in MF:
+                item_list = line.split(maxsplit=key_num)
+
+                if (len(item_list) == key_num + 1) and (item_list[key_num].rstrip('\n') in sample_path_dic):
+                    new_sample_path = sample_path_dic[item_list[key_num].rstrip('\n')]
+
+                    if new_sample_path is None:
+                        continue
+
+                    line = gen_manifest_line(item_list[:key_num], new_sample_path)
+
+                TF.write(line)
+
+        os.replace(tmp_file, manifest_file)
+    finally:
+        common.unlock_file(LF)
+
+
+def load_history_path_dic(hardware_path, scan_func, hardware, key_num):
+    """
+    Load history path dict from manifest, fall back to a repair scan if the manifest is missing.
+    """
+    manifest_file = get_manifest_file(hardware_path)
+
+    if not os.path.exists(manifest_file):
+        repair_manifest(hardware_path, scan_func, hardware)
+
+    if os.path.exists(manifest_file):
+        return read_manifest(manifest_file, key_num)
+
+    # Manifest is not writable, use scan result directly.
+    history_path_dic = {}
+
+    for (key_list, sample_path) in scan_func(hardware):
+        current_dic = history_path_dic
+
+        for key in key_list[:-1]:
+            current_dic = current_dic.setdefault(key, {})
+
+        current_dic.setdefault(key_list[-1], sample_path)
+
+    return history_path_dic
+
+
+def add_palladium_manifest_record(hardware, emulator, year, month, day, day_time, sample_path):
+    """
+    Add palladium sample into <db_path>/<hardware>/manifest.
+    """
+    hardware_path = os.path.join(str(config.db_path), str(hardware))
+    add_manifest_record(hardware_path, scan_palladium_hardware, hardware, [emulator, year, month, day, day_time], sample_path)
+
+
+def replace_palladium_manifest_sample_path(hardware, sample_path_dic):
+    """
+    Replace moved palladium sample paths on <db_path>/<hardware>/manifest.
+    """
+    hardware_path = os.path.join(str(config.db_path), str(hardware))
+    replace_manifest_sample_path(hardware_path, 5, sample_path_dic)
+
+
+def add_protium_manifest_record(hardware, year, month, day, day_time, sample_path):
+    """
+    Add protium sample into <db_path>/protium/<hardware>/manifest.
+    """
+    hardware_path = os.path.join(str(config.db_path), 'protium', str(hardware))
+    add_manifest_record(hardware_path, scan_protium_hardware, hardware, [year, month, day, day_time], sample_path)
+
+
+def load_palladium_history_path_dic(hardware):
+    """
+    Load {<emulator>: {<year>: {<month>: {<day>: {<time>: <sample_path>}}}}} for palladium hardware.
+    """
+    hardware_path = os.path.join(str(config.db_path), str(hardware))
+
+    return load_history_path_dic(hardware_path, scan_palladium_hardware, hardware, 5)
+
+
+def load_protium_history_path_dic(hardware):
+    """
+    Load {<year>: {<month>: {<day>: {<time>: <sample_path>}}}} for protium hardware.
+    """
+    hardware_path = os.path.join(str(config.db_path), 'protium', str(hardware))
+
+    return load_history_path_dic(hardware_path, scan_protium_hardware, hardware, 4)
+
+
+def get_palladium_history_path_dic():
+    """
+    Get lazy palladium history path dict for all hardware under config.db_path.
+    """
+    hardware_list = []
+
+    if os.path.isdir(str(config.db_path)):
+        for hardware in sorted(os.listdir(str(config.db_path))):
+            if (hardware not in ['protium', 'zebu']) and (not re.match(r'^\.', hardware)) and os.path.isdir(os.path.join(str(config.db_path), hardware)):
+                hardware_list.append(hardware)
+
+    return LazyHistoryDic(hardware_list, load_palladium_history_path_dic)
+
+
+def replace_protium_manifest_sample_path(hardware, sample_path_dic):
+    """
+    Replace moved protium sample paths on <db_path>/protium/<hardware>/manifest.
+    """
+    hardware_path = os.path.join(str(config.db_path), 'protium', str(hardware))
+    replace_manifest_sample_path(hardware_path, 4, sample_path_dic)
+
+
+def get_protium_history_path_dic():
+    """
+    Get lazy protium history path dict for all hardware under <config.db_path>/protium.
+    """
+    db_path = os.path.join(str(config.db_path), 'protium')
+    hardware_list = []
+
+    if os.path.isdir(db_path):
+        for hardware in sorted(os.listdir(db_path)):
+            if (not re.match(r'^\.', hardware)) and os.path.isdir(os.path.join(db_path, hardware)):
+                hardware_list.append(hardware)
+
+    return LazyHistoryDic(hardware_list, load_protium_history_path_dic)
+
+
+def add_zebu_manifest_record(year, month, day, day_time, sample_path):
+    """
+    Add zebu snapshot into <db_path>/zebu/sample/manifest.
+    """
+    hardware_path = os.path.join(str(config.db_path), 'zebu', ZEBU_SAMPLE_HARDWARE)
+    add_manifest_record(hardware_path, scan_zebu_hardware, ZEBU_SAMPLE_HARDWARE, [year, month, day, day_time], sample_path)
+
+
+def load_zebu_history_path_dic():
+    """
+    Load {<year>: {<month>: {<day>: {<time>: <sample_path>}}}} for zebu snapshots.
+    """
+    hardware_path = os.path.join(str(config.db_path), 'zebu', ZEBU_SAMPLE_HARDWARE)
+
+    if not os.path.isdir(hardware_path):
+        return {}
+
+    return load_history_path_dic(hardware_path, scan_zebu_hardware, ZEBU_SAMPLE_HARDWARE, 4)
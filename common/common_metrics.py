@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import time
+import socket
+import functools
+import contextlib
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common
+from config import config
+
+logger = common.get_logger()
+
+# Prometheus metric name prefix.
+METRICS_PREFIX = 'emu_monitor_sample'
+
+# Rolling sample metrics log, one json line per sample.
+METRICS_LOG_MAX_SIZE = 10485760
+METRICS_LOG_BACKUP_NUM = 3
+
+
+def get_metrics_log_file():
+    """
+    Get sample metrics log file, <db_path>/.metrics/sample.jsonl by default.
+    """
+    return getattr(config, 'metrics_log_file', '') or os.path.join(str(config.db_path), '.metrics', 'sample.jsonl')
+
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class SampleMetrics:
+    """
+    Timing spans and sizes of one sample, written as node_exporter textfile collector file and rolling json log.
+    """
+    def __init__(self, sampler, hardware):
+        self.sampler = sampler
+        self.hardware = hardware
+        self.start_time = time.time()
+        self.start_counter = time.perf_counter()
+        self.phase_dic = {}
+        self.size_dic = {}
+        self.success = False
+
+    @contextlib.contextmanager
+    def span(self, phase):
+        """
+        Time the with block as phase (accumulated if the phase is timed more than once).
+        """
+        start_counter = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.phase_dic[phase] = self.phase_dic.get(phase, 0) + time.perf_counter() - start_counter
+
+    def add_size(self, name, value):
+        self.size_dic[name] = self.size_dic.get(name, 0) + value
+
+    def iter_lines(self, phase, line_iter):
+        """
+        Yield lines of line_iter (command output), record the time waiting for output (phase), the time to the first line
+        (<phase>_first_line, ssh connection + command startup), and line/byte number read.
+        """
+        wait_time = 0
+        line_num = 0
+        byte_num = 0
+        line_iter = iter(line_iter)
+
+        while True:
+            start_counter = time.perf_counter()
+
+            try:
+                line = next(line_iter)
+            except StopIteration:
+                break
+            finally:
+                wait_time += time.perf_counter() - start_counter
+
+                if line_num == 0:
+                    self.phase_dic[str(phase) + '_first_line'] = wait_time
+
+            line_num += 1
+            byte_num += len(line) + 1
+            self.phase_dic[phase] = wait_time
+
+            yield line
+
+        self.phase_dic[phase] = wait_time
+        self.add_size('lines_read', line_num)
+        self.add_size('bytes_read', byte_num)
+
+    def get_duration(self):
+        return time.perf_counter() - self.start_counter
+
+    def gen_textfile_lines(self):
+        """
+        Generate Prometheus text format lines.
+        """
+        label = 'sampler="' + escape_label_value(self.sampler) + '",hardware="' + escape_label_value(self.hardware) + '"'
+        line_list = ['# HELP ' + METRICS_PREFIX + '_success Whether the last sample succeeded.',
+                     '# TYPE ' + METRICS_PREFIX + '_success gauge',
+                     METRICS_PREFIX + '_success{' + label + '} ' + str(int(self.success)),
+                     '# HELP ' + METRICS_PREFIX + '_timestamp_seconds Start time of the last sample.',
+                     '# TYPE ' + METRICS_PREFIX + '_timestamp_seconds gauge',
+                     METRICS_PREFIX + '_timestamp_seconds{' + label + '} ' + repr(round(self.start_time, 3)),
+                     '# HELP ' + METRICS_PREFIX + '_duration_seconds Duration of the last sample.',
+                     '# TYPE ' + METRICS_PREFIX + '_duration_seconds gauge',
+                     METRICS_PREFIX + '_duration_seconds{' + label + '} ' + repr(round(self.get_duration(), 6)),
+                     '# HELP ' + METRICS_PREFIX + '_phase_seconds Duration of every phase of the last sample.',
+                     '# TYPE ' + METRICS_PREFIX + '_phase_seconds gauge']
+
+        for (phase, seconds) in self.phase_dic.items():
+            line_list.append(METRICS_PREFIX + '_phase_seconds{' + label + ',phase="' + escape_label_value(phase) + '"} ' + repr(round(seconds, 6)))
+
+        line_list.extend(['# HELP ' + METRICS_PREFIX + '_size Sizes of the last sample (lines/bytes read, domains/boards, bytes written).',
+                          '# TYPE ' + METRICS_PREFIX + '_size gauge'])
+
+        for (name, value) in self.size_dic.items():
+            line_list.append(METRICS_PREFIX + '_size{' + label + ',item="' + escape_label_value(name) + '"} ' + str(value))
+
+        return [line + '\n' for line in line_list]
+
+    def gen_log_dic(self):
+        return {'time': round(self.start_time, 3),
+                'host': socket.gethostname(),
+                'sampler': self.sampler,
+                'hardware': self.hardware,
+                'success': self.success,
+                'duration': round(self.get_duration(), 6),
+                'phase': {phase: round(seconds, 6) for (phase, seconds) in self.phase_dic.items()},
+                'size': self.size_dic}
+
+    def write_textfile(self):
+        """
+        Write <metrics_textfile_dir>/emu_monitor_sample_<sampler>_<hardware>.prom for node_exporter textfile collector.
+        """
+        textfile_dir = getattr(config, 'metrics_textfile_dir', '')
+
+        if not textfile_dir:
+            return
+
+        textfile = os.path.join(str(textfile_dir), METRICS_PREFIX + '_' + str(self.sampler) + '_' + str(self.hardware) + '.prom')
+        tmp_file = textfile + '.' + str(os.getpid()) + '.tmp'
+
+        with open(tmp_file, 'w') as TF:
+            TF.write(''.join(self.gen_textfile_lines()))
+
+        os.replace(tmp_file, textfile)
+
+    def write_log(self):
+        """
+        Append one json line into metrics log, rotate it to <log>.1 ... when it is bigger than metrics_log_max_size.
+        """
+        log_file = get_metrics_log_file()
+        max_size = int(getattr(config, 'metrics_log_max_size', METRICS_LOG_MAX_SIZE))
+
+        if not max_size:
+            return
+
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        LF = common.lock_file(log_file + '.lock', exclusive=True)
+
+        try:
+            if os.path.exists(log_file) and (os.path.getsize(log_file) > max_size):
+                for index in range(METRICS_LOG_BACKUP_NUM - 1, 0, -1):
+                    if os.path.exists(log_file + '.' + str(index)):
+                        os.replace(log_file + '.' + str(index), log_file + '.' + str(index + 1))
+
+                os.replace(log_file, log_file + '.1')
+
+            with open(log_file, 'a') as MF:
+                MF.write(json.dumps(self.gen_log_dic(), separators=(',', ':')) + '\n')
+        finally:
+            common.unlock_file(LF)
+
+    def write(self):
+        """
+        Write metrics, never fail the sample on metrics error.
+        """
+        for write_func in (self.write_textfile, self.write_log):
+            try:
+                write_func()
+            except Exception as error:
+                logger.warning('Failed on writing sample metrics: ' + str(error))
+
+
+def instrument(sampler):
+    """
+    Decorator for sampler.sampling(), create self.metrics for the sample, and write it when the sample finishes or fails.
+    The sample is successful if sampling() returns without exception and sets self.metrics.success.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            self.metrics = SampleMetrics(sampler, self.hardware)
+
+            try:
+                return func(self, *args, **kwargs)
+            except BaseException:
+                self.metrics.success = False
+                raise
+            finally:
+                self.metrics.write()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,180 @@
+import os
+import re
+import sys
+import gzip
+import lzma
+import json
+import struct
+import datetime
+import functools
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common
+from config import config
+
+logger = common.get_logger()
+
+# Packed day archive <db_path>/<hardware>/<emulator>/<year>/<month>/<day>.pack, replaces day directory <day>/<time>.
+# Archive = compressed sample members + json index {"compression": ..., "sample": {<time>: [offset, length]}} + footer.
+# Every sample file is compressed on its own, so one sample is read without decompressing the others.
+PALLADIUM_PACK_SUFFIX = '.pack'
+PACK_FOOTER_MAGIC = b'EMUPACK1'
+PACK_FOOTER_FORMAT = '>8sQ'
+PACK_FOOTER_SIZE = struct.calcsize(PACK_FOOTER_FORMAT)
+
+PACK_COMPRESS_DIC = {'gzip': gzip.compress,
+                     'lzma': lzma.compress}
+PACK_DECOMPRESS_DIC = {'gzip': gzip.decompress,
+                       'lzma': lzma.decompress}
+
+
+def gen_palladium_pack_sample_path(pack_file, day_time):
+    """
+    Generate sample path for a sample saved in pack file, format "<pack_file>#<time>".
+    """
+    return str(pack_file) + '#' + str(day_time)
+
+
+def parse_palladium_pack_sample_path(sample_path):
+    """
+    Split pack sample path into (pack_file, time), return None for other sample path.
+    """
+    if my_match := re.match(r'^(.+' + re.escape(PALLADIUM_PACK_SUFFIX) + r')#(\d+)$', str(sample_path)):
+        return my_match.group(1), my_match.group(2)
+
+    return None
+
+
+@functools.lru_cache(maxsize=16)
+def load_pack_index(pack_file, mtime_ns, size):
+    """
+    Read index of pack file, cached while the pack file is not changed.
+    """
+    with open(pack_file, 'rb') as PF:
+        PF.seek(-PACK_FOOTER_SIZE, os.SEEK_END)
+        footer_end = PF.tell()
+        (magic, index_offset) = struct.unpack(PACK_FOOTER_FORMAT, PF.read(PACK_FOOTER_SIZE))
+
+        if magic != PACK_FOOTER_MAGIC:
+            raise ValueError('Invalid pack file "' + str(pack_file) + '".')
+
+        PF.seek(index_offset)
+        index_dic = json.loads(PF.read(footer_end - index_offset).decode('utf-8'))
+
+    return index_dic
+
+
+def get_pack_index(pack_file):
+    pack_stat = os.stat(pack_file)
+
+    return load_pack_index(pack_file, pack_stat.st_mtime_ns, pack_stat.st_size)
+
+
+def get_palladium_pack_time_list(pack_file):
+    """
+    Get sample time list on pack file.
+    """
+    try:
+        return sorted(get_pack_index(pack_file)['sample'].keys())
+    except Exception as error:
+        logger.warning('Failed on reading pack file "' + str(pack_file) + '": ' + str(error))
+        return []
+
+
+def read_palladium_pack_sample(pack_file, day_time):
+    """
+    Read the original sample file content of specified time from pack file, return None if it is not on pack file.
+    """
+    index_dic = get_pack_index(pack_file)
+
+    if day_time not in index_dic['sample']:
+        return None
+
+    (offset, length) = index_dic['sample'][day_time]
+
+    with open(pack_file, 'rb') as PF:
+        PF.seek(offset)
+        content = PF.read(length)
+
+    return PACK_DECOMPRESS_DIC[index_dic['compression']](content)
+
+
+def write_palladium_pack(pack_file, sample_file_dic, compression='gzip'):
+    """
+    Pack sample files {<time>: <sample_file>} into pack_file.
+    """
+    index_dic = {'compression': compression, 'sample': {}}
+    tmp_file = str(pack_file) + '.tmp'
+
+    with open(tmp_file, 'wb') as PF:
+        for (day_time, sample_file) in sorted(sample_file_dic.items()):
+            with open(sample_file, 'rb') as SF:
+                content = PACK_COMPRESS_DIC[compression](SF.read())
+
+            index_dic['sample'][day_time] = [PF.tell(), len(content)]
+            PF.write(content)
+
+        index_offset = PF.tell()
+        PF.write(json.dumps(index_dic, separators=(',', ':')).encode('utf-8'))
+        PF.write(struct.pack(PACK_FOOTER_FORMAT, PACK_FOOTER_MAGIC, index_offset))
+
+    os.replace(tmp_file, pack_file)
+
+
+def pack_palladium_day(day_path, compression='gzip'):
+    """
+    Pack sample files under day directory <day>/<time> into <day>.pack and verify it, the sample files are kept.
+    Return {<sample_file>: <pack sample path>}.
+    """
+    pack_file = str(day_path) + PALLADIUM_PACK_SUFFIX
+    sample_file_dic = {}
+
+    for file_name in os.listdir(day_path):
+        if re.match(r'^\d+$', file_name) and os.path.isfile(os.path.join(day_path, file_name)):
+            sample_file_dic[file_name] = os.path.join(day_path, file_name)
+
+    if not sample_file_dic:
+        return {}
+
+    if os.path.exists(pack_file):
+        logger.warning('Pack file "' + str(pack_file) + '" exists, skip "' + str(day_path) + '".')
+        return {}
+
+    write_palladium_pack(pack_file, sample_file_dic, compression=compression)
+
+    for (day_time, sample_file) in sample_file_dic.items():
+        with open(sample_file, 'rb') as SF:
+            if read_palladium_pack_sample(pack_file, day_time) != SF.read():
+                logger.error('Failed on verifying pack file "' + str(pack_file) + '", keep "' + str(day_path) + '".')
+                os.remove(pack_file)
+                return {}
+
+    return {sample_file: gen_palladium_pack_sample_path(pack_file, day_time) for (day_time, sample_file) in sample_file_dic.items()}
+
+
+def remove_packed_day(day_path, sample_file_list):
+    """
+    Remove packed sample files, and the day directory if it is empty.
+    """
+    for sample_file in sample_file_list:
+        os.remove(sample_file)
+
+    if not os.listdir(day_path):
+        os.rmdir(day_path)
+
+
+def get_finished_palladium_day_list(hardware, db_path=None):
+    """
+    Get unpacked day directories <db_path>/<hardware>/<emulator>/<year>/<month>/<day> before today.
+    """
+    hardware_path = os.path.join(str(db_path or config.db_path), str(hardware))
+    today = datetime.date.today().strftime('%Y%m%d')
+    day_path_list = []
+
+    for dir_path, dir_name_list, file_name_list in os.walk(hardware_path):
+        dir_item_list = os.path.relpath(dir_path, hardware_path).split(os.sep)
+
+        if (len(dir_item_list) == 4) and all(item.isdigit() for item in dir_item_list[1:]) and (''.join(dir_item_list[1:]) < today):
+            day_path_list.append(dir_path)
+
+    return sorted(day_path_list)
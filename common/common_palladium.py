@@ -2,138 +2,393 @@ import os
 import re
 import sys
 import copy
-import socket
 import yaml
 
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
 from config import config
-from common import common
+from common import common, common_ssh
 
 
-def get_test_server_info(hardware, test_server, host):
-    test_server_info = []
+def gen_test_server_command(test_server, host):
+    """
+    Generate test_server command, run it through the ssh master connection if host is not current server.
+    """
+    if common_ssh.is_local_host(host):
+        command = '"' + str(test_server) + '"'
+    else:
+        command = common_ssh.get_ssh_pool().gen_command(host, test_server)
+
+    return command
 
-    # get current server ip and hostname
-    current_hostname = socket.gethostname()
-    current_ip = socket.gethostbyname(current_hostname)
 
+def iter_test_server_info(hardware, test_server, host):
+    """
+    Run test_server on host, yield its output lines while it is running.
+    Raise subprocess.TimeoutExpired/CalledProcessError if test_server times out or fails, the output is incomplete.
+    """
     if not test_server:
         common.print_warning('*Warning*: test_server path is not specified on config/config.py.')
-    else:
-        command = test_server
+        return
+
+    yield from common_ssh.stream_remote_command(host, test_server)
+
+
+def get_test_server_info(hardware, test_server, host):
+    return list(iter_test_server_info(hardware, test_server, host))
 
-        if host.strip() != str(current_ip).strip() and host.strip() != str(current_hostname).strip():
-            command = 'ssh ' + str(host) + ' "' + str(command) + '"'
+
+# test_server output line patterns, the parser dispatches on the leading character of the line.
+EMULATOR_COMPILE = re.compile(r'^\s*Emulator:\s*(.+?)\s* Hardware:\s*(.+?)\s* Configmgr:\s*(.+?)\s* Status:\s*(.+?)\s*$')
+RACK_CLUSTERS_COMPILE = re.compile(r'^\s*Rack\s*(\d+)\s*has\s*(\d+)\s*clusters\s*$')
+CLUSTER_DRAWERS_COMPILE = re.compile(r'^Cluster\s*(\d+)\s*has\s*(\d+)\s*logic drawers\s+CCD:\s*(.+?)\s*$')
+DRAWER_DOMAINS_COMPILE = re.compile(r'^\s*Logic drawer\s*(\d+)\s*has\s*(\d+)\s*domains\s+Logic drawer:\s*(.+?)\s*$')
+DOMAIN_COMPILE = re.compile(r'^\s*(\d+\.\d+)\s+(\S+)\s+(\S+)\s+(\S+\s+\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s*$')
+
+
+# DomainTable columns (one row per domain), and domain record keys of legacy palladium_dic.
+DOMAIN_TABLE_COLUMN_LIST = ['rack', 'cluster', 'logic_drawer', 'domain', 'owner', 'pid', 'tpod', 'design', 'elaptime', 'reservedkey']
+DOMAIN_RECORD_KEY_LIST = ['owner', 'pid', 'tpod', 'design', 'elaptime', 'reservedkey']
+
+
+def intern_value(value):
+    """
+    Intern string value, so the same owner/pid/design ... is stored once across rows and snapshots.
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+class DomainRow:
+    """
+    Read-only view on one DomainTable row, columns are attributes (row.rack, row.owner ...).
+    """
+    __slots__ = ('column_dic', 'index')
+
+    def __init__(self, column_dic, index):
+        self.column_dic = column_dic
+        self.index = index
+
+    def to_dict(self):
+        """
+        Get legacy domain record {'owner': ..., 'pid': ..., 'tpod': ..., 'design': ..., 'elaptime': ..., 'reservedkey': ...}.
+        """
+        return {key: self.column_dic[key][self.index] for key in DOMAIN_RECORD_KEY_LIST}
+
+
+for domain_table_column in DOMAIN_TABLE_COLUMN_LIST:
+    setattr(DomainRow, domain_table_column, property(lambda self, column=domain_table_column: self.column_dic[column][self.index]))
+
+
+class DomainTable:
+    """
+    Columnar palladium snapshot, one row per domain, every column is a list of interned strings.
+    info_dic keeps the non-domain palladium_dic items (emulator/hardware/emulator_status/utilization/domain_line_num/*_list),
+    and could be read with table[<key>] like palladium_dic.
+    Rack/cluster/logic drawer structure (include the ones without domain) is kept in rack_list/cluster_dic/logic_drawer_dic,
+    so DomainTable round-trips to and from legacy palladium_dic.
+    """
+    __slots__ = ('info_dic', 'rack_list', 'cluster_dic', 'logic_drawer_dic', 'column_dic')
+
+    def __init__(self, info_dic=None):
+        self.info_dic = info_dic if info_dic is not None else {}
+        self.rack_list = []
+        # {(rack, cluster): ccd_status}
+        self.cluster_dic = {}
+        # {(rack, cluster, logic_drawer): logic_drawer_status}
+        self.logic_drawer_dic = {}
+        self.column_dic = {column: [] for column in DOMAIN_TABLE_COLUMN_LIST}
+
+    def __len__(self):
+        return len(self.column_dic['domain'])
+
+    def __bool__(self):
+        # Same as palladium_dic, a snapshot is valid once emulator information is found.
+        return bool(self.info_dic)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield DomainRow(self.column_dic, index)
+
+    def __getitem__(self, key):
+        return self.info_dic[key]
+
+    def __contains__(self, key):
+        return key in self.info_dic
+
+    def get(self, key, default=None):
+        return self.info_dic.get(key, default)
+
+    def iter_columns(self, *column_list):
+        """
+        Iterate specified columns of all rows as tuples, the fastest way to walk the domains.
+        """
+        return zip(*[self.column_dic[column] for column in column_list])
+
+    def add_row(self, rack, cluster, logic_drawer, domain, record_dic):
+        for (column, value) in zip(DOMAIN_TABLE_COLUMN_LIST, (rack, cluster, logic_drawer, domain)):
+            self.column_dic[column].append(intern_value(value))
+
+        for key in DOMAIN_RECORD_KEY_LIST:
+            self.column_dic[key].append(intern_value(record_dic.get(key)))
+
+    def sort_tree(self):
+        """
+        Put clusters, logic drawers and rows into rack -> cluster -> logic_drawer order (the order of legacy palladium_dic),
+        in case test_server reports a rack/cluster again after another one.
+        """
+        rack_index_dic = {rack: index for (index, rack) in enumerate(self.rack_list)}
+        cluster_index_dic = {key: index for (index, key) in enumerate(self.cluster_dic)}
+        logic_drawer_index_dic = {key: index for (index, key) in enumerate(self.logic_drawer_dic)}
+
+        def cluster_sort_key(key):
+            return rack_index_dic[key[0]], cluster_index_dic[key[:2]]
+
+        def logic_drawer_sort_key(key):
+            return rack_index_dic[key[0]], cluster_index_dic[key[:2]], logic_drawer_index_dic[key]
+
+        if list(self.cluster_dic) != sorted(self.cluster_dic, key=cluster_sort_key):
+            self.cluster_dic = {key: self.cluster_dic[key] for key in sorted(self.cluster_dic, key=cluster_sort_key)}
+
+        if list(self.logic_drawer_dic) != sorted(self.logic_drawer_dic, key=logic_drawer_sort_key):
+            self.logic_drawer_dic = {key: self.logic_drawer_dic[key] for key in sorted(self.logic_drawer_dic, key=logic_drawer_sort_key)}
+
+        row_key_list = [logic_drawer_sort_key(key) for key in self.iter_columns('rack', 'cluster', 'logic_drawer')]
+
+        if row_key_list != sorted(row_key_list):
+            index_list = sorted(range(len(row_key_list)), key=lambda index: row_key_list[index])
+            self.column_dic = {column: [value_list[index] for index in index_list] for (column, value_list) in self.column_dic.items()}
+
+    def filter(self, **specified_dic):
+        """
+        Get a new DomainTable with the rows matching specified_dic = {<column>: <value list>}.
+        Empty value list or 'ALL' on value list means no filter on the column.
+        Filtered out racks/clusters/logic drawers are removed from structure too, *_list items are kept.
+        """
+        select_dic = {column: set(value_list) for (column, value_list) in specified_dic.items() if value_list and ('ALL' not in value_list)}
+        rack_set = select_dic.get('rack')
+        cluster_set = select_dic.get('cluster')
+        logic_drawer_set = select_dic.get('logic_drawer')
+
+        domain_table = DomainTable(copy.deepcopy(self.info_dic))
+        domain_table.rack_list = [rack for rack in self.rack_list if (rack_set is None) or (rack in rack_set)]
+        domain_table.cluster_dic = {key: value for (key, value) in self.cluster_dic.items() if ((rack_set is None) or (key[0] in rack_set)) and ((cluster_set is None) or (key[1] in cluster_set))}
+        domain_table.logic_drawer_dic = {key: value for (key, value) in self.logic_drawer_dic.items() if (key[:2] in domain_table.cluster_dic) and ((logic_drawer_set is None) or (key[2] in logic_drawer_set))}
+
+        index_list = range(len(self))
+
+        for (column, value_set) in select_dic.items():
+            value_list = self.column_dic[column]
+            index_list = [index for index in index_list if value_list[index] in value_set]
+
+        if select_dic:
+            domain_table.column_dic = {column: [value_list[index] for index in index_list] for (column, value_list) in self.column_dic.items()}
         else:
-            command = '"' + str(command) + '"'
+            domain_table.column_dic = {column: list(value_list) for (column, value_list) in self.column_dic.items()}
+
+        if domain_table.info_dic:
+            domain_table.info_dic['domain_line_num'] = len(domain_table)
+
+        return domain_table
+
+    @classmethod
+    def from_dict(cls, palladium_dic):
+        """
+        Build DomainTable from legacy palladium_dic.
+        """
+        if isinstance(palladium_dic, DomainTable):
+            return palladium_dic
 
-        (return_code, stdout, stderr) = common.run_command(command)
+        domain_table = cls({key: copy.deepcopy(value) for (key, value) in palladium_dic.items() if key != 'rack'})
 
-        for line in str(stdout, 'utf-8').split('\n'):
-            test_server_info.append(line.strip())
+        for (rack, rack_dic) in palladium_dic.get('rack', {}).items():
+            domain_table.rack_list.append(intern_value(rack))
 
-    return test_server_info
+            for (cluster, cluster_dic) in rack_dic['cluster'].items():
+                domain_table.cluster_dic[(intern_value(rack), intern_value(cluster))] = cluster_dic.get('ccd_status')
 
+                for (logic_drawer, logic_drawer_dic) in cluster_dic['logic_drawer'].items():
+                    domain_table.logic_drawer_dic[(intern_value(rack), intern_value(cluster), intern_value(logic_drawer))] = logic_drawer_dic.get('logic_drawer_status')
 
-def parse_test_server_info(test_server_info):
-    palladium_dic = {}
+                    for (domain, record_dic) in logic_drawer_dic['domain'].items():
+                        domain_table.add_row(rack, cluster, logic_drawer, domain, record_dic)
 
-    emulator_compile = re.compile(r'^\s*Emulator:\s*(.+?)\s* Hardware:\s*(.+?)\s* Configmgr:\s*(.+?)\s* Status:\s*(.+?)\s*$')
-    rack_clusters_compile = re.compile(r'^\s*Rack\s*(\d+)\s*has\s*(\d+)\s*clusters\s*$')
-    cluster_drawers_compile = re.compile(r'^Cluster\s*(\d+)\s*has\s*(\d+)\s*logic drawers\s+CCD:\s*(.+?)\s*$')
-    drawer_domains_compile = re.compile(r'^\s*Logic drawer\s*(\d+)\s*has\s*(\d+)\s*domains\s+Logic drawer:\s*(.+?)\s*$')
-    domain_compile = re.compile(r'^\s*(\d+\.\d+)\s+(\S+)\s+(\S+)\s+(\S+\s+\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s*$')
+        return domain_table
+
+    def to_dict(self):
+        """
+        Convert DomainTable into legacy palladium_dic.
+        """
+        if not self.info_dic:
+            return {}
+
+        palladium_dic = copy.deepcopy(self.info_dic)
+        rack_dic = {}
+
+        for rack in self.rack_list:
+            rack_dic[rack] = {'cluster': {}}
+
+        for ((rack, cluster), ccd_status) in self.cluster_dic.items():
+            rack_dic[rack]['cluster'][cluster] = {'ccd_status': ccd_status, 'logic_drawer': {}}
+
+        for ((rack, cluster, logic_drawer), logic_drawer_status) in self.logic_drawer_dic.items():
+            rack_dic[rack]['cluster'][cluster]['logic_drawer'][logic_drawer] = {'logic_drawer_status': logic_drawer_status, 'domain': {}}
+
+        for (rack, cluster, logic_drawer, domain, owner, pid, tpod, design, elaptime, reservedkey) in self.iter_columns(*DOMAIN_TABLE_COLUMN_LIST):
+            rack_dic[rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain] = {'owner': owner,
+                                                                                                  'pid': pid,
+                                                                                                  'tpod': tpod,
+                                                                                                  'design': design,
+                                                                                                  'elaptime': elaptime,
+                                                                                                  'reservedkey': reservedkey}
+
+        palladium_dic['rack'] = rack_dic
+
+        return palladium_dic
+
+
+def parse_domain_table(test_server_info, domain_callback=None):
+    """
+    Parse test_server output lines into DomainTable, test_server_info could be a list or a generator (iter_test_server_info).
+    domain_callback(domain_line_num) is called on every domain line, for progress report.
+    """
+    domain_table = DomainTable()
+    info_dic = domain_table.info_dic
+    unique_set_dic = {}
+    domain_key_set = set()
+    column_dic = domain_table.column_dic
 
     current_rack = 0
     current_cluster = 0
     current_logic_drawer = 0
 
-    owner_list = []
+    # Owners of all domain lines, for utilization.
+    owner_num = 0
+    none_owner_num = 0
 
     for line in test_server_info:
-        if emulator_compile.match(line):
-            my_match = emulator_compile.match(line)
-            emulator = my_match.group(1)
-            hardware = my_match.group(2)
-            emulator_status = my_match.group(4)
-            palladium_dic = {'emulator': emulator,
-                             'hardware': hardware,
-                             'emulator_status': emulator_status,
-                             'utilization': 0,
-                             'domain_line_num': 0,
-                             'rack_list': [],
-                             'cluster_list': [],
-                             'logic_drawer_list': [],
-                             'domain_list': [],
-                             'owner_list': [],
-                             'pid_list': [],
-                             'tpod_list': [],
-                             'design_list': [],
-                             'rack': {}}
-        elif rack_clusters_compile.match(line):
-            my_match = rack_clusters_compile.match(line)
-            rack = my_match.group(1)
+        leading_char = line.lstrip()[:1]
+
+        if not leading_char:
+            continue
+        elif leading_char.isdigit():
+            my_match = DOMAIN_COMPILE.match(line)
+
+            if not my_match:
+                continue
+
+            (domain, owner, pid, tpod, design, elaptime, reservedkey) = my_match.groups()
+            owner_num += 1
+
+            if owner == 'NONE':
+                none_owner_num += 1
+
+            info_dic['domain_line_num'] += 1
+
+            if domain_callback:
+                domain_callback(info_dic['domain_line_num'])
+
+            domain_key = (current_rack, current_cluster, current_logic_drawer)
+
+            if domain_key not in domain_table.logic_drawer_dic:
+                raise KeyError(current_logic_drawer)
+
+            # The first record wins on duplicated domain.
+            if domain_key + (domain, ) not in domain_key_set:
+                domain_key_set.add(domain_key + (domain, ))
+
+                for (column, value) in zip(DOMAIN_TABLE_COLUMN_LIST, (current_rack, current_cluster, current_logic_drawer, domain, owner, pid, tpod, design, elaptime, reservedkey)):
+                    column_dic[column].append(sys.intern(value))
+
+            # Keep list order, check uniqueness with set.
+            for (key, value) in (('domain_list', domain), ('owner_list', owner), ('pid_list', pid), ('tpod_list', tpod), ('design_list', design)):
+                if value not in unique_set_dic[key]:
+                    unique_set_dic[key].add(value)
+                    info_dic[key].append(value)
+        elif leading_char == 'E':
+            my_match = EMULATOR_COMPILE.match(line)
+
+            if not my_match:
+                continue
+
+            # A new emulator restarts the snapshot.
+            domain_table = DomainTable({'emulator': my_match.group(1),
+                                        'hardware': my_match.group(2),
+                                        'emulator_status': my_match.group(4),
+                                        'utilization': 0,
+                                        'domain_line_num': 0,
+                                        'rack_list': [],
+                                        'cluster_list': [],
+                                        'logic_drawer_list': [],
+                                        'domain_list': [],
+                                        'owner_list': [],
+                                        'pid_list': [],
+                                        'tpod_list': [],
+                                        'design_list': []})
+            info_dic = domain_table.info_dic
+            column_dic = domain_table.column_dic
+            unique_set_dic = {key: set() for key in info_dic if key.endswith('_list')}
+            domain_key_set = set()
+        elif leading_char == 'R':
+            my_match = RACK_CLUSTERS_COMPILE.match(line)
+
+            if not my_match:
+                continue
+
+            rack = sys.intern(my_match.group(1))
             current_rack = rack
-            palladium_dic['rack'].setdefault(rack, {'cluster': {}})
 
-            if rack not in palladium_dic['rack_list']:
-                palladium_dic['rack_list'].append(rack)
-        elif cluster_drawers_compile.match(line):
-            my_match = cluster_drawers_compile.match(line)
-            cluster = my_match.group(1)
+            if rack not in unique_set_dic['rack_list']:
+                unique_set_dic['rack_list'].add(rack)
+                info_dic['rack_list'].append(rack)
+                domain_table.rack_list.append(rack)
+        elif leading_char == 'C':
+            my_match = CLUSTER_DRAWERS_COMPILE.match(line)
+
+            if not my_match:
+                continue
+
+            cluster = sys.intern(my_match.group(1))
             current_cluster = cluster
-            ccd_status = my_match.group(3)
-            palladium_dic['rack'][current_rack]['cluster'].setdefault(cluster, {'ccd_status': ccd_status, 'logic_drawer': {}})
-
-            if cluster not in palladium_dic['cluster_list']:
-                palladium_dic['cluster_list'].append(cluster)
-        elif drawer_domains_compile.match(line):
-            my_match = drawer_domains_compile.match(line)
-            logic_drawer = my_match.group(1)
+
+            if current_rack not in unique_set_dic['rack_list']:
+                raise KeyError(current_rack)
+
+            domain_table.cluster_dic.setdefault((current_rack, cluster), my_match.group(3))
+
+            if cluster not in unique_set_dic['cluster_list']:
+                unique_set_dic['cluster_list'].add(cluster)
+                info_dic['cluster_list'].append(cluster)
+        elif leading_char == 'L':
+            my_match = DRAWER_DOMAINS_COMPILE.match(line)
+
+            if not my_match:
+                continue
+
+            logic_drawer = sys.intern(my_match.group(1))
             current_logic_drawer = logic_drawer
-            logic_drawer_status = my_match.group(3)
-            palladium_dic['rack'][current_rack]['cluster'][current_cluster]['logic_drawer'].setdefault(logic_drawer, {'logic_drawer_status': logic_drawer_status, 'domain': {}})
-
-            if logic_drawer not in palladium_dic['logic_drawer_list']:
-                palladium_dic['logic_drawer_list'].append(logic_drawer)
-        elif domain_compile.match(line):
-            my_match = domain_compile.match(line)
-            domain = my_match.group(1)
-            owner = my_match.group(2)
-            owner_list.append(owner)
-            pid = my_match.group(3)
-            tpod = my_match.group(4)
-            design = my_match.group(5)
-            elaptime = my_match.group(6)
-            reservedkey = my_match.group(7)
-            palladium_dic['domain_line_num'] += 1
-            palladium_dic['rack'][current_rack]['cluster'][current_cluster]['logic_drawer'][current_logic_drawer]['domain'].setdefault(domain, {'owner': owner,
-                                                                                                                                                'pid': pid,
-                                                                                                                                                'tpod': tpod,
-                                                                                                                                                'design': design,
-                                                                                                                                                'elaptime': elaptime,
-                                                                                                                                                'reservedkey': reservedkey})
-
-            if domain not in palladium_dic['domain_list']:
-                palladium_dic['domain_list'].append(domain)
-
-            if owner not in palladium_dic['owner_list']:
-                palladium_dic['owner_list'].append(owner)
-
-            if pid not in palladium_dic['pid_list']:
-                palladium_dic['pid_list'].append(pid)
-
-            if tpod not in palladium_dic['tpod_list']:
-                palladium_dic['tpod_list'].append(tpod)
-
-            if design not in palladium_dic['design_list']:
-                palladium_dic['design_list'].append(design)
-
-    if owner_list:
-        utilization = round(1-owner_list.count('NONE')/len(owner_list), 2)
-        palladium_dic['utilization'] = utilization
-
-    return palladium_dic
+
+            if (current_rack, current_cluster) not in domain_table.cluster_dic:
+                raise KeyError(current_cluster)
+
+            domain_table.logic_drawer_dic.setdefault((current_rack, current_cluster, logic_drawer), my_match.group(3))
+
+            if logic_drawer not in unique_set_dic['logic_drawer_list']:
+                unique_set_dic['logic_drawer_list'].add(logic_drawer)
+                info_dic['logic_drawer_list'].append(logic_drawer)
+
+    if owner_num:
+        utilization = round(1-none_owner_num/owner_num, 2)
+        info_dic['utilization'] = utilization
+
+    domain_table.sort_tree()
+
+    return domain_table
+
+
+def parse_test_server_info(test_server_info, domain_callback=None):
+    """
+    Parse test_server output lines into legacy palladium_dic, see parse_domain_table.
+    """
+    return parse_domain_table(test_server_info, domain_callback=domain_callback).to_dict()
 
 
 def filter_palladium_dic(
@@ -147,67 +402,20 @@ def filter_palladium_dic(
         specified_tpod='',
         specified_design=''
 ):
-    filtered_palladium_dic = copy.deepcopy(palladium_dic)
-
-    if palladium_dic:
-        for rack in palladium_dic['rack'].keys():
-            # Filter rack
-            if specified_rack and (specified_rack != 'ALL') and (specified_rack != rack):
-                del filtered_palladium_dic['rack'][rack]
-            else:
-                for cluster in palladium_dic['rack'][rack]['cluster'].keys():
-                    # Filter cluster
-                    if specified_cluster and (specified_cluster != 'ALL') and (specified_cluster != cluster):
-                        del filtered_palladium_dic['rack'][rack]['cluster'][cluster]
-                    else:
-                        for logic_drawer in palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'].keys():
-                            # Filter logic_drawer
-                            if specified_logic_drawer and (specified_logic_drawer != 'ALL') and (specified_logic_drawer != logic_drawer):
-                                del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]
-                            else:
-                                for domain in palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'].keys():
-                                    # Filter domain
-                                    if specified_domain and (specified_domain != 'ALL') and (specified_domain != domain):
-                                        del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                    else:
-                                        # Filter owner
-                                        owner = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['owner']
-
-                                        if specified_owner and (specified_owner != 'ALL') and (specified_owner != owner):
-                                            del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                            continue
-
-                                        # Filter pid
-                                        pid = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['pid']
-
-                                        if specified_pid and (specified_pid != 'ALL') and (specified_pid != pid):
-                                            del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                            continue
-
-                                        # Filter tpod
-                                        tpod = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['tpod']
-
-                                        if specified_tpod and (specified_tpod != 'ALL') and (specified_tpod != tpod):
-                                            del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                            continue
-
-                                        # Filter design
-                                        design = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['design']
-
-                                        if specified_design and (specified_design != 'ALL') and (specified_design != design):
-                                            del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                            continue
-
-        # Update domain_line_num.
-        filtered_palladium_dic['domain_line_num'] = 0
-
-        for rack in filtered_palladium_dic['rack'].keys():
-            for cluster in filtered_palladium_dic['rack'][rack]['cluster'].keys():
-                for logic_drawer in filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'].keys():
-                    for domain in filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'].keys():
-                        filtered_palladium_dic['domain_line_num'] += 1
-
-    return filtered_palladium_dic
+    """
+    Filter palladium_dic (legacy dict or DomainTable) with specified values, return the same type.
+    """
+    return multifilter_palladium_dic(
+        palladium_dic,
+        specified_rack_list=[specified_rack, ] if specified_rack else [],
+        specified_cluster_list=[specified_cluster, ] if specified_cluster else [],
+        specified_logic_drawer_list=[specified_logic_drawer, ] if specified_logic_drawer else [],
+        specified_domain_list=[specified_domain, ] if specified_domain else [],
+        specified_owner_list=[specified_owner, ] if specified_owner else [],
+        specified_pid_list=[specified_pid, ] if specified_pid else [],
+        specified_tpod_list=[specified_tpod, ] if specified_tpod else [],
+        specified_design_list=[specified_design, ] if specified_design else [],
+    )
 
 
 def multifilter_palladium_dic(
@@ -221,67 +429,24 @@ def multifilter_palladium_dic(
         specified_tpod_list=[],
         specified_design_list=[]
 ):
-    filtered_palladium_dic = copy.deepcopy(palladium_dic)
-
-    if palladium_dic:
-        for rack in palladium_dic['rack'].keys():
-            # Filter rack
-            if specified_rack_list and ('ALL' not in specified_rack_list) and (rack not in specified_rack_list):
-                del filtered_palladium_dic['rack'][rack]
-            else:
-                for cluster in palladium_dic['rack'][rack]['cluster'].keys():
-                    # Filter cluster
-                    if specified_cluster_list and ('ALL' not in specified_cluster_list) and (cluster not in specified_cluster_list):
-                        del filtered_palladium_dic['rack'][rack]['cluster'][cluster]
-                    else:
-                        for logic_drawer in palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'].keys():
-                            # Filter logic_drawer
-                            if specified_logic_drawer_list and ('ALL' not in specified_logic_drawer_list) and (logic_drawer not in specified_logic_drawer_list):
-                                del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]
-                            else:
-                                for domain in palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'].keys():
-                                    # Filter domain
-                                    if specified_domain_list and ('ALL' not in specified_domain_list) and (domain not in specified_domain_list):
-                                        del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                    else:
-                                        # Filter owner
-                                        owner = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['owner']
-
-                                        if specified_owner_list and ('ALL' not in specified_owner_list) and (owner not in specified_owner_list):
-                                            del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                            continue
-
-                                        # Filter pid
-                                        pid = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['pid']
-
-                                        if specified_pid_list and ('ALL' not in specified_pid_list) and (pid not in specified_pid_list):
-                                            del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                            continue
-
-                                        # Filter tpod
-                                        tpod = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['tpod']
-
-                                        if specified_tpod_list and ('ALL' not in specified_tpod_list) and (tpod not in specified_tpod_list):
-                                            del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                            continue
-
-                                        # Filter design
-                                        design = palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]['design']
-
-                                        if specified_design_list and ('ALL' not in specified_design_list) and (design not in specified_design_list):
-                                            del filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'][domain]
-                                            continue
-
-        # Update domain_line_num.
-        filtered_palladium_dic['domain_line_num'] = 0
-
-        for rack in filtered_palladium_dic['rack'].keys():
-            for cluster in filtered_palladium_dic['rack'][rack]['cluster'].keys():
-                for logic_drawer in filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'].keys():
-                    for domain in filtered_palladium_dic['rack'][rack]['cluster'][cluster]['logic_drawer'][logic_drawer]['domain'].keys():
-                        filtered_palladium_dic['domain_line_num'] += 1
-
-    return filtered_palladium_dic
+    """
+    Filter palladium_dic (legacy dict or DomainTable) with specified value lists, return the same type.
+    """
+    filtered_domain_table = DomainTable.from_dict(palladium_dic).filter(
+        rack=specified_rack_list,
+        cluster=specified_cluster_list,
+        logic_drawer=specified_logic_drawer_list,
+        domain=specified_domain_list,
+        owner=specified_owner_list,
+        pid=specified_pid_list,
+        tpod=specified_tpod_list,
+        design=specified_design_list,
+    )
+
+    if isinstance(palladium_dic, DomainTable):
+        return filtered_domain_table
+
+    return filtered_domain_table.to_dict()
 
 
 def get_palladium_host_info():
@@ -324,6 +489,8 @@ def get_palladium_host_info():
                         hardware_dic[hardware]['test_server_host'] = my_match.group(1).replace('"', '')
                     elif my_match := re.match(r'project_primary_factors\s*=\s*\"(.*)\"\s*', line):
                         hardware_dic[hardware]['project_primary_factors'] = my_match.group(1)
+                    elif my_match := re.match(r'sample_interval\s*=\s*(\d+)\s*', line):
+                        hardware_dic[hardware]['sample_interval'] = int(my_match.group(1))
 
         hardware_domain_file = os.path.join(config.db_path, '%s/domain_list.yaml' % str(hardware))
 
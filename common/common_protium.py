@@ -1,40 +1,174 @@
 import os
 import re
 import sys
-import copy
 import yaml
+import subprocess
+import concurrent.futures
 
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
-from common import common
+from common import common, common_ssh
 from config import config
 
+# Board and FPGA lines of ptmRun check info output, matched on the whole (multi-line) output.
+# [^\S\n] is a blank inside one line, so a match never crosses lines.
+# Board line : <system> <chassis> <board_uuid> <board_ip> (<...>) (<board_id>) ...
+# FPGA line  : FPGA <fpga_id> |                                   (free)
+#              FPGA <fpga_id> | <user>:<host>:<pid> @ <started_time>  (used)
+PROTIUM_SYS_INFO_COMPILE = re.compile(rb'^[^\S\n]*(?:'
+                                      rb'FPGA[^\S\n]+(\S+)[^\S\n]+\|(?:[^\S\n]+(\S+):(\S+):(\S+)[^\S\n]+@[^\S\n]+(\S+))?[^\S\n]*'
+                                      rb'|\S+[^\S\n]+\S+[^\S\n]+(\d+)[^\S\n]+([\d+\.]+)[^\S\n]+\(\S+\)[^\S\n]+\((\d+)\)[^\n]*'
+                                      rb')$', re.MULTILINE)
 
-def get_protium_sys_info(path=None, command=None):
+# Max concurrent ptmRun shards, and timeout (seconds) of every shard, see protium_shard_jobs/protium_shard_timeout on config.py.
+PROTIUM_SHARD_JOBS = 8
+PROTIUM_SHARD_TIMEOUT = 600
+
+
+def gen_protium_sys_info_command(path, command):
+    """
+    Generate protium sys information command, run it under path.
+    """
+    return 'cd %s && %s' % (str(path), str(command))
+
+
+def get_protium_sys_info_output(path=None, command=None):
     """
-    Get protium sys information.
+    Get protium sys information as raw stdout bytes, parse_protium_sys_info parses it without splitting lines.
     """
     logger = common.get_logger()
-    protium_sys_info_list = []
+
     if not path:
         path = os.path.expanduser('~')
 
-    command = 'cd %s && %s' % (str(path), str(command))
-
     if not command:
         logger.error("Could not find protium sys command, please check config.py!")
         sys.exit(1)
 
+    command = gen_protium_sys_info_command(path, command)
+
     (return_code, stdout, stderr) = common.run_command(command)
 
-    for line in str(stdout, 'utf-8').split('\n'):
-        protium_sys_info_list.append(line.strip())
+    return stdout
+
+
+def gen_check_info_command(hardware_info_dic, ip_list_file):
+    """
+    Generate ptmRun check info command for the protium systems on ip_list_file.
+    """
+    ssh_command = ''
+
+    check_info_command = '%s export PTM_SYSTEM_IP_LIST=%s;%s %s -init %s' % (
+        ssh_command,
+        ip_list_file,
+        hardware_info_dic['ptmRun_bsub_command'],
+        hardware_info_dic['ptmRun'],
+        config.ptmRun_check_info_file
+    )
+
+    return check_info_command
+
+
+def get_protium_shard_size(hardware_info_dic):
+    """
+    Get system number per ptmRun shard, hardware ptmRun_shard_size overrides config.protium_shard_size, 0 means no shard.
+    """
+    return int(hardware_info_dic.get('ptmRun_shard_size', getattr(config, 'protium_shard_size', 0)) or 0)
+
+
+def read_protium_ip_list(ip_list_file):
+    """
+    Read protium system ip list file, return valid lines (one system per line, "#" for comment).
+    """
+    ip_line_list = []
+
+    with open(ip_list_file, 'r') as IF:
+        for line in IF:
+            if line.strip() and (not line.strip().startswith('#')):
+                ip_line_list.append(line.strip())
+
+    return ip_line_list
+
+
+def run_protium_shard(hardware_info_dic, shard_path, ip_line_list, timeout):
+    """
+    Run ptmRun check info for one shard of protium systems under shard_path, return raw stdout bytes (b'' on failure).
+    """
+    logger = common.get_logger()
+
+    if not os.path.exists(shard_path):
+        os.makedirs(shard_path)
+
+    ip_list_file = os.path.join(shard_path, 'PTM_SYS_IP_LIST')
 
-    return protium_sys_info_list
+    with open(ip_list_file, 'w') as IF:
+        IF.write('\n'.join(ip_line_list) + '\n')
+
+    command = gen_protium_sys_info_command(shard_path, gen_check_info_command(hardware_info_dic, ip_list_file))
+    SP = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+
+    try:
+        (stdout, stderr) = SP.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # Kill the whole process group, include ptmRun started by the shell (or bsub).
+        common_ssh.kill_process_group(SP)
+        SP.communicate()
+        logger.error('ptmRun shard timeout after ' + str(timeout) + 's, skip systems: ' + ' '.join(ip_line_list))
+        return b''
+
+    if SP.returncode:
+        logger.warning('ptmRun shard exit with code ' + str(SP.returncode) + ' for systems: ' + ' '.join(ip_line_list))
+
+    return stdout
+
+
+def get_protium_sys_info_by_shard(hardware_info_dic, path, shard_size, jobs=None, timeout=None):
+    """
+    Split PTM_SYS_IP_LIST into shards of shard_size systems, run ptmRun for the shards concurrently under <path>/shard.<index>,
+    and merge the stdout bytes on shard order (parse_protium_sys_info parses them as one output).
+    A failed or timeout shard only loses its own systems.
+    """
+    logger = common.get_logger()
+    jobs = int(jobs or getattr(config, 'protium_shard_jobs', PROTIUM_SHARD_JOBS))
+    timeout = int(timeout or getattr(config, 'protium_shard_timeout', PROTIUM_SHARD_TIMEOUT))
+    ip_line_list = read_protium_ip_list(hardware_info_dic['PTM_SYS_IP_LIST'])
+    shard_list = [ip_line_list[i:i + shard_size] for i in range(0, len(ip_line_list), shard_size)]
+
+    logger.info('Check ' + str(len(ip_line_list)) + ' protium systems with ' + str(len(shard_list)) + ' shards, ' + str(jobs) + ' jobs.')
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        future_list = [executor.submit(run_protium_shard, hardware_info_dic, os.path.join(str(path), 'shard.' + str(index)), shard, timeout) for (index, shard) in enumerate(shard_list)]
+        output_list = []
+
+        for future in future_list:
+            output = future.result()
+
+            if output and (not output.endswith(b'\n')):
+                output += b'\n'
+
+            output_list.append(output)
+
+    return b''.join(output_list)
+
+
+def fetch_protium_sys_info(hardware_info_dic, path=None):
+    """
+    Get protium sys information (raw stdout bytes) of hardware, by shards if ptmRun_shard_size/protium_shard_size is set and there are more systems than it.
+    """
+    if not path:
+        path = os.path.expanduser('~')
+
+    shard_size = get_protium_shard_size(hardware_info_dic)
+    ip_list_file = hardware_info_dic.get('PTM_SYS_IP_LIST', '')
+
+    if shard_size and ip_list_file and os.path.isfile(ip_list_file) and (len(read_protium_ip_list(ip_list_file)) > shard_size):
+        return get_protium_sys_info_by_shard(hardware_info_dic, path, shard_size)
+
+    return get_protium_sys_info_output(path=path, command=hardware_info_dic['check_info_command'])
 
 
 def parse_protium_sys_info(protium_sys_info_list=None):
     """
-    Parsing protium sys information list
+    Parsing protium sys information, raw ptmRun output (bytes/bytearray/memoryview) or line list.
     Return protium board info dict:
     protium_board_info_dic = {
         <board_uuid>:
@@ -55,108 +189,291 @@ def parse_protium_sys_info(protium_sys_info_list=None):
     }
     """
     logger = common.get_logger()
-    board_uuid = None
-    protium_board_info_dic = {}
 
-    if not isinstance(protium_sys_info_list, list):
+    if isinstance(protium_sys_info_list, list):
+        protium_sys_info_list = '\n'.join(protium_sys_info_list).encode('utf-8')
+    elif not isinstance(protium_sys_info_list, (bytes, bytearray, memoryview)):
         logger.error("Invalid protium information, please check config.py!")
         sys.exit(1)
 
-    for line in protium_sys_info_list:
-        if my_match := re.match(r'^\S+\s+\S+\s+(\d+)\s+([\d+\.]+)\s+\(\S+\)\s+\((\d+)\).*$', line):
-            board_uuid = my_match.group(1)
-
-            protium_board_info_dic.setdefault(board_uuid, {})
-            protium_board_info_dic[board_uuid]['board_uuid'] = board_uuid
-            protium_board_info_dic[board_uuid]['board_id'] = my_match.group(3)
-            protium_board_info_dic[board_uuid]['board_ip'] = my_match.group(2)
-            protium_board_info_dic[board_uuid]['used_record'] = []
-        elif my_match := re.match(r'^\s*FPGA\s+(\S+)\s+\|\s*$', line):
-            if not board_uuid or board_uuid not in protium_board_info_dic:
-                logger.warning("Invalid line: %s, ignore." % str(line))
-                continue
+    return parse_protium_sys_info_bytes(protium_sys_info_list)
 
-            record_dic = {
-                'FPGA': my_match.group(1),
-                'user': '--',
-                'host': '--',
-                'pid': '--',
-                'started_time': '--'
-            }
-            protium_board_info_dic[board_uuid]['used_record'].append(record_dic)
-        elif my_match := re.match(r'^\s*FPGA\s+(\S+)\s+\|\s+(\S+):(\S+):(\S+)\s+@\s+(\S+)\s*$', line):
-            if not board_uuid or board_uuid not in protium_board_info_dic:
-                logger.warning("Invalid line: %s, ignore." % str(line))
-                continue
 
-            record_dic = {
-                'FPGA': my_match.group(1),
-                'user': my_match.group(2),
-                'host': my_match.group(3),
-                'pid': my_match.group(4),
-                'started_time': my_match.group(5)
-            }
-            protium_board_info_dic[board_uuid]['used_record'].append(record_dic)
+def parse_protium_sys_info_bytes(protium_sys_info):
+    """
+    Bulk parse raw ptmRun output with one compiled pattern, only the matched fields are copied out of the buffer.
+    """
+    logger = common.get_logger()
+    board_uuid = None
+    used_record_list = None
+    protium_board_info_dic = {}
+
+    for my_match in PROTIUM_SYS_INFO_COMPILE.finditer(protium_sys_info):
+        (fpga, user, host, pid, started_time, uuid, board_ip, board_id) = my_match.groups()
+
+        if uuid is not None:
+            board_uuid = uuid.decode('utf-8')
+            used_record_list = []
+            board_dic = protium_board_info_dic.setdefault(board_uuid, {})
+            board_dic['board_uuid'] = board_uuid
+            board_dic['board_id'] = board_id.decode('utf-8')
+            board_dic['board_ip'] = board_ip.decode('utf-8')
+            board_dic['used_record'] = used_record_list
+        elif used_record_list is None:
+            logger.warning("Invalid line: %s, ignore." % str(my_match.group(0), 'utf-8').strip())
+        elif user is None:
+            used_record_list.append({'FPGA': fpga.decode('utf-8'),
+                                     'user': '--',
+                                     'host': '--',
+                                     'pid': '--',
+                                     'started_time': '--'})
+        else:
+            used_record_list.append({'FPGA': fpga.decode('utf-8'),
+                                     'user': user.decode('utf-8'),
+                                     'host': host.decode('utf-8'),
+                                     'pid': pid.decode('utf-8'),
+                                     'started_time': started_time.decode('utf-8')})
 
     return protium_board_info_dic
 
 
-def multifilter_protium_dic(
-        protium_dic,
-        specified_board_list=[],
-        specified_ip_list=[],
-        specified_fpga_list=[],
-        specified_user_list=[],
-        specified_submit_host_list=[],
-        specified_pid_list=[],
-):
+# ProtiumTable board columns (one row per board) and record columns (one row per used_record).
+PROTIUM_BOARD_COLUMN_LIST = ['board_uuid', 'board_id', 'board_ip']
+PROTIUM_RECORD_COLUMN_LIST = ['FPGA', 'user', 'host', 'pid', 'started_time']
+
+# Columns with inverted index, {<column>: {<value>: <board/record id set>}}.
+PROTIUM_BOARD_INDEX_LIST = ['board_id', 'board_ip']
+PROTIUM_RECORD_INDEX_LIST = ['FPGA', 'user', 'host', 'pid']
+
+
+class ProtiumTable:
     """
-    return filtered protium information(dict)
+    Indexed protium snapshot, board columns and used_record columns are lists (board id/record id is the list index),
+    records of one board are contiguous, and board_id/board_ip/FPGA/user/host/pid have inverted indexes.
+    Filters return ProtiumView (row id selection on the table), the snapshot is never copied.
     """
-    filtered_protium_dic = copy.deepcopy(protium_dic)
+    __slots__ = ('column_dic', 'record_board_list', 'board_record_range_list', 'index_dic')
+
+    def __init__(self):
+        self.column_dic = {column: [] for column in PROTIUM_BOARD_COLUMN_LIST + PROTIUM_RECORD_COLUMN_LIST}
+        # Board id of every record, and (first record id, last record id + 1) of every board.
+        self.record_board_list = []
+        self.board_record_range_list = []
+        self.index_dic = {column: {} for column in PROTIUM_BOARD_INDEX_LIST + PROTIUM_RECORD_INDEX_LIST}
+
+    def __len__(self):
+        return len(self.board_record_range_list)
+
+    def __bool__(self):
+        return bool(self.board_record_range_list)
+
+    def add_board(self, board_dic):
+        board = len(self.board_record_range_list)
+        record_start = len(self.record_board_list)
+
+        for column in PROTIUM_BOARD_COLUMN_LIST:
+            value = sys.intern(str(board_dic[column]))
+            self.column_dic[column].append(value)
+
+            if column in self.index_dic:
+                self.index_dic[column].setdefault(value, set()).add(board)
+
+        for used_record_dic in board_dic['used_record']:
+            record = len(self.record_board_list)
+            self.record_board_list.append(board)
+
+            for column in PROTIUM_RECORD_COLUMN_LIST:
+                value = sys.intern(str(used_record_dic[column]))
+                self.column_dic[column].append(value)
+
+                if column in self.index_dic:
+                    self.index_dic[column].setdefault(value, set()).add(record)
+
+        self.board_record_range_list.append((record_start, len(self.record_board_list)))
+
+    def view(self):
+        """
+        Get the view with all boards and records.
+        """
+        return ProtiumView(self, {board: range(*record_range) for (board, record_range) in enumerate(self.board_record_range_list)})
+
+    def filter(self, **specified_dic):
+        return self.view().filter(**specified_dic)
+
+    def lookup(self, column, value_set):
+        """
+        Get board id set (board_id/board_ip) or record id set (FPGA/user/host/pid) with column value on value_set.
+        """
+        index_dic = self.index_dic[column]
+        id_set = set()
+
+        for value in value_set:
+            id_set.update(index_dic.get(value, ()))
+
+        return id_set
+
+    @classmethod
+    def from_dict(cls, protium_dic):
+        """
+        Build ProtiumTable from protium_board_info_dic (parse_protium_sys_info/protium_sample yaml).
+        """
+        if isinstance(protium_dic, ProtiumTable):
+            return protium_dic
+
+        protium_table = cls()
 
-    if protium_dic:
-        for board_uuid in protium_dic:
-            # Filter board id
-            if specified_board_list and ('ALL' not in specified_board_list) and (protium_dic[board_uuid]['board_id'] not in specified_board_list):
-                del filtered_protium_dic[board_uuid]
+        for board_dic in (protium_dic or {}).values():
+            protium_table.add_board(board_dic)
+
+        return protium_table
+
+
+class ProtiumView:
+    """
+    Selection of boards and records on ProtiumTable, {<board id>: <record id list>} on board order.
+    A board without selected record is shown as one "--" row, the same as protium_board_info_dic.
+    """
+    __slots__ = ('table', 'board_record_dic')
+
+    def __init__(self, table, board_record_dic):
+        self.table = table
+        self.board_record_dic = board_record_dic
+
+    def __len__(self):
+        return len(self.board_record_dic)
+
+    def __bool__(self):
+        return bool(self.board_record_dic)
+
+    def filter(self, board_id=None, board_ip=None, FPGA=None, user=None, host=None, pid=None):
+        """
+        Get a new view with the boards and records matching specified value lists (same as multifilter_protium_dic).
+        Empty value list or 'ALL' on value list means no filter on the column.
+        Boards are filtered with board_id/board_ip, records with FPGA/user/host/pid. If any record value list is not
+        'ALL', boards without selected record are removed, boards left without matched record are kept.
+        """
+        board_set = None
+        record_set = None
+
+        for (column, value_list) in (('board_id', board_id), ('board_ip', board_ip)):
+            if value_list and ('ALL' not in value_list):
+                id_set = self.table.lookup(column, value_list)
+                board_set = id_set if (board_set is None) else (board_set & id_set)
+
+        for (column, value_list) in (('FPGA', FPGA), ('user', user), ('host', host), ('pid', pid)):
+            if value_list and ('ALL' not in value_list):
+                id_set = self.table.lookup(column, value_list)
+                record_set = id_set if (record_set is None) else (record_set & id_set)
+
+        remove_empty = any(('ALL' not in (value_list or [])) for value_list in (FPGA, user, host, pid))
+
+        # Walk the smaller side, selected boards or index hits.
+        if board_set is None:
+            board_list = self.board_record_dic.keys()
+        elif len(board_set) < len(self.board_record_dic):
+            board_list = sorted(board for board in board_set if board in self.board_record_dic)
+        else:
+            board_list = [board for board in self.board_record_dic if board in board_set]
+
+        if record_set is not None:
+            matched_record_dic = {}
+
+            for record in sorted(record_set):
+                matched_record_dic.setdefault(self.table.record_board_list[record], []).append(record)
+
+        board_record_dic = {}
+
+        for board in board_list:
+            record_list = self.board_record_dic[board]
+
+            if remove_empty and (not record_list):
                 continue
 
-            # Filter board ip
-            if specified_ip_list and ('ALL' not in specified_ip_list) and (protium_dic[board_uuid]['board_ip'] not in specified_ip_list):
-                del filtered_protium_dic[board_uuid]
+            if record_set is None:
+                board_record_dic[board] = record_list
+            elif type(record_list) is range:
+                board_record_dic[board] = matched_record_dic.get(board, [])
+            else:
+                selected_record_set = set(record_list)
+                board_record_dic[board] = [record for record in matched_record_dic.get(board, []) if record in selected_record_set]
+
+        return ProtiumView(self.table, board_record_dic)
+
+    def iter_rows(self):
+        """
+        Iterate (board_id, board_ip, FPGA, user, host, pid, started_time) rows, ('--', ...) for a board without record.
+        """
+        column_dic = self.table.column_dic
+
+        for (board, record_list) in self.board_record_dic.items():
+            board_id = column_dic['board_id'][board]
+            board_ip = column_dic['board_ip'][board]
+
+            if not record_list:
+                yield board_id, board_ip, '--', '--', '--', '--', '--'
                 continue
 
-            del_idx_list = []
+            for record in record_list:
+                yield board_id, board_ip, column_dic['FPGA'][record], column_dic['user'][record], column_dic['host'][record], column_dic['pid'][record], column_dic['started_time'][record]
 
-            if 'ALL' not in specified_fpga_list or 'ALL' not in specified_user_list or 'ALL' not in specified_submit_host_list or 'ALL' not in specified_pid_list:
-                if not protium_dic[board_uuid]['used_record']:
-                    del filtered_protium_dic[board_uuid]
+    def get_value_set(self, column):
+        """
+        Get value set of board/record column on the view.
+        """
+        value_list = self.table.column_dic[column]
 
-            # Filter FPGA & user & host & pid
-            for i in range(len(protium_dic[board_uuid]['used_record'])):
-                used_record = protium_dic[board_uuid]['used_record'][i]
+        if column in PROTIUM_BOARD_COLUMN_LIST:
+            return {value_list[board] for board in self.board_record_dic}
 
-                if specified_fpga_list and ('ALL' not in specified_fpga_list) and (used_record['FPGA'] not in specified_fpga_list):
-                    del_idx_list.append(i)
-                    continue
+        return {value_list[record] for record_list in self.board_record_dic.values() for record in record_list}
 
-                if specified_user_list and ('ALL' not in specified_user_list) and (used_record['user'] not in specified_user_list):
-                    del_idx_list.append(i)
-                    continue
+    def to_dict(self):
+        """
+        Convert view into protium_board_info_dic.
+        """
+        column_dic = self.table.column_dic
+        protium_dic = {}
 
-                if specified_submit_host_list and ('ALL' not in specified_submit_host_list) and (used_record['host'] not in specified_submit_host_list):
-                    del_idx_list.append(i)
-                    continue
+        for (board, record_list) in self.board_record_dic.items():
+            board_uuid = column_dic['board_uuid'][board]
+            protium_dic[board_uuid] = {'board_uuid': board_uuid,
+                                       'board_id': column_dic['board_id'][board],
+                                       'board_ip': column_dic['board_ip'][board],
+                                       'used_record': [{column: column_dic[column][record] for column in PROTIUM_RECORD_COLUMN_LIST} for record in record_list]}
 
-                if specified_pid_list and ('ALL' not in specified_pid_list) and (used_record['pid'] not in specified_pid_list):
-                    del_idx_list.append(i)
-                    continue
+        return protium_dic
 
-            for i in reversed(del_idx_list):
-                del filtered_protium_dic[board_uuid]['used_record'][i]
 
-    return filtered_protium_dic
+def multifilter_protium_dic(
+        protium_dic,
+        specified_board_list=[],
+        specified_ip_list=[],
+        specified_fpga_list=[],
+        specified_user_list=[],
+        specified_submit_host_list=[],
+        specified_pid_list=[],
+):
+    """
+    return filtered protium information, dict for protium_board_info_dic, ProtiumView for ProtiumTable/ProtiumView.
+    """
+    if isinstance(protium_dic, ProtiumView):
+        protium_view = protium_dic
+    else:
+        protium_view = ProtiumTable.from_dict(protium_dic).view()
+
+    filtered_protium_view = protium_view.filter(
+        board_id=specified_board_list,
+        board_ip=specified_ip_list,
+        FPGA=specified_fpga_list,
+        user=specified_user_list,
+        host=specified_submit_host_list,
+        pid=specified_pid_list,
+    )
+
+    if isinstance(protium_dic, (ProtiumTable, ProtiumView)):
+        return filtered_protium_view
+
+    return filtered_protium_view.to_dict()
 
 
 def get_protium_host_info():
@@ -203,18 +520,12 @@ def get_protium_host_info():
                         hardware_dic[hardware]['PTM_SYS_IP_LIST'] = my_match.group(1)
                     elif my_match := re.match(r'project_primary_factors\s*=\s*\"(.*)\"\s*', line):
                         hardware_dic[hardware]['project_primary_factors'] = my_match.group(1)
+                    elif my_match := re.match(r'sample_interval\s*=\s*(\d+)\s*', line):
+                        hardware_dic[hardware]['sample_interval'] = int(my_match.group(1))
+                    elif my_match := re.match(r'ptmRun_shard_size\s*=\s*(\d+)\s*', line):
+                        hardware_dic[hardware]['ptmRun_shard_size'] = int(my_match.group(1))
 
-        ssh_command = ''
-
-        check_info_command = '%s export PTM_SYSTEM_IP_LIST=%s;%s %s -init %s' % (
-            ssh_command,
-            hardware_dic[hardware]['PTM_SYS_IP_LIST'],
-            hardware_dic[hardware]['ptmRun_bsub_command'],
-            hardware_dic[hardware]['ptmRun'],
-            config.ptmRun_check_info_file
-        )
-
-        hardware_dic[hardware]['check_info_command'] = check_info_command
+        hardware_dic[hardware]['check_info_command'] = gen_check_info_command(hardware_dic[hardware], hardware_dic[hardware]['PTM_SYS_IP_LIST'])
 
         hardware_domain_file = os.path.join(config.db_path, 'protium/%s/board_list.yaml' % str(hardware))
 
@@ -0,0 +1,235 @@
+import os
+import re
+import sys
+import json
+import datetime
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common, common_palladium, common_utilization
+from config import config
+
+logger = common.get_logger()
+
+# Retention tiers, by sample age (days):
+# raw    : age <= <kind>_retention_raw_days, keep every sample.
+# hourly : age <= <kind>_retention_hourly_days, keep one rollup per hour.
+# daily  : older, keep one rollup per day.
+# <kind>_retention_raw_days = 0 disables retention (keep every sample forever),
+# <kind>_retention_hourly_days = 0 keeps hourly rollups forever.
+RETENTION_TIER_LIST = ['raw', 'hourly', 'daily']
+
+# Palladium rollup file <db_path>/<hardware>/<emulator>/<year>/<month>/<day>.rollup, one json line per rollup:
+# {"time": <first sample time>, "tier": "hourly"|"daily", "sample_num": <merged sample number>,
+#  "sample": <palladium_dic of the first sample>, "usage": [[rack, cluster, logic_drawer, domain, owner, pid, <sample count>], ...]}
+# "sample" is shown on history tab, "usage" keeps every (domain, owner, pid) sampling, so cost and detail
+# utilization regenerated from rollups are the same as from the merged samples.
+PALLADIUM_ROLLUP_SUFFIX = '.rollup'
+
+
+def get_retention_policy(kind):
+    """
+    Get (raw_days, hourly_days) retention policy for "palladium" or "protium".
+    """
+    raw_days = int(getattr(config, str(kind) + '_retention_raw_days', 0) or 0)
+    hourly_days = int(getattr(config, str(kind) + '_retention_hourly_days', 0) or 0)
+
+    return raw_days, hourly_days
+
+
+def get_retention_tier(year, month, day, policy, today=None):
+    """
+    Get retention tier of specified sample day.
+    """
+    (raw_days, hourly_days) = policy
+
+    if not raw_days:
+        return 'raw'
+
+    today = today or datetime.date.today()
+    age = (today - datetime.date(int(year), int(month), int(day))).days
+
+    if age <= raw_days:
+        return 'raw'
+    elif (not hourly_days) or (age <= hourly_days):
+        return 'hourly'
+    else:
+        return 'daily'
+
+
+def get_bucket_key(day_time, tier):
+    """
+    Samples with the same bucket key are merged into one rollup on tier.
+    """
+    if tier == 'hourly':
+        return str(day_time)[0:2]
+
+    return ''
+
+
+def gen_palladium_rollup_sample_path(rollup_file, day_time):
+    """
+    Generate sample path for a rollup, format "<rollup_file>#<time>".
+    """
+    return str(rollup_file) + '#' + str(day_time)
+
+
+def parse_palladium_rollup_sample_path(sample_path):
+    """
+    Split rollup sample path into (rollup_file, time), return None for other sample path.
+    """
+    if my_match := re.match(r'^(.+' + re.escape(PALLADIUM_ROLLUP_SUFFIX) + r')#(\d+)$', str(sample_path)):
+        return my_match.group(1), my_match.group(2)
+
+    return None
+
+
+def read_palladium_rollup_list(rollup_file):
+    """
+    Read all rollup records on rollup file.
+    """
+    rollup_list = []
+
+    if os.path.exists(rollup_file):
+        with open(rollup_file, 'r') as RF:
+            for line in RF:
+                if line.strip():
+                    rollup_list.append(json.loads(line))
+
+    return rollup_list
+
+
+def read_palladium_rollup(rollup_file, day_time):
+    """
+    Read rollup record of specified time, return None if it is not on rollup file.
+    """
+    for rollup_dic in read_palladium_rollup_list(rollup_file):
+        if rollup_dic['time'] == str(day_time):
+            return rollup_dic
+
+    return None
+
+
+def write_palladium_rollup_list(rollup_file, rollup_list):
+    """
+    Write rollup records into rollup file.
+    """
+    tmp_file = str(rollup_file) + '.tmp'
+
+    with open(tmp_file, 'w') as RF:
+        for rollup_dic in sorted(rollup_list, key=lambda x: x['time']):
+            RF.write(json.dumps(rollup_dic, separators=(',', ':')) + '\n')
+
+    os.replace(tmp_file, rollup_file)
+
+
+def gen_palladium_rollup(day_time, tier, palladium_dic):
+    """
+    Generate rollup of one sample.
+    """
+    domain_table = common_palladium.DomainTable.from_dict(palladium_dic)
+    usage_list = [list(item) + [1, ] for item in domain_table.iter_columns('rack', 'cluster', 'logic_drawer', 'domain', 'owner', 'pid')]
+
+    return {'time': str(day_time), 'tier': tier, 'sample_num': 1, 'sample': palladium_dic, 'usage': usage_list}
+
+
+def merge_palladium_rollup(rollup_list, tier):
+    """
+    Merge rollups into one rollup on tier, the first rollup is kept as history sample.
+    """
+    rollup_list = sorted(rollup_list, key=lambda x: x['time'])
+    usage_dic = {}
+
+    for rollup_dic in rollup_list:
+        for item in rollup_dic['usage']:
+            key = tuple(item[:-1])
+            usage_dic[key] = usage_dic.get(key, 0) + item[-1]
+
+    return {'time': rollup_list[0]['time'],
+            'tier': tier,
+            'sample_num': sum(rollup_dic['sample_num'] for rollup_dic in rollup_list),
+            'sample': rollup_list[0]['sample'],
+            'usage': [list(key) + [count, ] for (key, count) in usage_dic.items()]}
+
+
+def gen_palladium_rollup_table(rollup_dic):
+    """
+    Switch rollup into DomainTable with one row per merged domain sampling, for cost and detail utilization regeneration.
+    Rack/cluster/logic drawer structure comes from the kept history sample.
+    """
+    domain_table = common_palladium.DomainTable({key: value for (key, value) in rollup_dic['sample'].items() if key != 'rack'})
+    sample_table = common_palladium.DomainTable.from_dict(rollup_dic['sample'])
+    (domain_table.rack_list, domain_table.cluster_dic, domain_table.logic_drawer_dic) = (sample_table.rack_list, sample_table.cluster_dic, sample_table.logic_drawer_dic)
+
+    for (rack, cluster, logic_drawer, domain, owner, pid, count) in rollup_dic['usage']:
+        for i in range(count):
+            domain_table.add_row(rack, cluster, logic_drawer, domain, {'owner': owner, 'pid': pid})
+
+    return domain_table
+
+
+def downsample_utilization_file(utilization_file, policy, line_format='palladium', today=None):
+    """
+    Replace utilization lines on hourly/daily tier with one average line per hour/day (on the time of the first line).
+    Samplers wait on the utilization lock while the file is rewritten.
+    Return (old line number, new line number).
+    """
+    if not os.path.exists(utilization_file):
+        return 0, 0
+
+    LF = common_utilization.lock_utilization_file(utilization_file)
+
+    try:
+        return downsample_locked_utilization_file(utilization_file, policy, line_format, today)
+    finally:
+        common.unlock_file(LF)
+
+
+def downsample_locked_utilization_file(utilization_file, policy, line_format='palladium', today=None):
+    """
+    Downsample utilization file, see downsample_utilization_file, the caller holds the utilization lock.
+    """
+    bucket_dic = {}
+    line_list = []
+
+    with open(utilization_file, 'rb') as UF:
+        old_line_list = UF.read().decode('utf-8').splitlines(keepends=True)
+
+    for line in old_line_list:
+        record = common_utilization.parse_utilization_line(line, line_format)
+
+        if not record:
+            line_list.append(line)
+            continue
+
+        timestamp = str(record[0])
+        tier = get_retention_tier(timestamp[0:4], timestamp[4:6], timestamp[6:8], policy, today=today)
+
+        if tier == 'raw':
+            line_list.append(line)
+            continue
+
+        bucket_key = (timestamp[0:8], get_bucket_key(timestamp[8:14], tier))
+
+        if bucket_key not in bucket_dic:
+            bucket_dic[bucket_key] = [len(line_list), []]
+            line_list.append(line)
+
+        bucket_dic[bucket_key][1].append(record[1])
+
+    for (index, utilization_list) in bucket_dic.values():
+        if len(utilization_list) > 1:
+            utilization = round(sum(utilization_list) / len(utilization_list), 6)
+            line_list[index] = re.sub(r'\S+\s*$', str(utilization) + '\n', line_list[index])
+
+    if len(line_list) == len(old_line_list):
+        return len(old_line_list), len(line_list)
+
+    tmp_file = str(utilization_file) + '.tmp'
+
+    with open(tmp_file, 'wb') as TF:
+        TF.write(''.join(line_list).encode('utf-8'))
+
+    os.replace(tmp_file, utilization_file)
+    common_utilization.convert_utilization_file(utilization_file, line_format)
+
+    return len(old_line_list), len(line_list)
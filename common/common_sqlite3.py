@@ -2,6 +2,7 @@ import os
 import re
 import sys
 import sqlite3
+import pathlib
 
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
 from common import common
@@ -9,7 +10,7 @@ from common import common
 
 def connect_db_file(db_file, mode='read'):
     """
-    Connect specified db_file with read/write mode.
+    Connect specified db_file with read/write mode, "readonly" mode opens db_file with sqlite read-only uri.
     """
     result = 'passed'
     conn = ''
@@ -21,14 +22,17 @@ def connect_db_file(db_file, mode='read'):
             common.print_warning('*Warning*: database file "' + str(db_file) + '" is on another connection, will not connect it.')
             result = 'locked'
             return (result, conn)
-    elif mode == 'read':
+    elif mode in ['read', 'readonly']:
         if not os.path.exists(db_file):
             common.print_error('*Error*: "' + str(db_file) + '" No such database file.')
             result = 'failed'
             return (result, conn)
 
     try:
-        conn = sqlite3.connect(db_file)
+        if mode == 'readonly':
+            conn = sqlite3.connect(pathlib.Path(db_file).absolute().as_uri() + '?mode=ro', uri=True)
+        else:
+            conn = sqlite3.connect(db_file)
     except Exception as error:
         common.print_error('*Error*: Failed on connecting database file "' + str(db_file) + '": ' + str(error))
         result = 'failed'
@@ -275,6 +279,82 @@ def insert_into_sql_table(db_file, orig_conn, table_name, value_string, commit=T
         common.print_error('*Error* (insert_into_sql_table) : Failed on inserting specified values into table "' + str(table_name) + '" on db file "' + str(db_file) + '": ' + str(error))
 
 
+def insert_many_into_sql_table(db_file, orig_conn, table_name, value_list, commit=True, replace=False):
+    """
+    Insert many rows (list of tuple/list) into sql table with one executemany.
+    """
+    if not value_list:
+        return
+
+    (result, conn, curs) = connect_preprocess(db_file, orig_conn, mode='write')
+
+    if (result == 'failed') or (result == 'locked'):
+        return
+
+    try:
+        if replace:
+            command = "INSERT OR REPLACE INTO '" + str(table_name) + "' VALUES (" + ', '.join(['?'] * len(value_list[0])) + ")"
+        else:
+            command = "INSERT INTO '" + str(table_name) + "' VALUES (" + ', '.join(['?'] * len(value_list[0])) + ")"
+
+        curs.executemany(command, value_list)
+        curs.close()
+
+        if commit:
+            conn.commit()
+
+            if orig_conn == '':
+                conn.close()
+    except Exception as error:
+        common.print_error('*Error* (insert_many_into_sql_table) : Failed on inserting values into table "' + str(table_name) + '" on db file "' + str(db_file) + '": ' + str(error))
+
+
+def create_sql_index(db_file, orig_conn, index_name, table_name, key_list, commit=True):
+    """
+    Create an index on specified table keys if it not exists.
+    """
+    (result, conn, curs) = connect_preprocess(db_file, orig_conn, mode='write')
+
+    if (result == 'failed') or (result == 'locked'):
+        return
+
+    try:
+        command = "CREATE INDEX IF NOT EXISTS '" + str(index_name) + "' ON '" + str(table_name) + "' (" + ', '.join(["'" + str(key) + "'" for key in key_list]) + ")"
+        curs.execute(command)
+        curs.close()
+
+        if commit:
+            conn.commit()
+
+            if orig_conn == '':
+                conn.close()
+    except Exception as error:
+        common.print_error('*Error* (create_sql_index) : Failed on creating index "' + str(index_name) + '" on db file "' + str(db_file) + '": ' + str(error))
+
+
+def add_sql_table_column(db_file, orig_conn, table_name, column_string, commit=True):
+    """
+    Add a new column into existing sql table, column_string is like "<column> <type>".
+    """
+    (result, conn, curs) = connect_preprocess(db_file, orig_conn, mode='write')
+
+    if (result == 'failed') or (result == 'locked'):
+        return
+
+    try:
+        command = "ALTER TABLE '" + str(table_name) + "' ADD COLUMN " + str(column_string)
+        curs.execute(command)
+        curs.close()
+
+        if commit:
+            conn.commit()
+
+            if orig_conn == '':
+                conn.close()
+    except Exception as error:
+        common.print_error('*Error* (add_sql_table_column) : Failed on adding column "' + str(column_string) + '" into table "' + str(table_name) + '" on db file "' + str(db_file) + '": ' + str(error))
+
+
 def update_sql_table_data(db_file, orig_conn, table_name, set_condition='', where_condition='', commit=True):
     """
     Update sql table with set_condition on where_condition.
@@ -299,6 +379,30 @@ def update_sql_table_data(db_file, orig_conn, table_name, set_condition='', wher
             common.print_error('*Error* (update_sql_table_data) : Failed on updating table "' + str(table_name) + '" on db file "' + str(db_file) + '": ' + str(error))
 
 
+def delete_sql_table_data(db_file, orig_conn, table_name, where_condition='', commit=True):
+    """
+    Delete sql table rows on where_condition.
+    """
+    if where_condition:
+        (result, conn, curs) = connect_preprocess(db_file, orig_conn, mode='write')
+
+        if (result == 'failed') or (result == 'locked'):
+            return
+
+        try:
+            command = "DELETE FROM '" + str(table_name) + "' WHERE " + str(where_condition)
+            curs.execute(command)
+            curs.close()
+
+            if commit:
+                conn.commit()
+
+                if orig_conn == '':
+                    conn.close()
+        except Exception as error:
+            common.print_error('*Error* (delete_sql_table_data) : Failed on deleting table "' + str(table_name) + '" rows on db file "' + str(db_file) + '": ' + str(error))
+
+
 def gen_sql_table_key_string(key_list, key_type_list=[], auto_increment=False):
     """
     Switch the input key_list into the sqlite table key string.
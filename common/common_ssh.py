@@ -0,0 +1,287 @@
+import os
+import re
+import sys
+import time
+import getpass
+import signal
+import socket
+import tempfile
+import threading
+import functools
+import subprocess
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common
+from config import config
+
+logger = common.get_logger()
+
+# Keep the master connection this long (seconds) after the last ssh session on it exits.
+SSH_CONTROL_PERSIST = 600
+
+# Default remote command timeout (seconds).
+SSH_TIMEOUT = 120
+
+# Max concurrent ssh sessions per host on one process (sshd MaxSessions is 10 by default).
+SSH_MAX_SESSIONS = 4
+
+# Check master connection health again if it was not checked in this long (seconds).
+SSH_CHECK_INTERVAL = 60
+
+
+@functools.lru_cache(maxsize=None)
+def get_local_host_list():
+    """
+    Get current server hostname and ip, resolved once per process.
+    """
+    current_hostname = socket.gethostname()
+
+    try:
+        current_ip = socket.gethostbyname(current_hostname)
+    except socket.error:
+        current_ip = ''
+
+    return [str(current_hostname).strip(), str(current_ip).strip()]
+
+
+def is_local_host(host):
+    """
+    Check whether host is current server.
+    """
+    return str(host).strip() in get_local_host_list()
+
+
+def kill_process_group(SP):
+    """
+    Kill process SP and its children (SP is started with start_new_session=True).
+    """
+    try:
+        os.killpg(SP.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def iter_process_output(SP, timeout=None, description=''):
+    """
+    Yield stripped stdout lines of process SP while it is still running.
+    SP is killed after timeout seconds, or when the consumer stops iterating.
+    Raise subprocess.TimeoutExpired on timeout, and subprocess.CalledProcessError on non-zero exit after the last line,
+    so the consumer could discard the incomplete output.
+    """
+    timer = None
+    start_time = time.time()
+
+    if timeout:
+        timer = threading.Timer(timeout, kill_process_group, args=(SP, ))
+        timer.start()
+
+    try:
+        for line in SP.stdout:
+            yield line.decode('utf-8').strip()
+
+        SP.wait()
+    finally:
+        if timer:
+            timer.cancel()
+
+        if SP.poll() is None:
+            kill_process_group(SP)
+            SP.wait()
+
+        SP.stdout.close()
+
+    if timeout and (SP.returncode < 0) and (time.time() - start_time >= timeout):
+        logger.error('Run command timeout after ' + str(timeout) + 's: ' + str(description))
+        raise subprocess.TimeoutExpired(description, timeout)
+
+    if SP.returncode:
+        raise subprocess.CalledProcessError(SP.returncode, description)
+
+
+class SshPool:
+    """
+    Reuse one multiplexed ssh master connection (OpenSSH ControlMaster) per remote host.
+    The master is kept by ssh itself for SSH_CONTROL_PERSIST seconds, so it is shared by later
+    commands on the same process and by later psample/palladium_monitor processes of the same user.
+    """
+    def __init__(self, ssh_command=None, control_dir=None, control_persist=None, timeout=None, max_sessions=None):
+        self.ssh_command = ssh_command or getattr(config, 'ssh_command', 'ssh')
+        self.control_dir = control_dir or os.path.join(tempfile.gettempdir(), 'emu_monitor_ssh.' + str(getpass.getuser()))
+        self.control_persist = int(control_persist or getattr(config, 'ssh_control_persist', SSH_CONTROL_PERSIST))
+        self.timeout = int(timeout or getattr(config, 'ssh_timeout', SSH_TIMEOUT))
+        self.max_sessions = int(max_sessions or getattr(config, 'ssh_max_sessions', SSH_MAX_SESSIONS))
+
+        self.lock = threading.Lock()
+        self.semaphore_dic = {}
+        self.check_time_dic = {}
+
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+
+    def get_control_path(self, host):
+        """
+        Get master connection socket of host.
+        """
+        return os.path.join(self.control_dir, re.sub(r'[^\w.@-]', '_', str(host).strip()))
+
+    def get_option_list(self, host):
+        """
+        Get ssh options to share the master connection of host.
+        """
+        option_list = ['-o', 'ControlMaster=auto',
+                       '-o', 'ControlPath=' + str(self.get_control_path(host)),
+                       '-o', 'ControlPersist=' + str(self.control_persist),
+                       '-o', 'BatchMode=yes',
+                       '-o', 'ConnectTimeout=' + str(min(self.timeout, 30))]
+
+        return option_list
+
+    def gen_command(self, host, command):
+        """
+        Generate shell command string which runs command on host through the master connection.
+        """
+        return ' '.join([self.ssh_command, ] + self.get_option_list(host) + [str(host), '"' + str(command) + '"'])
+
+    def get_semaphore(self, host):
+        with self.lock:
+            if host not in self.semaphore_dic:
+                self.semaphore_dic[host] = threading.BoundedSemaphore(self.max_sessions)
+
+            return self.semaphore_dic[host]
+
+    def check(self, host, force=False):
+        """
+        Health check the master connection of host, remove stale master socket so the next command reconnects.
+        Return True if the master connection is alive.
+        """
+        control_path = self.get_control_path(host)
+
+        if not os.path.exists(control_path):
+            return False
+
+        if (not force) and (time.time() - self.check_time_dic.get(host, 0) < SSH_CHECK_INTERVAL):
+            return True
+
+        try:
+            SP = subprocess.run([self.ssh_command, '-O', 'check'] + self.get_option_list(host) + [str(host), ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10)
+
+            if SP.returncode == 0:
+                self.check_time_dic[host] = time.time()
+                return True
+        except subprocess.TimeoutExpired:
+            pass
+
+        logger.warning('Stale ssh master connection to "' + str(host) + '", reconnect.')
+        self.check_time_dic.pop(host, None)
+
+        try:
+            os.remove(control_path)
+        except OSError:
+            pass
+
+        return False
+
+    def run(self, host, command, timeout=None):
+        """
+        Run command on host through the master connection, return (returncode, stdout, stderr).
+        The command is killed after timeout seconds with returncode -1.
+        """
+        timeout = timeout or self.timeout
+
+        with self.get_semaphore(host):
+            self.check(host)
+
+            for retry in range(2):
+                SP = subprocess.Popen([self.ssh_command, ] + self.get_option_list(host) + [str(host), str(command)], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+
+                try:
+                    (stdout, stderr) = SP.communicate(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    kill_process_group(SP)
+                    (stdout, stderr) = SP.communicate()
+                    logger.error('Run command on "' + str(host) + '" timeout after ' + str(timeout) + 's: ' + str(command))
+                    self.check(host, force=True)
+                    return (-1, stdout, stderr)
+
+                # 255 is ssh connection error, retry once with a new master connection if the master is broken.
+                if (SP.returncode == 255) and (retry == 0) and (not self.check(host, force=True)):
+                    continue
+
+                return (SP.returncode, stdout, stderr)
+
+    def stream(self, host, command, timeout=None):
+        """
+        Run command on host through the master connection, yield its stdout lines while it is running.
+        Raise subprocess.TimeoutExpired/CalledProcessError like iter_process_output.
+        """
+        timeout = timeout or self.timeout
+
+        with self.get_semaphore(host):
+            self.check(host)
+
+            for retry in range(2):
+                SP = subprocess.Popen([self.ssh_command, ] + self.get_option_list(host) + [str(host), str(command)], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, start_new_session=True)
+                line_num = 0
+
+                try:
+                    for line in iter_process_output(SP, timeout=timeout, description=str(host) + ': ' + str(command)):
+                        line_num += 1
+                        yield line
+                except subprocess.CalledProcessError:
+                    # Same as run(), only retry if nothing is received yet.
+                    if (SP.returncode == 255) and (retry == 0) and (line_num == 0) and (not self.check(host, force=True)):
+                        continue
+
+                    raise
+
+                break
+
+    def close(self, host=None):
+        """
+        Stop the master connection of host, or all master connections on this pool.
+        """
+        host_list = [host, ] if host else list(self.semaphore_dic.keys())
+
+        for host in host_list:
+            if os.path.exists(self.get_control_path(host)):
+                subprocess.run([self.ssh_command, '-O', 'exit'] + self.get_option_list(host) + [str(host), ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+            self.check_time_dic.pop(host, None)
+
+
+SSH_POOL = None
+SSH_POOL_LOCK = threading.Lock()
+
+
+def get_ssh_pool():
+    """
+    Get the process wide ssh pool.
+    """
+    global SSH_POOL
+
+    with SSH_POOL_LOCK:
+        if SSH_POOL is None:
+            SSH_POOL = SshPool()
+
+    return SSH_POOL
+
+
+def run_remote_command(host, command, timeout=None):
+    """
+    Run command on host, locally if host is current server, else through the ssh pool.
+    Return (returncode, stdout, stderr).
+    """
+    if is_local_host(host):
+        return common.run_command('"' + str(command) + '"')
+
+    return get_ssh_pool().run(host, command, timeout=timeout)
+
+
+def stream_remote_command(host, command, timeout=None):
+    """
+    Run command on host like run_remote_command, yield its stdout lines while it is running.
+    """
+    if is_local_host(host):
+        SP = subprocess.Popen('"' + str(command) + '"', shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, start_new_session=True)
+        yield from iter_process_output(SP, timeout=timeout, description=command)
+    else:
+        yield from get_ssh_pool().stream(host, command, timeout=timeout)
@@ -0,0 +1,258 @@
+import os
+import re
+import sys
+import mmap
+import bisect
+import struct
+import numpy
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common
+
+logger = common.get_logger()
+
+# Binary utilization series, fixed-width records sorted by timestamp.
+# timestamp is integer YYYYMMDDHHMMSS (int64), utilization is the raw sampled value (float64, 0-1).
+UTILIZATION_SERIES_SUFFIX = '.series'
+UTILIZATION_RECORD = struct.Struct('<qd')
+UTILIZATION_RECORD_DTYPE = numpy.dtype([('timestamp', '<i8'), ('utilization', '<f8')])
+
+# Lock file beside text utilization file, samplers take it to append one sample, retention takes it to rewrite the file.
+UTILIZATION_LOCK_SUFFIX = '.lock'
+
+# Text utilization file line format for every sampler.
+UTILIZATION_LINE_PATTERN_DIC = {'palladium': re.compile(r'^\s*(\d{8})\s+(\d{6})\s+:\s+(\S+)\s*$'),
+                                'protium': re.compile(r'^\s*(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})-(\d{2})\s*:\s*(\S+)\s*$')}
+
+
+def get_utilization_series_file(utilization_file):
+    """
+    Get binary utilization series file for text utilization file.
+    """
+    return str(utilization_file) + UTILIZATION_SERIES_SUFFIX
+
+
+def lock_utilization_file(utilization_file):
+    """
+    Lock text utilization file (and its series) exclusively.
+    """
+    return common.lock_file(str(utilization_file) + UTILIZATION_LOCK_SUFFIX, exclusive=True)
+
+
+def append_utilization_sample(utilization_file, line, timestamp, utilization, line_format='palladium'):
+    """
+    Append one sample line into text utilization file, and the sample into utilization series, with utilization lock.
+    """
+    LF = lock_utilization_file(utilization_file)
+
+    try:
+        with open(utilization_file, 'a', encoding='utf-8') as UF:
+            UF.write(line)
+
+        append_utilization_series(get_utilization_series_file(utilization_file), timestamp, utilization, line_format)
+    finally:
+        common.unlock_file(LF)
+
+
+def parse_utilization_line(line, line_format='palladium'):
+    """
+    Parse text utilization line, return (timestamp, utilization), or None for invalid line.
+    """
+    if my_match := UTILIZATION_LINE_PATTERN_DIC[line_format].match(line):
+        item_list = my_match.groups()
+
+        try:
+            return int(''.join(item_list[:-1])), float(item_list[-1])
+        except ValueError:
+            return None
+
+    return None
+
+
+class TimestampView:
+    """
+    Sequence view on the timestamps of a mapped utilization series, for bisect.
+    """
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.record_num = len(buffer) // UTILIZATION_RECORD.size
+
+    def __len__(self):
+        return self.record_num
+
+    def __getitem__(self, index):
+        return UTILIZATION_RECORD.unpack_from(self.buffer, index * UTILIZATION_RECORD.size)[0]
+
+
+def get_first_timestamp(series_file):
+    """
+    Get the first timestamp of utilization series, return 0 for empty series.
+    """
+    if (not os.path.exists(series_file)) or (os.path.getsize(series_file) < UTILIZATION_RECORD.size):
+        return 0
+
+    with open(series_file, 'rb') as SF:
+        return UTILIZATION_RECORD.unpack(SF.read(UTILIZATION_RECORD.size))[0]
+
+
+def get_last_timestamp(series_file):
+    """
+    Get the last timestamp of utilization series, return 0 for empty series.
+    """
+    if (not os.path.exists(series_file)) or (os.path.getsize(series_file) < UTILIZATION_RECORD.size):
+        return 0
+
+    with open(series_file, 'rb') as SF:
+        SF.seek((os.path.getsize(series_file) // UTILIZATION_RECORD.size - 1) * UTILIZATION_RECORD.size)
+        return UTILIZATION_RECORD.unpack(SF.read(UTILIZATION_RECORD.size))[0]
+
+
+def write_utilization_series(series_file, record_list):
+    """
+    Write (timestamp, utilization) record list into utilization series, sorted by timestamp.
+    For duplicate timestamps, the first record on record_list is kept.
+    """
+    tmp_file = str(series_file) + '.tmp'
+    last_timestamp = None
+
+    with open(tmp_file, 'wb') as SF:
+        for (timestamp, utilization) in sorted(record_list, key=lambda x: int(x[0])):
+            if int(timestamp) != last_timestamp:
+                SF.write(UTILIZATION_RECORD.pack(int(timestamp), float(utilization)))
+                last_timestamp = int(timestamp)
+
+    os.replace(tmp_file, series_file)
+
+
+def append_utilization_series(series_file, timestamp, utilization, line_format='palladium'):
+    """
+    Append one sample into utilization series.
+    A missing series is built from text utilization file first, so the history on it is not hidden.
+    The series keeps sorted and unique, a sample older than the last record makes the series rewritten, a sample
+    on an existing timestamp is ignored.
+    """
+    timestamp = int(timestamp)
+    utilization_file = str(series_file)[:-len(UTILIZATION_SERIES_SUFFIX)]
+
+    if (not os.path.exists(series_file)) and str(series_file).endswith(UTILIZATION_SERIES_SUFFIX) and os.path.exists(utilization_file):
+        convert_utilization_file(utilization_file, line_format)
+
+    last_timestamp = get_last_timestamp(series_file)
+
+    if timestamp == last_timestamp:
+        return
+    elif timestamp > last_timestamp:
+        with open(series_file, 'ab') as SF:
+            SF.write(UTILIZATION_RECORD.pack(timestamp, float(utilization)))
+    else:
+        record_array = read_utilization_series(series_file)
+        record_list = list(zip(record_array['timestamp'].tolist(), record_array['utilization'].tolist()))
+        record_list.append((timestamp, utilization))
+        write_utilization_series(series_file, record_list)
+
+
+def read_utilization_series(series_file, start_timestamp=None, end_timestamp=None):
+    """
+    Read records with start_timestamp <= timestamp <= end_timestamp from utilization series.
+    Locate the range with bisect on the mapped file, only decode the selected slice.
+    Return numpy structured array with fields "timestamp" and "utilization".
+    """
+    if (not os.path.exists(series_file)) or (os.path.getsize(series_file) < UTILIZATION_RECORD.size):
+        return numpy.zeros(0, dtype=UTILIZATION_RECORD_DTYPE)
+
+    with open(series_file, 'rb') as SF:
+        with mmap.mmap(SF.fileno(), 0, access=mmap.ACCESS_READ) as SM:
+            timestamp_view = TimestampView(SM)
+            start_index = 0 if start_timestamp is None else bisect.bisect_left(timestamp_view, int(start_timestamp))
+            end_index = len(timestamp_view) if end_timestamp is None else bisect.bisect_right(timestamp_view, int(end_timestamp))
+
+            if start_index >= end_index:
+                return numpy.zeros(0, dtype=UTILIZATION_RECORD_DTYPE)
+
+            return numpy.frombuffer(SM, dtype=UTILIZATION_RECORD_DTYPE, count=end_index - start_index, offset=start_index * UTILIZATION_RECORD.size).copy()
+
+
+def get_utilization_file_first_timestamp(utilization_file, line_format='palladium'):
+    """
+    Get the first timestamp of text utilization file, return 0 if there is no valid line.
+    """
+    if os.path.exists(utilization_file):
+        with open(utilization_file, 'r') as UF:
+            for line in UF:
+                record = parse_utilization_line(line, line_format)
+
+                if record:
+                    return record[0]
+
+    return 0
+
+
+def is_utilization_series_valid(utilization_file, line_format='palladium'):
+    """
+    Utilization series is valid if it exists, is not older than text utilization file (written by an old sampler),
+    and starts from the first timestamp of text utilization file (not started by a new sampler on old history).
+    """
+    series_file = get_utilization_series_file(utilization_file)
+
+    if not os.path.exists(series_file):
+        return False
+
+    if os.path.exists(utilization_file):
+        if os.path.getmtime(series_file) + 60 < os.path.getmtime(utilization_file):
+            return False
+
+        first_timestamp = get_utilization_file_first_timestamp(utilization_file, line_format)
+
+        if first_timestamp and (first_timestamp < get_first_timestamp(series_file)):
+            return False
+
+    return True
+
+
+def convert_utilization_file(utilization_file, line_format='palladium'):
+    """
+    Build utilization series from text utilization file, return record number.
+    """
+    record_list = []
+
+    with open(utilization_file, 'r') as UF:
+        for line in UF:
+            record = parse_utilization_line(line, line_format)
+
+            if record:
+                record_list.append(record)
+
+    write_utilization_series(get_utilization_series_file(utilization_file), record_list)
+
+    return len(record_list)
+
+
+def get_utilization_series_dic(utilization_file, start_timestamp, end_timestamp, detail=False):
+    """
+    Get utilization information between start_timestamp and end_timestamp (YYYYMMDDHHMMSS, both included) from utilization series.
+    Return {<YYYYMMDD-HHMMSS>: <utilization(%)>} with detail, else {<YYYYMMDD>: <average utilization(%)>}.
+    """
+    record_array = read_utilization_series(get_utilization_series_file(utilization_file), start_timestamp, end_timestamp)
+    utilization_dic = {}
+
+    if not len(record_array):
+        return utilization_dic
+
+    # Keep the first record of duplicate timestamps (series written by an old version).
+    record_array = record_array[numpy.concatenate(([True], record_array['timestamp'][1:] != record_array['timestamp'][:-1]))]
+
+    timestamp_list = record_array['timestamp'].tolist()
+    utilization_list = (record_array['utilization'] * 100).tolist()
+
+    if detail:
+        for (timestamp, utilization) in zip(timestamp_list, utilization_list):
+            timestamp = str(timestamp)
+            utilization_dic.setdefault(timestamp[0:8] + '-' + timestamp[8:14], utilization)
+    else:
+        (date_array, start_index_array) = numpy.unique(record_array['timestamp'] // 1000000, return_index=True)
+        end_index_list = start_index_array.tolist()[1:] + [len(timestamp_list), ]
+
+        for (date, start_index, end_index) in zip(date_array.tolist(), start_index_array.tolist(), end_index_list):
+            utilization_dic[str(date)] = int(sum(utilization_list[start_index:end_index]) / (end_index - start_index))
+
+    return utilization_dic
@@ -2,13 +2,36 @@ import re
 import copy
 import os
 import sys
+import time
 import yaml
+import bisect
+import subprocess
+import numpy
 from datetime import datetime
 
 # Import config file
 sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common, common_sqlite3, common_ssh
 from config import config
 
+logger = common.get_logger()
+
+DAY_SECONDS = 86400
+
+# zRscManager commands are killed after config.zebu_command_timeout seconds.
+ZEBU_COMMAND_TIMEOUT = 300
+
+# zRscManager global management database, generated on current directory by zRscManager commands.
+ZEBU_GLOBAL_DB = 'ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db'
+
+# Sysreport fields (check_report_command "-fields 'opendate, closedate, modulesList, user, pid, pc'") and their default
+# columns on ZEBU_GLOBAL_DB sysreport table (config.zebu_global_db_report_column_dic).
+ZEBU_REPORT_FIELD_LIST = ['opendate', 'closedate', 'modules', 'user', 'pid', 'pc']
+ZEBU_GLOBAL_DB_REPORT_COLUMN_DIC = {'opendate': 'opendate', 'closedate': 'closedate', 'modules': 'modulesList', 'user': 'user', 'pid': 'pid', 'pc': 'pc'}
+
+# Date format the SQL date range filter depends on, "YYYY-MM-DD HH:MM:SS".
+ZEBU_GLOBAL_DB_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+
 
 def parse_current_zebu_info(current_zebu_info):
 
@@ -85,7 +108,9 @@ def parse_current_zebu_info(current_zebu_info):
 
 def record_module_info(module_info_list):
     """
-    Read module_list.yaml and record new data
+    Read module_list.yaml and record new data.
+    The file is only rewritten (with a temporary file and rename, under its lock) when the module list changes, so
+    readers never see a half-written file.
     """
     db_path = config.db_path
     db_file = db_path + '/zebu_module_list.yaml'
@@ -93,22 +118,42 @@ def record_module_info(module_info_list):
     current_module_dic = {current_time: module_info_list}
 
     try:
-        with open(db_file, 'r') as f:
-            module_dic = yaml.load(f, Loader=yaml.FullLoader)
-            dates = [datetime.strptime(date, '%Y-%m-%d') for date in module_dic.keys()]
-            max_date = max(dates, key=lambda x: x.timestamp()).strftime('%Y-%m-%d')
+        LF = common.lock_file(db_file + '.lock', exclusive=True)
+    except OSError:
+        # Read-only db path (monitor user), could not record.
+        return load_zebu_module_dic() or current_module_dic
 
-            if not set(module_dic[max_date]) == set(module_info_list):
-                module_dic.update(current_module_dic)
+    try:
+        module_dic = {}
 
-    except Exception:
-        module_dic = current_module_dic
+        if os.path.exists(db_file):
+            try:
+                with open(db_file, 'r') as f:
+                    module_dic = yaml.load(f, Loader=yaml.FullLoader) or {}
+            except Exception as error:
+                # Keep the history on the broken file for checking, do not overwrite it.
+                print('Can\'t read zebu module list "' + str(db_file) + '": ' + str(error))
+                return current_module_dic
 
-    try:
-        with open(db_file, 'w') as f:
-            yaml.dump(module_dic, f)
-    except Exception:
-        print('Can\'t update zebu module list, please contact CAD for help.')
+        if module_dic:
+            max_date = max(module_dic.keys(), key=lambda date: datetime.strptime(str(date), '%Y-%m-%d'))
+
+            if set(module_dic[max_date]) == set(module_info_list):
+                return module_dic
+
+        module_dic.update(current_module_dic)
+
+        try:
+            tmp_file = db_file + '.' + str(os.getpid()) + '.tmp'
+
+            with open(tmp_file, 'w') as f:
+                yaml.dump(module_dic, f)
+
+            os.replace(tmp_file, db_file)
+        except Exception:
+            print('Can\'t update zebu module list, please contact CAD for help.')
+    finally:
+        common.unlock_file(LF)
 
     return module_dic
 
@@ -228,3 +273,398 @@ def filter_zebu_dic(zebu_dic, specified_unit='', specified_module='', specified_
                 filtered_zebu_dic['row'] += 1
 
     return filtered_zebu_dic
+
+
+def count_zebu_modules(module_info_list, unit, module, sub_module):
+    """
+    Count modules on module_info_list matching unit/module/sub_module ("ALL" or pattern searched on "<unit>.<module>.<sub_module>").
+    """
+    module_count = 0
+
+    for modules in module_info_list:
+        if re.search(unit, modules) or unit == 'ALL':
+            if re.search(module, modules) or module == 'ALL':
+                if re.search(sub_module, modules) or sub_module == 'ALL':
+                    module_count += 1
+
+    return module_count
+
+
+class ZebuModuleCounter:
+    """
+    Module count on zebu_module_dic ({<date>: <module_info_list>}), counted once per record date and unit/module/sub_module.
+    The module list of a date is the one recorded on the latest record date not later than it (the first one for earlier dates).
+    """
+    def __init__(self, zebu_module_dic):
+        self.zebu_module_dic = zebu_module_dic or {}
+        self.date_list = sorted(self.zebu_module_dic.keys())
+        self.count_dic = {}
+
+    def get_record_count_list(self, unit, module, sub_module):
+        key = (unit, module, sub_module)
+
+        if key not in self.count_dic:
+            self.count_dic[key] = [count_zebu_modules(self.zebu_module_dic[date], unit, module, sub_module) for date in self.date_list]
+
+        return self.count_dic[key]
+
+    def get_count(self, date, unit, module, sub_module):
+        """
+        Get module count on date (YYYY-MM-DD).
+        """
+        if not self.date_list:
+            return 0
+
+        index = max(bisect.bisect_right(self.date_list, date) - 1, 0)
+
+        return self.get_record_count_list(unit, module, sub_module)[index]
+
+    def get_count_list(self, date_list, unit, module, sub_module):
+        return [self.get_count(date, unit, module, sub_module) for date in date_list]
+
+
+def parse_zebu_report_interval(sys_report_lines):
+    """
+    Parse sysreport lines "opendate,closedate,modulesList,user,pid,pc" once into job intervals, one item per (job, module):
+    interval_dic = {'start': <datetime64[s] array, NaT if no opendate>,
+                    'end': <datetime64[s] array, NaT if no closedate>,
+                    'module': <module code array>,
+                    'module_code_dic': {<unit.module.sub_module>: <module code>}}
+    """
+    start_list = []
+    end_list = []
+    module_list = []
+    module_code_dic = {}
+
+    for line in sys_report_lines:
+        if line:
+            value_list = line.split(',')
+
+            if len(value_list) != 6:
+                continue
+
+            for module_name in value_list[2].strip('()').split(' '):
+                module_name = module_name.strip()
+
+                if module_name:
+                    start_list.append(value_list[0].strip())
+                    end_list.append(value_list[1].strip())
+                    module_list.append(module_code_dic.setdefault(module_name, len(module_code_dic)))
+
+    return {'start': parse_datetime_array(start_list),
+            'end': parse_datetime_array(end_list),
+            'module': numpy.array(module_list, dtype=numpy.int64),
+            'module_code_dic': module_code_dic}
+
+
+def parse_datetime_array(time_list):
+    """
+    Switch "%Y-%m-%d %H:%M:%S" strings into datetime64[s] array, empty or invalid string is NaT.
+    """
+    try:
+        return numpy.array(time_list, dtype='datetime64[s]')
+    except ValueError:
+        time_array = numpy.empty(len(time_list), dtype='datetime64[s]')
+
+        for (i, time_string) in enumerate(time_list):
+            try:
+                time_array[i] = numpy.datetime64(time_string, 's')
+            except ValueError:
+                time_array[i] = numpy.datetime64('NaT')
+
+        return time_array
+
+
+def get_zebu_utilization(interval_dic, module_name_list, start_date, end_date, module_count_list, now=None):
+    """
+    Get daily utilization {<YYYY-MM-DD>: <utilization>} of modules on module_name_list from start_date to end_date.
+    Jobs are clipped to [start_date 00:00:00, end_date 23:59:59] (running jobs end at now), their occupied seconds are summed
+    per day, and divided by the module count of the day (module_count_list, one item per day). Utilization is capped at 1.
+    """
+    range_start = numpy.datetime64(str(start_date) + 'T00:00:00', 's')
+    range_end = numpy.datetime64(str(end_date) + 'T23:59:59', 's')
+    day_num = int((range_end - range_start) // numpy.timedelta64(DAY_SECONDS, 's')) + 1
+    day_list = [str(day) for day in numpy.arange(range_start.astype('datetime64[D]'), range_start.astype('datetime64[D]') + day_num)]
+    occupied_array = numpy.zeros(day_num + 1, dtype=numpy.float64)
+
+    module_code_list = [interval_dic['module_code_dic'][module_name] for module_name in module_name_list if module_name in interval_dic['module_code_dic']]
+    select_array = numpy.isin(interval_dic['module'], module_code_list)
+    start_array = interval_dic['start'][select_array]
+    end_array = interval_dic['end'][select_array]
+
+    if len(start_array):
+        now = numpy.datetime64(now or datetime.now().strftime('%Y-%m-%dT%H:%M:%S'), 's')
+
+        # Clip job intervals into the date range, as seconds since range start.
+        start_array = numpy.where(numpy.isnat(start_array) | (start_array < range_start), range_start, start_array)
+        end_array = numpy.minimum(numpy.where(numpy.isnat(end_array), now, end_array), range_end)
+        start_second_array = (start_array - range_start).astype(numpy.int64)
+        end_second_array = (end_array - range_start).astype(numpy.int64)
+        start_day_array = start_second_array // DAY_SECONDS
+        end_day_array = end_second_array // DAY_SECONDS
+
+        # Jobs ended before they start (on different days) occupy nothing.
+        valid_array = end_day_array >= start_day_array
+        start_second_array, end_second_array = start_second_array[valid_array], end_second_array[valid_array]
+        start_day_array, end_day_array = start_day_array[valid_array], end_day_array[valid_array]
+        same_day_array = start_day_array == end_day_array
+
+        # Same day jobs, end - start on the day.
+        occupied_array += numpy.bincount(start_day_array[same_day_array], weights=(end_second_array - start_second_array)[same_day_array], minlength=day_num + 1)[:day_num + 1]
+
+        # Cross day jobs, the rest of the first day, the beginning of the last day, and full days between them.
+        cross_day_array = ~same_day_array
+        first_day_array = start_day_array[cross_day_array]
+        last_day_array = end_day_array[cross_day_array]
+        occupied_array += numpy.bincount(first_day_array, weights=(first_day_array + 1) * DAY_SECONDS - start_second_array[cross_day_array], minlength=day_num + 1)[:day_num + 1]
+        occupied_array += numpy.bincount(last_day_array, weights=end_second_array[cross_day_array] - last_day_array * DAY_SECONDS, minlength=day_num + 1)[:day_num + 1]
+        full_day_delta_array = numpy.bincount(first_day_array + 1, minlength=day_num + 2)[:day_num + 1] - numpy.bincount(last_day_array, minlength=day_num + 1)[:day_num + 1]
+        occupied_array += numpy.cumsum(full_day_delta_array) * DAY_SECONDS
+
+    module_count_array = numpy.array(module_count_list, dtype=numpy.float64)
+    utilization_array = numpy.divide(occupied_array[:day_num] / DAY_SECONDS, module_count_array, out=numpy.zeros(day_num), where=module_count_array > 0)
+
+    return {day: min(float(utilization), 1) for (day, utilization) in zip(day_list, utilization_array)}
+
+
+def get_zebu_system_dir_dic():
+    """
+    Load config.zebu_system_dir_record {<YYYY-MM-DD>: <ZEBU_SYSTEM_DIR>}, return None if it is not available.
+    """
+    zebu_system_dir_record = getattr(config, 'zebu_system_dir_record', '')
+
+    if (not zebu_system_dir_record) or (not os.path.exists(zebu_system_dir_record)):
+        return None
+
+    with open(zebu_system_dir_record, 'r') as zf:
+        return yaml.load(zf, Loader=yaml.CLoader)
+
+
+def get_current_zebu_system_dir(zebu_system_dir_dic, today=None):
+    """
+    Get ZEBU_SYSTEM_DIR in use on today (the last record day before today), raise ValueError on invalid record day.
+    """
+    today = today or datetime.now()
+    zebu_system_dir = ''
+
+    for record_day in zebu_system_dir_dic:
+        if today > datetime.strptime(record_day, '%Y-%m-%d'):
+            zebu_system_dir = zebu_system_dir_dic[record_day]
+
+    if not zebu_system_dir:
+        zebu_system_dir = zebu_system_dir_dic[list(zebu_system_dir_dic.keys())[0]]
+
+    return zebu_system_dir
+
+
+def run_zebu_command(command, work_path=None, timeout=None):
+    """
+    Run zRscManager command under work_path (ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db is generated and removed on current directory),
+    the command and its children are killed after timeout seconds (config.zebu_command_timeout by default).
+    Return (return_code, stdout bytes).
+    """
+    timeout = int(timeout or getattr(config, 'zebu_command_timeout', ZEBU_COMMAND_TIMEOUT))
+    SP = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=work_path, start_new_session=True)
+
+    try:
+        (stdout, stderr) = SP.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        common_ssh.kill_process_group(SP)
+        (stdout, stderr) = SP.communicate()
+        logger.error('Command timeout after ' + str(timeout) + 's, killed: ' + str(command))
+
+    return SP.returncode, stdout
+
+
+def get_current_zebu_info(zebu_system_dir, work_path=None):
+    """
+    Run config.check_status_command for ZEBU_SYSTEM_DIR under work_path (the command generates and removes
+    ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db on current directory), return stripped output lines.
+    """
+    check_status_command = config.check_status_command.format_map({'ZEBU_SYSTEM_DIR': zebu_system_dir})
+    (return_code, stdout) = run_zebu_command(check_status_command, work_path=work_path)
+
+    return [line.strip() for line in str(stdout, 'utf-8', errors='replace').split('\n')]
+
+
+def load_zebu_module_dic():
+    """
+    Load module list records {<YYYY-MM-DD>: <module_info_list>} saved by record_module_info, return {} if not available.
+    """
+    db_file = str(config.db_path) + '/zebu_module_list.yaml'
+
+    try:
+        with open(db_file, 'r') as f:
+            return yaml.load(f, Loader=yaml.FullLoader) or {}
+    except Exception:
+        return {}
+
+
+def get_zebu_sample_path():
+    """
+    Zebu sysstat snapshots are saved by zebu_sample as <db_path>/zebu/sample/<year>/<month>/<day>/<time>,
+    the last one is also saved as <db_path>/zebu/sample/latest.
+    """
+    return os.path.join(str(config.db_path), 'zebu', 'sample')
+
+
+def read_zebu_sample(sample_path):
+    """
+    Read zebu snapshot, current_zebu_dic of parse_current_zebu_info with "sample_time" and "zebu_system_dir".
+    """
+    with open(sample_path, 'r') as SF:
+        return yaml.load(SF, Loader=yaml.CLoader)
+
+
+def read_latest_zebu_sample(max_age=None):
+    """
+    Read the latest zebu snapshot, return None if it is missing, broken, or older than max_age seconds.
+    """
+    latest_file = os.path.join(get_zebu_sample_path(), 'latest')
+
+    try:
+        if max_age and (time.time() - os.path.getmtime(latest_file) > max_age):
+            return None
+
+        return read_zebu_sample(latest_file)
+    except Exception:
+        return None
+
+
+def get_zebu_system_dir_name(zebu_system_dir):
+    """
+    File name of ZEBU_SYSTEM_DIR for local caches.
+    """
+    return re.sub(r'[^\w\.-]', '_', os.path.normpath(str(zebu_system_dir)).strip(os.sep)) or 'ZEBU_SYSTEM_DIR'
+
+
+def quote_sql_value(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def gen_zebu_report_filter_list(modules_column, user_column, unit='ALL', module='ALL', sub_module='ALL', user='ALL'):
+    """
+    Generate SQL conditions of unit/module/sub_module/user filters ("ALL" or empty for no filter) on sysreport rows.
+    Module condition matches "<unit>.<module>.<sub_module>" on modulesList with LIKE, it may select more rows than the
+    exact filter (which is done by parse_history_zebu_info/get_cost_info), but never less.
+    """
+    filter_list = []
+    module_item_list = [item if (item and (item != 'ALL')) else '%' for item in (unit, module, sub_module)]
+
+    if module_item_list != ['%', '%', '%']:
+        filter_list.append(str(modules_column) + ' LIKE ' + quote_sql_value('%' + '.'.join(module_item_list) + '%'))
+
+    if user and (user != 'ALL'):
+        filter_list.append(str(user_column) + '=' + quote_sql_value(user))
+
+    return filter_list
+
+
+def get_zebu_global_db_file(zebu_system_dir):
+    """
+    Get local ZEBU_GLOBAL_DB of ZEBU_SYSTEM_DIR, <db_path>/zebu/global_db/<ZEBU_SYSTEM_DIR>/ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db.
+    """
+    return os.path.join(str(config.db_path), 'zebu', 'global_db', get_zebu_system_dir_name(zebu_system_dir), ZEBU_GLOBAL_DB)
+
+
+def update_zebu_global_db(zebu_system_dir):
+    """
+    Generate ZEBU_GLOBAL_DB of ZEBU_SYSTEM_DIR with config.zebu_global_db_command, reuse it while ZEBU_SYSTEM_DIR mtime is unchanged.
+    Return ZEBU_GLOBAL_DB file, or '' if it is not available.
+    """
+    zebu_global_db_command = getattr(config, 'zebu_global_db_command', '')
+
+    if (not zebu_global_db_command) or (not os.path.isdir(str(zebu_system_dir))):
+        return ''
+
+    db_file = get_zebu_global_db_file(zebu_system_dir)
+    work_path = os.path.dirname(db_file)
+    mtime_file = db_file + '.mtime'
+    os.makedirs(work_path, exist_ok=True)
+
+    LF = common.lock_file(db_file + '.lock', exclusive=True)
+
+    try:
+        zebu_system_dir_mtime = str(os.stat(str(zebu_system_dir)).st_mtime_ns)
+
+        if os.path.exists(db_file) and os.path.exists(mtime_file):
+            with open(mtime_file, 'r') as MF:
+                if MF.read().strip() == zebu_system_dir_mtime:
+                    return db_file
+
+        for file_path in (db_file, mtime_file):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        command = zebu_global_db_command.format_map({'ZEBU_SYSTEM_DIR': zebu_system_dir})
+        (return_code, stdout) = run_zebu_command(command, work_path=work_path)
+
+        if return_code or (not os.path.exists(db_file)):
+            logger.warning('Failed on generating "' + str(db_file) + '" with command "' + str(command) + '", exit code ' + str(return_code) + '.')
+            return ''
+
+        with open(mtime_file, 'w') as MF:
+            MF.write(zebu_system_dir_mtime + '\n')
+    finally:
+        common.unlock_file(LF)
+
+    return db_file
+
+
+def read_zebu_global_db_report_lines(db_file, from_day, to_day, unit='ALL', module='ALL', sub_module='ALL', user='ALL'):
+    """
+    Read sysreport rows of the jobs opened on from_day-to_day (YYYY-MM-DD) from ZEBU_GLOBAL_DB (read-only), date/module/user
+    filters are done by SQL. Return lines "opendate,closedate,modulesList,user,pid,pc" as check_report_command output,
+    or None if the table could not be read, or its date format is not "YYYY-MM-DD HH:MM:SS" (the date range filter
+    would miss every row).
+    """
+    table_name = getattr(config, 'zebu_global_db_report_table', 'sysreport')
+    column_dic = dict(ZEBU_GLOBAL_DB_REPORT_COLUMN_DIC, **getattr(config, 'zebu_global_db_report_column_dic', {}))
+    column_list = [column_dic[field] for field in ZEBU_REPORT_FIELD_LIST]
+    (result, conn) = common_sqlite3.connect_db_file(db_file, mode='readonly')
+
+    if result != 'passed':
+        return None
+
+    try:
+        if table_name not in common_sqlite3.get_sql_table_list(db_file, conn):
+            logger.warning('Could not find table "' + str(table_name) + '" on "' + str(db_file) + '".')
+            return None
+
+        missing_column_list = [column for column in column_list if column not in common_sqlite3.get_sql_table_key_list(db_file, conn, table_name)]
+
+        if missing_column_list:
+            logger.warning('Could not find column "' + ' '.join(missing_column_list) + '" on table "' + str(table_name) + '" of "' + str(db_file) + '".')
+            return None
+
+        sample_data_dic = common_sqlite3.get_sql_table_data(db_file, conn, table_name, [column_dic['opendate'], ], 'WHERE ' + column_dic['opendate'] + ' IS NOT NULL LIMIT 1')
+        sample_opendate_list = sample_data_dic.get(column_dic['opendate'], [])
+
+        if sample_opendate_list and (not ZEBU_GLOBAL_DB_DATE_PATTERN.match(str(sample_opendate_list[0]))):
+            logger.warning('Unsupported ' + str(column_dic['opendate']) + ' format "' + str(sample_opendate_list[0]) + '" on table "' + str(table_name) + '" of "' + str(db_file) + '".')
+            return None
+
+        condition_list = [column_dic['opendate'] + '>=' + quote_sql_value(str(from_day) + ' 00:00:00'), column_dic['opendate'] + '<=' + quote_sql_value(str(to_day) + ' 23:59:59')]
+        condition_list.extend(gen_zebu_report_filter_list(column_dic['modules'], column_dic['user'], unit=unit, module=module, sub_module=sub_module, user=user))
+        select_condition = 'WHERE ' + ' AND '.join(condition_list) + ' ORDER BY ' + column_dic['opendate']
+        data_dic = common_sqlite3.get_sql_table_data(db_file, conn, table_name, column_list, select_condition)
+    finally:
+        conn.close()
+
+    return [','.join(['' if (value is None) else str(value) for value in value_list]) for value_list in zip(*[data_dic.get(column, []) for column in column_list])]
+
+
+def get_zebu_global_db_report_lines(zebu_system_dir, from_day, to_day, unit='ALL', module='ALL', sub_module='ALL', user='ALL'):
+    """
+    Get sysreport lines of ZEBU_SYSTEM_DIR from ZEBU_GLOBAL_DB directly, return None if it is not available
+    (config.zebu_global_db_command is not set, or generating/reading failed), so check_report_command output is used.
+    """
+    try:
+        db_file = update_zebu_global_db(zebu_system_dir)
+
+        if db_file:
+            return read_zebu_global_db_report_lines(db_file, from_day, to_day, unit=unit, module=module, sub_module=sub_module, user=user)
+    except Exception as error:
+        logger.warning('Failed on reading ' + str(ZEBU_GLOBAL_DB) + ' of "' + str(zebu_system_dir) + '": ' + str(error))
+
+    return None
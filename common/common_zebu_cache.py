@@ -0,0 +1,223 @@
+import os
+import re
+import sys
+import datetime
+import tempfile
+import concurrent.futures
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common, common_sqlite3, common_zebu
+from config import config
+
+logger = common.get_logger()
+
+# Local cache of zRscManager sysreport rows, one sqlite file per ZEBU_SYSTEM_DIR under zebu_report_cache_dir
+# (<db_path>/zebu/report by default).
+# report      : sysreport rows (opendate, closedate, modulesList, user, pid, pc), "day" is the opendate day.
+# fetched_day : finished days whose rows are all on report table.
+# Days not on fetched_day (include today) are fetched from zRscManager, and so are the days with open jobs (empty closedate),
+# so the jobs get their closedate once they finish.
+# Rows are read from ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db directly if config.zebu_global_db_command is set, check_report_command
+# output is parsed otherwise.
+ZEBU_REPORT_KEY_LIST = common_zebu.ZEBU_REPORT_FIELD_LIST
+
+# Fetch sysreport of up to zebu_report_jobs ZEBU_SYSTEM_DIRs at a time.
+ZEBU_REPORT_JOBS = 4
+
+
+def get_zebu_report_cache_file(zebu_system_dir):
+    """
+    Get sysreport cache file of specified ZEBU_SYSTEM_DIR.
+    """
+    cache_dir = getattr(config, 'zebu_report_cache_dir', '') or os.path.join(str(config.db_path), 'zebu', 'report')
+    return os.path.join(str(cache_dir), common_zebu.get_zebu_system_dir_name(zebu_system_dir) + '.db')
+
+
+def init_zebu_report_cache(db_file, orig_conn=''):
+    """
+    Create report/fetched_day tables and indexes if not exist.
+    """
+    report_init_string = "(day TEXT, opendate TEXT, closedate TEXT, modules TEXT, user TEXT, pid TEXT, pc TEXT, PRIMARY KEY (opendate, modules, user, pid, pc));"
+    fetched_day_init_string = "(day TEXT PRIMARY KEY);"
+
+    common_sqlite3.create_sql_table(db_file, orig_conn, 'report', report_init_string, commit=False)
+    common_sqlite3.create_sql_table(db_file, orig_conn, 'fetched_day', fetched_day_init_string, commit=False)
+    common_sqlite3.create_sql_index(db_file, orig_conn, 'report_day_index', 'report', ['day'], commit=False)
+
+
+def gen_day_list(from_day, to_day):
+    """
+    Get day list (YYYY-MM-DD) from from_day to to_day.
+    """
+    from_date = datetime.datetime.strptime(str(from_day), '%Y-%m-%d').date()
+    to_date = datetime.datetime.strptime(str(to_day), '%Y-%m-%d').date()
+
+    return [(from_date + datetime.timedelta(days=i)).strftime('%Y-%m-%d') for i in range((to_date - from_date).days + 1)]
+
+
+def gen_day_range_list(day_list):
+    """
+    Merge days into continuous (first_day, last_day) ranges, so one sysreport command fetches one range.
+    """
+    day_range_list = []
+
+    for day in sorted(day_list):
+        if day_range_list and ((datetime.datetime.strptime(day, '%Y-%m-%d') - datetime.datetime.strptime(day_range_list[-1][1], '%Y-%m-%d')).days == 1):
+            day_range_list[-1][1] = day
+        else:
+            day_range_list.append([day, day])
+
+    return [tuple(day_range) for day_range in day_range_list]
+
+
+def gen_zebu_report_command(zebu_system_dir, from_day, to_day):
+    """
+    Generate config.check_report_command for ZEBU_SYSTEM_DIR and day range (YYYY-MM-DD).
+    """
+    var_dic = {'ZEBU_SYSTEM_DIR': zebu_system_dir, 'FROMDATE': str(from_day).replace('-', '/'), 'TODATE': str(to_day).replace('-', '/')}
+
+    return config.check_report_command.format_map(var_dic)
+
+
+def split_zebu_report_line(line):
+    """
+    Split sysreport line "opendate,closedate,modulesList,user,pid,pc" into value list, return None for invalid line.
+    """
+    value_list = line.split(',')
+
+    if len(value_list) != len(ZEBU_REPORT_KEY_LIST):
+        return None
+
+    return value_list
+
+
+def get_report_day(opendate, default_day):
+    """
+    Rows are cached on opendate day, the rows without opendate are cached on the first day of the fetched range.
+    """
+    if my_match := re.match(r'^\s*(\d{4})[-/](\d{2})[-/](\d{2})', opendate):
+        return my_match.group(1) + '-' + my_match.group(2) + '-' + my_match.group(3)
+
+    return default_day
+
+
+def fetch_zebu_report_lines(zebu_system_dir, from_day, to_day, unit='ALL', module='ALL', sub_module='ALL', user='ALL'):
+    """
+    Get sysreport lines for day range from ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db (filters are done by SQL),
+    or run sysreport command if it is not available, return (return_code, line list).
+    """
+    line_list = common_zebu.get_zebu_global_db_report_lines(zebu_system_dir, from_day, to_day, unit=unit, module=module, sub_module=sub_module, user=user)
+
+    if line_list is not None:
+        return 0, line_list
+
+    command = gen_zebu_report_command(zebu_system_dir, from_day, to_day)
+
+    # The command removes ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db on current directory, run every command on its own directory.
+    with tempfile.TemporaryDirectory(prefix='zebu_report.') as work_path:
+        (return_code, stdout) = common_zebu.run_zebu_command(command, work_path=work_path)
+
+    return return_code, [line for line in str(stdout, 'utf-8', errors='replace').split('\n') if line]
+
+
+def update_zebu_report_cache(zebu_system_dir, from_day, to_day, db_file=None):
+    """
+    Fetch the days not cached yet (and the days with open jobs, and today) on from_day-to_day into cache.
+    Return False if the cache could not be updated.
+    """
+    db_file = db_file or get_zebu_report_cache_file(zebu_system_dir)
+    today = datetime.date.today().strftime('%Y-%m-%d')
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+
+    # One fetcher per cache, the others wait and find the days cached.
+    LF = common.lock_file(db_file + '.lock', exclusive=True)
+
+    try:
+        (result, conn) = common_sqlite3.connect_db_file(db_file, mode='write')
+
+        if result != 'passed':
+            return False
+
+        init_zebu_report_cache(db_file, conn)
+
+        day_condition = "WHERE day>='" + str(from_day) + "' AND day<='" + str(to_day) + "'"
+        fetched_day_set = set(common_sqlite3.get_sql_table_data(db_file, conn, 'fetched_day', ['day'], day_condition).get('day', []))
+        open_day_set = set(common_sqlite3.get_sql_table_data(db_file, conn, 'report', ['day'], day_condition + " AND closedate=''").get('day', []))
+        fetch_day_list = [day for day in gen_day_list(from_day, to_day) if (day not in fetched_day_set) or (day in open_day_set) or (day >= today)]
+
+        for (first_day, last_day) in gen_day_range_list(fetch_day_list):
+            logger.info('Fetching zebu sysreport of "' + str(zebu_system_dir) + '" from ' + str(first_day) + ' to ' + str(last_day) + ' ...')
+            (return_code, line_list) = fetch_zebu_report_lines(zebu_system_dir, first_day, last_day)
+
+            if return_code:
+                logger.warning('Failed on fetching zebu sysreport of "' + str(zebu_system_dir) + '" from ' + str(first_day) + ' to ' + str(last_day) + ', exit code ' + str(return_code) + '.')
+                continue
+
+            value_list = []
+
+            for line in line_list:
+                if report_value_list := split_zebu_report_line(line):
+                    value_list.append(tuple([get_report_day(report_value_list[0], first_day)] + report_value_list))
+
+            # Replace the rows of fetched days, finished days are complete.
+            common_sqlite3.delete_sql_table_data(db_file, conn, 'report', "day>='" + str(first_day) + "' AND day<='" + str(last_day) + "'", commit=False)
+            common_sqlite3.insert_many_into_sql_table(db_file, conn, 'report', value_list, commit=False, replace=True)
+            common_sqlite3.insert_many_into_sql_table(db_file, conn, 'fetched_day', [(day, ) for day in gen_day_list(first_day, last_day) if day < today], commit=False, replace=True)
+            conn.commit()
+
+        conn.close()
+    finally:
+        common.unlock_file(LF)
+
+    return True
+
+
+def get_zebu_report_lines(zebu_system_dir, from_day, to_day, unit='ALL', module='ALL', sub_module='ALL', user='ALL'):
+    """
+    Get sysreport lines "opendate,closedate,modulesList,user,pid,pc" of the jobs opened on from_day-to_day (YYYY-MM-DD) from cache,
+    the same lines as config.check_report_command output. unit/module/sub_module/user filters are done by SQL, they may
+    select more rows than the exact filter.
+    Fetch the lines directly if the cache is not available.
+    """
+    db_file = get_zebu_report_cache_file(zebu_system_dir)
+
+    try:
+        cache_ok = update_zebu_report_cache(zebu_system_dir, from_day, to_day, db_file=db_file)
+    except Exception as error:
+        logger.warning('Failed on updating zebu sysreport cache "' + str(db_file) + '": ' + str(error))
+        cache_ok = False
+
+    if not cache_ok:
+        return fetch_zebu_report_lines(zebu_system_dir, from_day, to_day, unit=unit, module=module, sub_module=sub_module, user=user)[1]
+
+    condition_list = ["day>='" + str(from_day) + "'", "day<='" + str(to_day) + "'"] + common_zebu.gen_zebu_report_filter_list('modules', 'user', unit=unit, module=module, sub_module=sub_module, user=user)
+    select_condition = 'WHERE ' + ' AND '.join(condition_list) + ' ORDER BY day, opendate'
+    data_dic = common_sqlite3.get_sql_table_data(db_file, '', 'report', ZEBU_REPORT_KEY_LIST, select_condition)
+
+    return [','.join(value_list) for value_list in zip(*[data_dic.get(key, []) for key in ZEBU_REPORT_KEY_LIST])]
+
+
+def get_multi_zebu_report_lines(zebu_system_dir_list, from_day, to_day, unit='ALL', module='ALL', sub_module='ALL', user='ALL', jobs=None):
+    """
+    Get sysreport lines of all ZEBU_SYSTEM_DIRs with get_zebu_report_lines concurrently (config.zebu_report_jobs at a time),
+    merged on opendate order. A failed ZEBU_SYSTEM_DIR only loses its own lines.
+    """
+    jobs = int(jobs or getattr(config, 'zebu_report_jobs', ZEBU_REPORT_JOBS))
+    zebu_system_dir_list = list(dict.fromkeys(zebu_system_dir_list))
+    line_list = []
+
+    if not zebu_system_dir_list:
+        return line_list
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(jobs, len(zebu_system_dir_list)))) as executor:
+        future_list = [executor.submit(get_zebu_report_lines, zebu_system_dir, from_day, to_day, unit=unit, module=module, sub_module=sub_module, user=user) for zebu_system_dir in zebu_system_dir_list]
+
+        for (zebu_system_dir, future) in zip(zebu_system_dir_list, future_list):
+            try:
+                line_list.extend(future.result())
+            except Exception as error:
+                logger.warning('Failed on getting zebu sysreport of "' + str(zebu_system_dir) + '": ' + str(error))
+
+    line_list.sort(key=lambda line: line.split(',', 1)[0])
+
+    return line_list
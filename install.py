@@ -34,7 +34,7 @@ def gen_shell_tools():
     """
     Generate shell scripts under <EMU_MONITOR_INSTALL_PATH>/tools.
     """
-    tool_list = ['bin/palladium_monitor', 'bin/psample', 'bin/zebu_monitor', 'bin/protium_sample', 'bin/protium_monitor', 'tools/patch']
+    tool_list = ['bin/palladium_monitor', 'bin/psample', 'bin/zebu_monitor', 'bin/zebu_sample', 'bin/protium_sample', 'bin/protium_monitor', 'tools/patch', 'tools/gen_utilization_series']
 
     for tool_name in tool_list:
         tool = str(CWD) + '/' + str(tool_name)
@@ -89,6 +89,17 @@ def gen_config_file():
                 CF.write('''# Specify the database directory.
 db_path = "''' + str(db_path) + '''"
 
+# Specify sample interval (seconds) and max random jitter (seconds) for "psample --daemon", hardware config "sample_interval" overrides it.
+sample_interval = 7200
+sample_jitter = 60
+
+# Remote test_server/ptmRun commands share one ssh master connection per host (OpenSSH ControlMaster), kept for ssh_control_persist seconds.
+# ssh_timeout is remote command timeout (seconds), ssh_max_sessions is max concurrent ssh sessions per host.
+ssh_command = "ssh"
+ssh_control_persist = 600
+ssh_timeout = 120
+ssh_max_sessions = 4
+
 ######## For Palladium ########
 # Enable "others" project on COST tab, so cost can always be shared.
 palladium_enable_cost_others_project = True
@@ -96,6 +107,39 @@ palladium_enable_cost_others_project = True
 # Use default cost rate for no-use emu
 palladium_enable_use_default_cost_rate = True
 
+# Specify palladium sample store, "yaml" (one yaml file per sample), "sqlite" (<db_path>/<hardware>/sample.db)
+# or "delta" (<db_path>/<hardware>/<emulator>/<YYYY>/<MM>/<DD>.delta, daily keyframe + changed domains per sample).
+palladium_sample_store = "yaml"
+
+# For "delta" palladium sample store, save a full keyframe instead of a delta if more than this proportion of domains changed.
+palladium_delta_keyframe_ratio = 0.5
+
+# Compression of "psample --pack" day archives, "gzip" or "lzma".
+palladium_pack_compression = "gzip"
+
+# Retention policy of "psample --retention" and "protium_sample --retention" (days).
+# Keep every sample for <raw_days>, then one rollup per hour until <hourly_days>, then one rollup per day.
+# raw_days 0 disables retention (keep every sample forever), hourly_days 0 keeps hourly rollups forever.
+palladium_retention_raw_days = 0
+palladium_retention_hourly_days = 0
+protium_retention_raw_days = 0
+protium_retention_hourly_days = 0
+
+# Sample metrics (time of every sampling phase, lines/domains/bytes), written by psample and protium_sample.
+# Prometheus textfile for node_exporter textfile collector is written into metrics_textfile_dir if it is specified.
+metrics_textfile_dir = ""
+# Rolling json lines log, <db_path>/.metrics/sample.jsonl if metrics_log_file is empty, 0 max size disables it.
+metrics_log_file = ""
+metrics_log_max_size = 10485760
+
+# Compact palladium detail journal into month utilization/cost files when the journal is bigger than this size (bytes).
+palladium_detail_journal_compact_size = 1048576
+
+# Append one record per sample into <emulator>/cost.ledger, and compact it into <emulator>/cost daily totals when the ledger is bigger than palladium_cost_ledger_compact_size (bytes).
+# Set palladium_enable_cost_ledger to False to compact cost file on every sample.
+palladium_enable_cost_ledger = True
+palladium_cost_ledger_compact_size = 65536
+
 
 ######## For Zebu ########
 # Specify zRscManager path for Zebu.
@@ -113,6 +157,29 @@ check_status_command = zRscManager + \" -nc -sysstat \" + ZEBU_SYSTEM_DIR + \" -
 # Specify check report command.
 check_report_command = zRscManager + \" -nc -sysreport \" + ZEBU_SYSTEM_DIR + \" -from FROMDATE -to TODATE -noheader -fields 'opendate, closedate, modulesList, user, pid, pc' -nofilter ; rm ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db\"
 
+# Specify zebu sysreport cache directory, one sqlite cache per ZEBU_SYSTEM_DIR, default is <db_path>/zebu/report.
+zebu_report_cache_dir = ""
+
+# Fetch sysreport of up to zebu_report_jobs ZEBU_SYSTEM_DIRs concurrently, zRscManager commands are killed after zebu_command_timeout seconds.
+zebu_report_jobs = 4
+zebu_command_timeout = 300
+
+# Read sysreport rows from ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db directly instead of parsing check_report_command output.
+# zebu_global_db_command generates the database (without removing it) under <db_path>/zebu/global_db/<ZEBU_SYSTEM_DIR>,
+# it is regenerated only when ZEBU_SYSTEM_DIR mtime changes. Leave it empty to parse check_report_command output.
+# For example: zebu_global_db_command = zRscManager + \" -nc -sysstat \" + ZEBU_SYSTEM_DIR
+zebu_global_db_command = ""
+
+# Sysreport table on ZEBU_GLOBAL_SYSTEM_DIR_global_mngt.db, and its columns of opendate/closedate/modules/user/pid/pc.
+zebu_global_db_report_table = "sysreport"
+zebu_global_db_report_column_dic = {'opendate': 'opendate', 'closedate': 'closedate', 'modules': 'modulesList', 'user': 'user', 'pid': 'pid', 'pc': 'pc'}
+
+# zebu_sample snapshots sysstat into <db_path>/zebu/sample every zebu_sample_interval seconds (with --loop).
+zebu_sample_interval = 300
+
+# zebuMonitor CURRENT tab shows the latest zebu_sample snapshot if it is not older than zebu_sample_max_age seconds, runs check_status_command otherwise, 0 disables snapshots.
+zebu_sample_max_age = 600
+
 # Specify which are the primary factors when getting project information, it could be one or serveral items between "user/execute_host/submit_host".
 zebu_project_primary_factors = "user  execute_host"
 
@@ -127,6 +194,14 @@ zebu_enable_use_default_cost_rate = True
 # Check protium information tcl file
 ptmRun_check_info_file = "''' + str(tool_path) + '''/check.info.tcl"
 
+# Split PTM_SYS_IP_LIST into shards of this many systems and run ptmRun for the shards concurrently, 0 means no shard.
+# Hardware config ptmRun_shard_size overrides it.
+protium_shard_size = 0
+
+# Max concurrent ptmRun shards, and timeout (seconds) of every shard.
+protium_shard_jobs = 8
+protium_shard_timeout = 600
+
 # Enable "others" project on COST tab, so cost can always be shared.
 protium_enable_cost_others_project = True
 
@@ -294,6 +369,9 @@ test_server = ""
 # Specify test_server execute hosts for Palladium hardware, make sure you can ssh the host without password.
 test_server_host = ""
 
+# Specify sample interval (seconds) for "psample --daemon", default is config.sample_interval.
+# sample_interval = 300
+
 # Specify which are the primary factors when getting project information, it could be one or serveral items between "user/execute_host/submit_host".
 project_primary_factors = "user  execute_host"
     ''')
@@ -326,6 +404,12 @@ ptmRun = ""
 # Specify ptmRun bsub command, example "bsub -q normal -Is". if "", run "ptmRun" locally rather than using LSF scheduler
 ptmRun_bsub_command = ""
 
+# Specify system number per concurrent ptmRun shard, default is config.protium_shard_size.
+# ptmRun_shard_size = 50
+
+# Specify sample interval (seconds) for "psample --daemon", default is config.sample_interval.
+# sample_interval = 300
+
 # Specify which are the primary factors when getting project information, it could be one or serveral items between "user/execute_host/submit_host".
 project_primary_factors = "user  execute_host"
         ''')
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+################################
+# File Name   : bench_parse_protium_sys_info.py
+# Description : This script is used for benchmarking common_protium.parse_protium_sys_info
+#               with synthetic ptmRun check info outputs, against the legacy line parser.
+################################
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common_protium
+
+os.environ['PYTHONUNBUFFERED'] = '1'
+
+
+def read_args():
+    """
+    Read in arguments.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-b', '--board_num',
+                        nargs='+',
+                        type=int,
+                        default=[200, 2000],
+                        help='Specify board number of synthetic ptmRun output, default is "200 2000".')
+    parser.add_argument('-f', '--fpga_num',
+                        type=int,
+                        default=4,
+                        help='Specify FPGA number per board, default is 4.')
+    parser.add_argument('-r', '--repeat',
+                        type=int,
+                        default=3,
+                        help='Repeat every parse this many times and report the best one, default is 3.')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def gen_protium_sys_info(board_num, fpga_num, seed=0):
+    """
+    Generate synthetic ptmRun check info output (raw bytes) with board_num boards and fpga_num FPGAs per board.
+    """
+    my_random = random.Random(seed)
+    user_list = ['user' + str(i) for i in range(100)]
+    line_list = ['ptmRun check info', '']
+
+    for board in range(board_num):
+        system = 'X' + str(board // 16)
+        line_list.append('System: ' + system)
+        line_list.append(system + '  chassis' + str(board % 16) + '  ' + str(100000 + board) + '  10.' + str(board // 256) + '.' + str(board % 256) + '.1  (' + system + '_board' + str(board) + ')  (' + str(board) + ')  status ready')
+
+        for fpga in range(fpga_num):
+            fpga_id = chr(ord('A') + fpga // 2) + str(fpga % 2)
+
+            if my_random.random() < 0.3:
+                line_list.append('    FPGA ' + fpga_id + '  |  ')
+            else:
+                line_list.append('    FPGA ' + fpga_id + '  |  ' + my_random.choice(user_list) + ':host' + str(my_random.randint(1, 300)) + ':' + str(my_random.randint(1000, 99999)) + '  @  2026-10-17_' + '%02d:%02d:%02d' % (my_random.randint(0, 23), my_random.randint(0, 59), my_random.randint(0, 59)))
+
+        line_list.append('')
+
+    return ('\n'.join(line_list) + '\n').encode('utf-8')
+
+
+def legacy_parse_protium_sys_info(stdout):
+    """
+    Legacy stripped line splitting + parse_protium_sys_info before the bulk parser rewrite, for comparison.
+    """
+    protium_sys_info_list = []
+    board_uuid = None
+    protium_board_info_dic = {}
+
+    for line in str(stdout, 'utf-8').split('\n'):
+        protium_sys_info_list.append(line.strip())
+
+    for line in protium_sys_info_list:
+        if my_match := re.match(r'^\S+\s+\S+\s+(\d+)\s+([\d+\.]+)\s+\(\S+\)\s+\((\d+)\).*$', line):
+            board_uuid = my_match.group(1)
+
+            protium_board_info_dic.setdefault(board_uuid, {})
+            protium_board_info_dic[board_uuid]['board_uuid'] = board_uuid
+            protium_board_info_dic[board_uuid]['board_id'] = my_match.group(3)
+            protium_board_info_dic[board_uuid]['board_ip'] = my_match.group(2)
+            protium_board_info_dic[board_uuid]['used_record'] = []
+        elif my_match := re.match(r'^\s*FPGA\s+(\S+)\s+\|\s*$', line):
+            if not board_uuid or board_uuid not in protium_board_info_dic:
+                continue
+
+            record_dic = {
+                'FPGA': my_match.group(1),
+                'user': '--',
+                'host': '--',
+                'pid': '--',
+                'started_time': '--'
+            }
+            protium_board_info_dic[board_uuid]['used_record'].append(record_dic)
+        elif my_match := re.match(r'^\s*FPGA\s+(\S+)\s+\|\s+(\S+):(\S+):(\S+)\s+@\s+(\S+)\s*$', line):
+            if not board_uuid or board_uuid not in protium_board_info_dic:
+                continue
+
+            record_dic = {
+                'FPGA': my_match.group(1),
+                'user': my_match.group(2),
+                'host': my_match.group(3),
+                'pid': my_match.group(4),
+                'started_time': my_match.group(5)
+            }
+            protium_board_info_dic[board_uuid]['used_record'].append(record_dic)
+
+    return protium_board_info_dic
+
+
+def time_parser(parser, stdout, repeat):
+    """
+    Run parser repeat times, return (best seconds, protium_board_info_dic).
+    """
+    best_time = None
+    protium_board_info_dic = {}
+
+    for i in range(max(1, repeat)):
+        start_time = time.perf_counter()
+        protium_board_info_dic = parser(stdout)
+        cost_time = time.perf_counter() - start_time
+        best_time = cost_time if (best_time is None) else min(best_time, cost_time)
+
+    return best_time, protium_board_info_dic
+
+
+def main():
+    args = read_args()
+
+    print('%-8s %-6s %-10s %-12s %-16s %-16s %-8s %s' % ('BOARDS', 'FPGAS', 'LINES', 'BYTES', 'LEGACY(lines/s)', 'CURRENT(lines/s)', 'SPEEDUP', 'SAME'))
+
+    for board_num in args.board_num:
+        stdout = gen_protium_sys_info(board_num, args.fpga_num)
+        line_num = stdout.count(b'\n')
+        (legacy_time, legacy_dic) = time_parser(legacy_parse_protium_sys_info, stdout, args.repeat)
+        (current_time, current_dic) = time_parser(lambda x: common_protium.parse_protium_sys_info(memoryview(x)), stdout, args.repeat)
+
+        print('%-8d %-6d %-10d %-12d %-16d %-16d %-8s %s' % (board_num, args.fpga_num, line_num, len(stdout), line_num / legacy_time, line_num / current_time, str(round(legacy_time / current_time, 1)) + 'x', legacy_dic == current_dic))
+
+
+if __name__ == '__main__':
+    main()
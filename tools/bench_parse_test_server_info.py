@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+################################
+# File Name   : bench_parse_test_server_info.py
+# Description : This script is used for benchmarking common_palladium.parse_test_server_info
+#               with synthetic Z1/Z2 style test_server outputs, against the legacy parser.
+################################
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common_palladium
+
+os.environ['PYTHONUNBUFFERED'] = '1'
+
+# Synthetic topology, (cluster number per rack, logic drawer number per cluster, domain number per logic drawer).
+STYLE_DIC = {'Z1': (4, 4, 8),
+             'Z2': (8, 6, 16)}
+
+
+def read_args():
+    """
+    Read in arguments.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-s', '--style',
+                        nargs='+',
+                        default=['Z1', 'Z2'],
+                        choices=list(STYLE_DIC.keys()),
+                        help='Specify synthetic test_server output style, default is "Z1 Z2".')
+    parser.add_argument('-n', '--domain_num',
+                        nargs='+',
+                        type=int,
+                        default=[1000, 10000, 100000],
+                        help='Specify domain line number of synthetic test_server output, default is "1000 10000 100000".')
+    parser.add_argument('-r', '--repeat',
+                        type=int,
+                        default=3,
+                        help='Repeat every parse this many times and report the best one, default is 3.')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def gen_test_server_info(style, domain_num, seed=0):
+    """
+    Generate synthetic test_server output lines with domain_num domain lines.
+    """
+    (cluster_num, logic_drawer_num, domain_per_drawer_num) = STYLE_DIC[style]
+    my_random = random.Random(seed)
+    user_list = ['NONE', ] * 4 + ['user' + str(i) for i in range(200)]
+    line_list = ['Emulator: emu_' + str(style).lower() + '  Hardware: ' + str(style) + '  Configmgr: configmgr  Status: ONLINE', ]
+    line_num = 0
+    rack = 0
+
+    while line_num < domain_num:
+        line_list.append('Rack ' + str(rack) + ' has ' + str(cluster_num) + ' clusters')
+
+        for cluster in range(rack * cluster_num, (rack + 1) * cluster_num):
+            line_list.append('Cluster ' + str(cluster) + ' has ' + str(logic_drawer_num) + ' logic drawers  CCD: OK')
+
+            for logic_drawer in range(logic_drawer_num):
+                line_list.append('  Logic drawer ' + str(logic_drawer) + ' has ' + str(domain_per_drawer_num) + ' domains  Logic drawer: OK')
+
+                for domain in range(domain_per_drawer_num):
+                    if line_num >= domain_num:
+                        break
+
+                    owner = my_random.choice(user_list)
+
+                    if owner == 'NONE':
+                        line_list.append('  ' + str(logic_drawer) + '.' + str(domain) + '  NONE  --  -- --  --  --  --')
+                    else:
+                        pid = 'host' + str(my_random.randint(1, 500)) + ':' + str(my_random.randint(1000, 99999))
+                        tpod = 'tpod' + str(my_random.randint(1, 50)) + ' --'
+                        design = 'design' + str(my_random.randint(1, 300))
+                        line_list.append('  ' + str(logic_drawer) + '.' + str(domain) + '  ' + owner + '  ' + pid + '  ' + tpod + '  ' + design + '  ' + str(my_random.randint(0, 99)) + ':00:00  --')
+
+                    line_num += 1
+
+        rack += 1
+
+    return line_list
+
+
+def time_parser(parser, line_list, repeat):
+    """
+    Run parser repeat times, return (best seconds, palladium_dic).
+    """
+    best_time = None
+    palladium_dic = {}
+
+    for i in range(max(1, repeat)):
+        start_time = time.perf_counter()
+        palladium_dic = parser(line_list)
+        cost_time = time.perf_counter() - start_time
+        best_time = cost_time if (best_time is None) else min(best_time, cost_time)
+
+    return best_time, palladium_dic
+
+
+def legacy_parse_test_server_info(test_server_info):
+    """
+    parse_test_server_info before the leading character dispatch rewrite, for comparison.
+    """
+    palladium_dic = {}
+
+    emulator_compile = re.compile(r'^\s*Emulator:\s*(.+?)\s* Hardware:\s*(.+?)\s* Configmgr:\s*(.+?)\s* Status:\s*(.+?)\s*$')
+    rack_clusters_compile = re.compile(r'^\s*Rack\s*(\d+)\s*has\s*(\d+)\s*clusters\s*$')
+    cluster_drawers_compile = re.compile(r'^Cluster\s*(\d+)\s*has\s*(\d+)\s*logic drawers\s+CCD:\s*(.+?)\s*$')
+    drawer_domains_compile = re.compile(r'^\s*Logic drawer\s*(\d+)\s*has\s*(\d+)\s*domains\s+Logic drawer:\s*(.+?)\s*$')
+    domain_compile = re.compile(r'^\s*(\d+\.\d+)\s+(\S+)\s+(\S+)\s+(\S+\s+\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s*$')
+
+    current_rack = 0
+    current_cluster = 0
+    current_logic_drawer = 0
+
+    owner_list = []
+
+    for line in test_server_info:
+        if emulator_compile.match(line):
+            my_match = emulator_compile.match(line)
+            emulator = my_match.group(1)
+            hardware = my_match.group(2)
+            emulator_status = my_match.group(4)
+            palladium_dic = {'emulator': emulator,
+                             'hardware': hardware,
+                             'emulator_status': emulator_status,
+                             'utilization': 0,
+                             'domain_line_num': 0,
+                             'rack_list': [],
+                             'cluster_list': [],
+                             'logic_drawer_list': [],
+                             'domain_list': [],
+                             'owner_list': [],
+                             'pid_list': [],
+                             'tpod_list': [],
+                             'design_list': [],
+                             'rack': {}}
+        elif rack_clusters_compile.match(line):
+            my_match = rack_clusters_compile.match(line)
+            rack = my_match.group(1)
+            current_rack = rack
+            palladium_dic['rack'].setdefault(rack, {'cluster': {}})
+
+            if rack not in palladium_dic['rack_list']:
+                palladium_dic['rack_list'].append(rack)
+        elif cluster_drawers_compile.match(line):
+            my_match = cluster_drawers_compile.match(line)
+            cluster = my_match.group(1)
+            current_cluster = cluster
+            ccd_status = my_match.group(3)
+            palladium_dic['rack'][current_rack]['cluster'].setdefault(cluster, {'ccd_status': ccd_status, 'logic_drawer': {}})
+
+            if cluster not in palladium_dic['cluster_list']:
+                palladium_dic['cluster_list'].append(cluster)
+        elif drawer_domains_compile.match(line):
+            my_match = drawer_domains_compile.match(line)
+            logic_drawer = my_match.group(1)
+            current_logic_drawer = logic_drawer
+            logic_drawer_status = my_match.group(3)
+            palladium_dic['rack'][current_rack]['cluster'][current_cluster]['logic_drawer'].setdefault(logic_drawer, {'logic_drawer_status': logic_drawer_status, 'domain': {}})
+
+            if logic_drawer not in palladium_dic['logic_drawer_list']:
+                palladium_dic['logic_drawer_list'].append(logic_drawer)
+        elif domain_compile.match(line):
+            my_match = domain_compile.match(line)
+            domain = my_match.group(1)
+            owner = my_match.group(2)
+            owner_list.append(owner)
+            pid = my_match.group(3)
+            tpod = my_match.group(4)
+            design = my_match.group(5)
+            elaptime = my_match.group(6)
+            reservedkey = my_match.group(7)
+            palladium_dic['domain_line_num'] += 1
+
+            palladium_dic['rack'][current_rack]['cluster'][current_cluster]['logic_drawer'][current_logic_drawer]['domain'].setdefault(domain, {'owner': owner,
+                                                                                                                                                'pid': pid,
+                                                                                                                                                'tpod': tpod,
+                                                                                                                                                'design': design,
+                                                                                                                                                'elaptime': elaptime,
+                                                                                                                                                'reservedkey': reservedkey})
+
+            if domain not in palladium_dic['domain_list']:
+                palladium_dic['domain_list'].append(domain)
+
+            if owner not in palladium_dic['owner_list']:
+                palladium_dic['owner_list'].append(owner)
+
+            if pid not in palladium_dic['pid_list']:
+                palladium_dic['pid_list'].append(pid)
+
+            if tpod not in palladium_dic['tpod_list']:
+                palladium_dic['tpod_list'].append(tpod)
+
+            if design not in palladium_dic['design_list']:
+                palladium_dic['design_list'].append(design)
+
+    if owner_list:
+        utilization = round(1-owner_list.count('NONE')/len(owner_list), 2)
+        palladium_dic['utilization'] = utilization
+
+    return palladium_dic
+
+
+def main():
+    args = read_args()
+
+    print('%-6s %-10s %-10s %-16s %-16s %-8s %s' % ('STYLE', 'DOMAINS', 'LINES', 'LEGACY(lines/s)', 'CURRENT(lines/s)', 'SPEEDUP', 'SAME'))
+
+    for style in args.style:
+        for domain_num in args.domain_num:
+            line_list = gen_test_server_info(style, domain_num)
+            (legacy_time, legacy_dic) = time_parser(legacy_parse_test_server_info, line_list, args.repeat)
+            (current_time, current_dic) = time_parser(common_palladium.parse_test_server_info, line_list, args.repeat)
+
+            print('%-6s %-10d %-10d %-16d %-16d %-8s %s' % (style, domain_num, len(line_list), len(line_list) / legacy_time, len(line_list) / current_time, str(round(legacy_time / current_time, 1)) + 'x', legacy_dic == current_dic))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+################################
+# File Name   : bench_zebu_utilization.py
+# Description : This script is used for benchmarking common_zebu.get_zebu_utilization (zebu_monitor utilization tab)
+#               with synthetic zRscManager sysreport outputs, against the legacy day by day calculation.
+################################
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common_zebu
+
+os.environ['PYTHONUNBUFFERED'] = '1'
+
+
+def read_args():
+    """
+    Read in arguments.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-d', '--days',
+                        type=int,
+                        default=365,
+                        help='Specify queried day number, default is 365.')
+    parser.add_argument('-j', '--job_num',
+                        nargs='+',
+                        type=int,
+                        default=[2000, 20000],
+                        help='Specify job (sysreport line) number of synthetic sysreport output, default is "2000 20000".')
+    parser.add_argument('-m', '--module_num',
+                        type=int,
+                        default=64,
+                        help='Specify module number of synthetic zebu system, default is 64.')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def gen_module_info_list(module_num):
+    return ['U' + str(i // 16) + '.M' + str((i // 4) % 4) + '.F' + str(i % 4) for i in range(module_num)]
+
+
+def gen_zebu_module_dic(module_info_list, start_date):
+    """
+    Module list records, some modules are added later.
+    """
+    return {(start_date - timedelta(days=120)).strftime('%Y-%m-%d'): module_info_list[:len(module_info_list) // 2],
+            (start_date + timedelta(days=60)).strftime('%Y-%m-%d'): module_info_list}
+
+
+def gen_sys_report_lines(module_info_list, start_date, end_date, job_num, seed=0):
+    """
+    Generate synthetic sysreport lines "opendate,closedate,modulesList,user,pid,pc", jobs opened since 90 days before start_date.
+    """
+    my_random = random.Random(seed)
+    begin_time = start_date - timedelta(days=90)
+    total_seconds = int((end_date + timedelta(days=1) - begin_time).total_seconds())
+    line_list = []
+
+    for i in range(job_num):
+        open_time = begin_time + timedelta(seconds=my_random.randint(0, total_seconds - 1))
+        close_time = open_time + timedelta(seconds=my_random.randint(60, 5 * 86400))
+        modules = ' '.join(my_random.sample(module_info_list, my_random.randint(1, 4)))
+        close_string = '' if (close_time > datetime.now()) or (my_random.random() < 0.01) else close_time.strftime('%Y-%m-%d %H:%M:%S')
+        line_list.append(open_time.strftime('%Y-%m-%d %H:%M:%S') + ',' + close_string + ',(' + modules + '),user' + str(my_random.randint(1, 50)) + ',' + str(10000 + i) + ',host' + str(my_random.randint(1, 20)))
+
+    return line_list
+
+
+def legacy_get_module_count(zebu_module_dic, date, unit, module, sub_module):
+    """
+    zebu_monitor MainWindow.get_module_count before the bisect rewrite.
+    """
+    date_list = list(zebu_module_dic.keys())
+    first_dila_date = date_list[0]
+    last_dila_date = date_list[-1]
+    first_dila_date_utc = datetime.strptime(first_dila_date, '%Y-%m-%d').date()
+    last_dila_date_utc = datetime.strptime(last_dila_date, '%Y-%m-%d').date()
+    check_date_utc = datetime.strptime(date, '%Y-%m-%d').date()
+    module_list = []
+
+    if check_date_utc < first_dila_date_utc:
+        module_list = zebu_module_dic[first_dila_date]
+    elif check_date_utc >= last_dila_date_utc:
+        module_list = zebu_module_dic[last_dila_date]
+    else:
+        for i in range(len(date_list) - 1):
+            start_date = date_list[i]
+            end_date = date_list[i + 1]
+            start_date_utc = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date_utc = datetime.strptime(end_date, '%Y-%m-%d').date()
+            if start_date_utc <= check_date_utc <= end_date_utc:
+                module_list = zebu_module_dic[start_date]
+
+    module_count = 0
+
+    for modules in module_list:
+        if re.search(unit, modules) or unit == 'ALL':
+            if re.search(module, modules) or module == 'ALL':
+                if re.search(sub_module, modules) or sub_module == 'ALL':
+                    module_count += 1
+
+    return module_count
+
+
+def legacy_get_utilization_info(sys_report_lines, module_name_list, zebu_module_dic, unit, module, sub_module, start_date, end_date, now):
+    """
+    zebu_monitor MainWindow.get_utilization_info before the interval engine rewrite (sysreport lines are given).
+    """
+    utilization_info_dic = {}
+    start_date_utc = datetime.strptime(start_date + " 00:00:00", "%Y-%m-%d %H:%M:%S")
+    end_date_utc = datetime.strptime(end_date + " 23:59:59", "%Y-%m-%d %H:%M:%S")
+
+    for day in range((end_date_utc.date() - start_date_utc.date()).days + 1):
+        key_date = (start_date_utc + timedelta(days=day)).strftime("%Y-%m-%d")
+        utilization_info_dic.setdefault(key_date, 0)
+
+    for line in sys_report_lines:
+        if line:
+            start_time, end_time, modules, user, pid, pc = line.split(',')
+            modules_list = modules.strip('()').split(' ')
+
+            for modules in modules_list:
+                if modules.strip() in module_name_list:
+                    if start_time == '' or datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S") < datetime.strptime(start_date, "%Y-%m-%d"):
+                        start_time = start_date + ' 00:00:00'
+
+                    if end_time == '':
+                        end_time = now
+
+                    if datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S") > end_date_utc:
+                        end_time = end_date_utc.strftime("%Y-%m-%d %H:%M:%S")
+
+                    start_time_utc = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+                    end_time_utc = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+
+                    if start_time_utc.date() == end_time_utc.date():
+                        time_delta = (end_time_utc - start_time_utc).total_seconds() / 86400
+                        module_count = legacy_get_module_count(zebu_module_dic, start_time_utc.date().strftime("%Y-%m-%d"), unit, module, sub_module)
+                        utilization_info_dic[start_time_utc.date().strftime("%Y-%m-%d")] += time_delta / module_count
+                    else:
+                        start_run_date = datetime.strftime(start_time_utc.date(), "%Y-%m-%d")
+                        end_run_date = datetime.strftime(end_time_utc.date(), "%Y-%m-%d")
+
+                        for day in range((end_time_utc.date() - start_time_utc.date()).days + 1):
+                            run_date = start_time_utc.date() + timedelta(days=day)
+
+                            if run_date == start_time_utc.date():
+                                time_delta = ((datetime.strptime(start_run_date + " 23:59:59", "%Y-%m-%d %H:%M:%S") - start_time_utc).total_seconds() + 1) / 86400
+                            elif run_date == end_time_utc.date():
+                                time_delta = (end_time_utc - datetime.strptime(end_run_date + " 00:00:00", "%Y-%m-%d %H:%M:%S")).total_seconds() / 86400
+                            else:
+                                time_delta = 1.0
+
+                            module_count = legacy_get_module_count(zebu_module_dic, datetime.strftime(run_date, "%Y-%m-%d"), unit, module, sub_module)
+                            utilization_info_dic[datetime.strftime(run_date, "%Y-%m-%d")] += time_delta / module_count
+
+    return {udate: utilization if utilization <= 1 else 1 for udate, utilization in utilization_info_dic.items()}
+
+
+def current_get_utilization_info(sys_report_lines, module_name_list, zebu_module_dic, unit, module, sub_module, start_date, end_date, now):
+    """
+    zebu_monitor MainWindow.get_utilization_info with common_zebu interval engine.
+    """
+    interval_dic = common_zebu.parse_zebu_report_interval(sys_report_lines)
+    start_date_time = datetime.strptime(start_date, '%Y-%m-%d')
+    date_list = [(start_date_time + timedelta(days=day)).strftime('%Y-%m-%d') for day in range((datetime.strptime(end_date, '%Y-%m-%d') - start_date_time).days + 1)]
+    module_count_list = common_zebu.ZebuModuleCounter(zebu_module_dic).get_count_list(date_list, unit, module, sub_module)
+
+    return common_zebu.get_zebu_utilization(interval_dic, module_name_list, start_date, end_date, module_count_list, now=now.replace(' ', 'T'))
+
+
+def main():
+    args = read_args()
+    end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = end_date - timedelta(days=args.days - 1)
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    module_info_list = gen_module_info_list(args.module_num)
+    zebu_module_dic = gen_zebu_module_dic(module_info_list, start_date)
+
+    print('%-8s %-8s %-8s %-12s %-12s %-8s %s' % ('DAYS', 'JOBS', 'MODULES', 'LEGACY(s)', 'CURRENT(s)', 'SPEEDUP', 'SAME'))
+
+    for job_num in args.job_num:
+        sys_report_lines = gen_sys_report_lines(module_info_list, start_date, end_date, job_num)
+        result_list = []
+
+        for function in (legacy_get_utilization_info, current_get_utilization_info):
+            start_time = time.perf_counter()
+            utilization_dic = function(sys_report_lines, module_info_list, zebu_module_dic, 'ALL', 'ALL', 'ALL', start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), now)
+            result_list.append((time.perf_counter() - start_time, utilization_dic))
+
+        ((legacy_time, legacy_dic), (current_time, current_dic)) = result_list
+        same = (legacy_dic.keys() == current_dic.keys()) and all(abs(legacy_dic[day] - current_dic[day]) < 1e-9 for day in legacy_dic)
+
+        print('%-8d %-8d %-8d %-12s %-12s %-8s %s' % (args.days, job_num, args.module_num, round(legacy_time, 3), round(current_time, 3), str(round(legacy_time / current_time, 1)) + 'x', same))
+
+
+if __name__ == '__main__':
+    main()
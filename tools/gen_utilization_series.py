@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+################################
+# File Name   : gen_utilization_series.py
+# Description : This script is used for building binary utilization series
+#               (utilization.series) from existing palladium/protium text
+#               utilization files.
+################################
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(str(os.environ['EMU_MONITOR_INSTALL_PATH']))
+from common import common, common_utilization
+from config import config
+
+os.environ['PYTHONUNBUFFERED'] = '1'
+logger = common.get_logger()
+
+
+def read_args():
+    """
+    Read in arguments.
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-d', '--db_path',
+                        default=str(config.db_path),
+                        help='Specify database path, default is "config.db_path".')
+    parser.add_argument('-f', '--force',
+                        action='store_true',
+                        default=False,
+                        help='Rebuild utilization series even if it is up to date.')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.db_path):
+        logger.error('"' + str(args.db_path) + '": No such database path.')
+        sys.exit(1)
+
+    return args
+
+
+def get_utilization_file_list(db_path):
+    """
+    Get all text utilization files and their line format under db_path.
+    palladium : <db_path>/<hardware>/<emulator>/utilization
+    protium   : <db_path>/protium/<hardware>/utilization
+    """
+    utilization_file_list = []
+
+    for hardware in sorted(os.listdir(db_path)):
+        hardware_path = os.path.join(db_path, hardware)
+
+        if not os.path.isdir(hardware_path):
+            continue
+
+        for item in sorted(os.listdir(hardware_path)):
+            utilization_file = os.path.join(hardware_path, item, 'utilization')
+            line_format = 'protium' if (hardware == 'protium') else 'palladium'
+
+            if os.path.isfile(utilization_file):
+                utilization_file_list.append((utilization_file, line_format))
+
+    return utilization_file_list
+
+
+def main():
+    args = read_args()
+
+    for (utilization_file, line_format) in get_utilization_file_list(args.db_path):
+        if (not args.force) and common_utilization.is_utilization_series_valid(utilization_file, line_format):
+            logger.info('Skip up to date utilization file "' + str(utilization_file) + '".')
+            continue
+
+        start_time = time.time()
+        record_num = common_utilization.convert_utilization_file(utilization_file, line_format)
+        logger.info('Convert "' + str(utilization_file) + '" (' + str(line_format) + '), ' + str(record_num) + ' records, ' + str(round(time.time() - start_time, 2)) + 's.')
+
+
+if __name__ == '__main__':
+    main()